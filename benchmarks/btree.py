@@ -0,0 +1,76 @@
+"""
+Compare the B+ tree engine at several fanouts with the red-black tree
+across tree sizes, in time per random insert, lookup, removal and
+iterated key.
+
+    python -m benchmarks.btree --sizes 1000 100000 1000000
+"""
+import argparse
+import random
+from typing import Any, Callable, Dict, List
+
+from redblack import Tree
+from redblack.btree import BTree
+from benchmarks.suite import timed
+
+
+def insert_all(tree: Any, keys: List[int]) -> None:
+    for k in keys:
+        tree.insert(k)
+
+
+def lookup_all(tree: Any, keys: List[int]) -> None:
+    for k in keys:
+        tree[k]
+
+
+def remove_all(tree: Any, keys: List[int]) -> None:
+    for k in keys:
+        tree.remove(tree[k])
+
+
+def iterate(tree: Any) -> None:
+    for _ in tree.keys():
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6])
+    parser.add_argument('--fanouts', type=int, nargs='+',
+                        default=[32, 128, 256])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+
+    engines: Dict[str, Callable[[], Any]] = {'red-black': Tree}
+    for fanout in args.fanouts:
+        engines[f'btree({fanout})'] = lambda f=fanout: BTree(fanout=f)
+
+    print(f"{'size':>8} {'engine':<12} {'insert':>8} {'lookup':>8} "
+          f"{'remove':>8} {'iterate':>8}  (ns/op)")
+    for size in args.sizes:
+        keys = rnd.sample(range(10 * size), size)
+        for name, make in engines.items():
+            def filled() -> Any:
+                tree = make()
+                insert_all(tree, keys)
+                return tree
+
+            tree = filled()
+            row = [
+                timed(lambda t: insert_all(t, keys), size, args.repeat,
+                      make),
+                timed(lambda: lookup_all(tree, keys), size, args.repeat),
+                timed(lambda t: remove_all(t, keys), size, args.repeat,
+                      filled),
+                timed(lambda: iterate(tree), size, args.repeat),
+                ]
+            print(f"{size:>8} {name:<12} "
+                  + ' '.join(f"{ns:>8.0f}" for ns in row))
+
+
+if __name__ == '__main__':
+    main()
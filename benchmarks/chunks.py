@@ -0,0 +1,86 @@
+"""
+Compare the throughput of plain iteration over keys() and items() with
+chunked iteration through iter_chunks() and items_chunks().
+
+Each method is measured with two consumers: a Python loop touching
+every item, and a bulk consumer handing each chunk to C code at once,
+like writing rows to a CSV writer or extending a list.
+
+    python -m benchmarks.chunks -n 1000000 --sizes 64 1024
+"""
+import argparse
+from typing import Callable, Dict, Iterator, List
+
+from redblack import TreeDict
+from benchmarks.suite import timed
+
+
+def loop_items(it: Iterator) -> None:
+    for _ in it:
+        pass
+
+
+def loop_chunks(it: Iterator[List]) -> None:
+    for chunk in it:
+        for _ in chunk:
+            pass
+
+
+def loop_item_chunks(it: Iterator) -> None:
+    for ks, vs in it:
+        for _ in zip(ks, vs):
+            pass
+
+
+def bulk_items(it: Iterator) -> None:
+    list(it)
+
+
+def bulk_chunks(it: Iterator[List]) -> None:
+    out: List = []
+    for chunk in it:
+        out.extend(chunk)
+
+
+def bulk_item_chunks(it: Iterator) -> None:
+    out: List = []
+    for ks, vs in it:
+        out.extend(zip(ks, vs))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-n', type=int, default=10 ** 6)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64, 1024],
+                        help="Chunk sizes")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    d = TreeDict.load_sorted_items((k, k) for k in range(args.n))
+
+    # Case name -> (consumer for loop, consumer for bulk, iterator)
+    cases: Dict[str, tuple] = {
+        'keys()': (loop_items, bulk_items, d.keys),
+        'items()': (loop_items, bulk_items, d.items),
+        }
+    for size in args.sizes:
+        cases[f'iter_chunks({size})'] = (
+            loop_chunks, bulk_chunks, lambda size=size: d.iter_chunks(size))
+        cases[f'items_chunks({size})'] = (
+            loop_item_chunks, bulk_item_chunks,
+            lambda size=size: d.items_chunks(size))
+        cases[f'items_chunks({size}, reverse)'] = (
+            loop_item_chunks, bulk_item_chunks,
+            lambda size=size: d.items_chunks(size, reverse=True))
+
+    def case(consume: Callable, make: Callable) -> Callable[[], None]:
+        return lambda: consume(make())
+
+    print(f"{'':<30} {'loop':>10} {'bulk':>10}  ns/item")
+    for name, (loop, bulk, make) in cases.items():
+        t_loop = timed(case(loop, make), args.n, args.repeat)
+        t_bulk = timed(case(bulk, make), args.n, args.repeat)
+        print(f"{name:<30} {t_loop:>10.1f} {t_bulk:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
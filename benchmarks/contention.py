@@ -0,0 +1,83 @@
+"""
+Contention benchmark for ConcurrentTreeDict: N reader threads perform
+random lookups while one writer thread inserts and removes keys. Reports
+reader and writer throughput for each reader count, which helps sizing
+thread pools.
+
+    python -m benchmarks.contention --size 100000 --readers 1 2 4 8
+"""
+import argparse
+import random
+import threading
+import time
+
+from redblack import ConcurrentTreeDict
+
+
+def run(size: int, readers: int, seconds: float, batch: int) -> dict:
+    tree = ConcurrentTreeDict()
+    with tree.batch() as t:
+        for k in range(0, 2 * size, 2):
+            t[k] = k
+    stop = threading.Event()
+    reads = [0] * readers
+    writes = [0]
+
+    def reader(idx: int) -> None:
+        rnd = random.Random(idx)
+        count = 0
+        while not stop.is_set():
+            key = rnd.randrange(2 * size)
+            key in tree
+            tree.floor_and_ceil(key)
+            count += 2
+        reads[idx] = count
+
+    def writer() -> None:
+        rnd = random.Random(-1)
+        count = 0
+        while not stop.is_set():
+            with tree.batch() as t:
+                for _ in range(batch):
+                    key = 2 * rnd.randrange(size) + 1
+                    if key in t:
+                        del t[key]
+                    else:
+                        t[key] = key
+            count += batch
+        writes[0] = count
+
+    threads = [threading.Thread(target=reader, args=(i,))
+               for i in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return {
+        'readers': readers,
+        'reads_per_s': sum(reads) / seconds,
+        'writes_per_s': writes[0] / seconds,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=100000)
+    parser.add_argument('--readers', type=int, nargs='+',
+                        default=[1, 2, 4, 8])
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--batch', type=int, default=100,
+                        help="Mutations per write lock acquisition")
+    args = parser.parse_args()
+    print(f"{'readers':>8} {'reads/s':>12} {'writes/s':>12}")
+    for n in args.readers:
+        r = run(args.size, n, args.seconds, args.batch)
+        print(f"{r['readers']:>8} {r['reads_per_s']:>12.0f} "
+              f"{r['writes_per_s']:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Compare the insertion throughput of an in-memory TreeDict with the same
+tree wrapped in the write-ahead log of DurableTree, for several group
+commit sizes, and measure recovery time.
+
+    python -m benchmarks.durability -n 100000 --sync-every 1 100 10000
+"""
+import argparse
+import random
+import tempfile
+from time import perf_counter
+
+from redblack import TreeDict
+from redblack.durable import DurableTree, recover
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-n', type=int, default=100000,
+                        help="Number of insertions")
+    parser.add_argument('--sync-every', type=int, nargs='+',
+                        default=[1, 100, 10000],
+                        help="Mutations per fsync")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    keys = list(range(args.n))
+    random.Random(args.seed).shuffle(keys)
+
+    start = perf_counter()
+    tree = TreeDict()
+    for k in keys:
+        tree[k] = k
+    base = perf_counter() - start
+    print(f"{'in-memory':<24} {args.n / base:>12.0f} ops/s")
+
+    for every in args.sync_every:
+        with tempfile.TemporaryDirectory() as d:
+            # Time-based syncs would blur the group size
+            with DurableTree(d, sync_every=every, sync_interval=None) as t:
+                start = perf_counter()
+                for k in keys:
+                    t[k] = k
+                t.sync()
+                elapsed = perf_counter() - start
+            print(f"{f'wal sync_every={every}':<24} "
+                  f"{args.n / elapsed:>12.0f} ops/s "
+                  f"{elapsed / base:>6.1f}x")
+            start = perf_counter()
+            recover(d)
+            replayed = perf_counter() - start
+            with DurableTree(d, sync_interval=None) as t:
+                t.checkpoint()
+            start = perf_counter()
+            recover(d)
+            loaded = perf_counter() - start
+            print(f"{'':<24} recovery: log replay {replayed:.3f} s, "
+                  f"checkpoint {loaded:.3f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare the balancing engines, red-black, AVL, WAVL and treap, on
+workloads mixing lookups, inserts and removals in different ratios,
+printing the time per operation and the final tree height for each.
+
+    python -m benchmarks.engines --size 100000 --ops 200000
+"""
+import argparse
+import random
+from typing import Dict, List, Tuple, Type
+
+from redblack import Tree
+from redblack.engines import AVLTree, TreapTree, WAVLTree
+from benchmarks.suite import timed
+
+
+ENGINES: Dict[str, Type[Tree]] = {
+    'red-black': Tree,
+    'avl': AVLTree,
+    'wavl': WAVLTree,
+    'treap': TreapTree,
+    }
+
+# Name: (share of lookups, share of inserts), the rest are removals
+MIXES: Dict[str, Tuple[float, float]] = {
+    'read 95%': (0.95, 0.025),
+    'read 50%': (0.5, 0.25),
+    'write 100%': (0.0, 0.5),
+    'delete-heavy': (0.2, 0.2),
+    }
+
+
+def make_trace(
+        rnd: random.Random,
+        keys: List[int],
+        ops: int,
+        lookups: float,
+        inserts: float,
+        ) -> List[Tuple[int, int]]:
+    """
+    Return (operation, key) pairs, 0 for lookups, 1 for inserts and 2
+    for removals of keys from the range of the initial ones.
+    """
+    space = 2 * len(keys)
+    trace = []
+    for _ in range(ops):
+        r = rnd.random()
+        op = 0 if r < lookups else 1 if r < lookups + inserts else 2
+        trace.append((op, rnd.randrange(space)))
+    return trace
+
+
+def run(tree: Tree, trace: List[Tuple[int, int]]) -> None:
+    for op, key in trace:
+        if op == 0:
+            key in tree
+        elif op == 1:
+            tree.insert(key)
+        else:
+            try:
+                tree.remove(tree[key])
+            except KeyError:
+                pass
+
+
+def height(tree: Tree) -> int:
+    top = 0
+    stack = [(tree.root, 1)] if tree.root else []
+    while stack:
+        node, depth = stack.pop()
+        top = max(top, depth)
+        for child in (node.left, node.right):
+            if child:
+                stack.append((child, depth + 1))
+    return top
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=10 ** 5)
+    parser.add_argument('--ops', type=int, default=2 * 10 ** 5)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+    keys = rnd.sample(range(2 * args.size), args.size)
+
+    print(f"{'ns/op (height)':<14}"
+          + ''.join(f"{name:>16}" for name in ENGINES))
+    for mix, (lookups, inserts) in MIXES.items():
+        trace = make_trace(rnd, keys, args.ops, lookups, inserts)
+        row = f"{mix:<14}"
+        for engine in ENGINES.values():
+            trees: List[Tree] = []
+
+            def setup() -> Tree:
+                trees.append(engine(keys=keys))
+                return trees[-1]
+
+            ns = timed(lambda tree: run(tree, trace), args.ops, args.repeat,
+                       setup)
+            row += f"{ns:>10.0f} ({height(trees[-1]):>3})"
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
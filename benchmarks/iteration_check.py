@@ -0,0 +1,46 @@
+"""
+Cost of detecting concurrent modification during iteration: compares
+checked iteration over a tree with iter_unchecked(), which skips the
+version comparison after each step, and with a plain generator wrapping
+the node iterator, which is what Tree.__iter__ did before the check.
+
+    python -m benchmarks.iteration_check --size 1000000
+"""
+import argparse
+from timeit import repeat
+
+from redblack import Tree, TreeDict
+
+
+def wrapped(tree: Tree):
+    if tree.root:
+        yield from iter(tree.root)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    tree = Tree._from_sorted_nodes(
+        [Tree.nodetype(key=k) for k in range(args.size)])
+    tdict = TreeDict._from_sorted_nodes(
+        [TreeDict.nodetype(key=k, val=k) for k in range(args.size)])
+    cases = {
+        'iter(tree)': lambda: [n for n in tree],
+        'tree.iter_unchecked()': lambda: [n for n in tree.iter_unchecked()],
+        'wrapped(tree)': lambda: [n for n in wrapped(tree)],
+        'reversed(tree)': lambda: [n for n in reversed(tree)],
+        'tree.iter_unchecked(reverse=True)':
+            lambda: [n for n in tree.iter_unchecked(reverse=True)],
+        'tree.keys()': lambda: [k for k in tree.keys()],
+        'tdict.items()': lambda: [i for i in tdict.items()],
+        }
+    for name, func in cases.items():
+        best = min(repeat(func, number=1, repeat=args.repeat))
+        print(f"{name:<36} {best * 1e9 / args.size:8.1f} ns/node")
+
+
+if __name__ == '__main__':
+    main()
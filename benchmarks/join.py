@@ -0,0 +1,54 @@
+"""
+Compare join() with probing one tree for every key of the other, for
+trees of equal size and for a sparse left tree.
+
+    python -m benchmarks.join --size 1000000
+"""
+import argparse
+import random
+from typing import Callable, Dict, Tuple
+
+from redblack import TreeDict, join
+from benchmarks.suite import timed
+
+
+def probe(a: TreeDict, b: TreeDict) -> None:
+    for k, v in a.items():
+        try:
+            b[k]
+        except KeyError:
+            pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=10 ** 6)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+    n = args.size
+
+    def make(count: int) -> TreeDict:
+        keys = sorted(rnd.sample(range(2 * n), count))
+        return TreeDict.load_sorted_items((k, k) for k in keys)
+
+    big = make(n)
+    pairs: Dict[str, Tuple[TreeDict, TreeDict]] = {
+        'equal sizes': (make(n), big),
+        'sparse left': (make(max(1, n // 1000)), big),
+        }
+    for label, (a, b) in pairs.items():
+        cases: Dict[str, Callable[[], None]] = {
+            'probe b per key of a': lambda: probe(a, b),
+            'join inner': lambda: sum(1 for _ in join(a, b)),
+            'join left': lambda: sum(1 for _ in join(a, b, 'left')),
+            }
+        print(f"{label}: {len(a)} x {len(b)} keys")
+        for name, func in cases.items():
+            ms = timed(func, 1, args.repeat) / 1e6
+            print(f"  {name:<24} {ms:>10.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare the sorted list of lists engine with the red-black tree on a
+bulk load followed by range scans, lookups, full iteration and rare
+updates, in time per operation, or per scanned key for scans.
+
+    python -m benchmarks.listtree --size 1000000
+"""
+import argparse
+import random
+from typing import Any, Callable, Dict, List
+
+from redblack import Tree
+from redblack.listtree import ListTree
+from benchmarks.suite import timed
+
+
+def scan(tree: Any, starts: List[int], width: int) -> None:
+    for lo in starts:
+        tree[lo:lo + width]
+
+
+def lookup_all(tree: Any, keys: List[int]) -> None:
+    for k in keys:
+        tree[k]
+
+
+def iterate(tree: Any) -> None:
+    for _ in tree.keys():
+        pass
+
+
+def update(tree: Any, keys: List[int]) -> None:
+    for k in keys:
+        tree.insert(k)
+    for k in keys:
+        tree.remove(tree[k])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=10 ** 6)
+    parser.add_argument('--scans', type=int, default=10 ** 4)
+    parser.add_argument('--width', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+    n = args.size
+    keys = range(0, 2 * n, 2)
+    starts = [rnd.randrange(2 * n) for _ in range(args.scans)]
+    probes = rnd.sample(keys, min(n, 10 ** 5))
+    fresh = [2 * rnd.randrange(n) + 1 for _ in range(10 ** 4)]
+    fresh = list(dict.fromkeys(fresh))
+
+    engines: Dict[str, Callable[..., Any]] = {
+        'red-black': Tree.load_sorted,
+        'list-of-lists': ListTree.load_sorted,
+        }
+    print(f"{'engine':<14} {'load':>8} {'scan':>8} {'lookup':>8} "
+          f"{'iterate':>8} {'update':>8}  (ns/op)")
+    for name, load in engines.items():
+        tree = load(keys)
+        row = [
+            timed(lambda: load(keys), n, args.repeat),
+            timed(lambda: scan(tree, starts, args.width),
+                  args.scans * args.width // 2, args.repeat),
+            timed(lambda: lookup_all(tree, probes), len(probes),
+                  args.repeat),
+            timed(lambda: iterate(tree), n, args.repeat),
+            timed(lambda: update(tree, fresh), 2 * len(fresh), args.repeat),
+            ]
+        print(f"{name:<14} " + ' '.join(f"{ns:>8.0f}" for ns in row))
+
+
+if __name__ == '__main__':
+    main()
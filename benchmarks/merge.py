@@ -0,0 +1,82 @@
+"""
+Compare redblack.merge() with heapq.merge() over the items() of many
+TreeDicts, with and without merging the values of duplicate keys.
+
+    python -m benchmarks.merge --trees 32 --size 100000
+"""
+import argparse
+import heapq
+import random
+from itertools import groupby
+from operator import itemgetter
+from typing import Callable, Dict
+
+from redblack import TreeDict, merge
+from benchmarks.suite import timed
+
+
+def heapq_dedupe(trees, acc):
+    """
+    Merge with heapq.merge() and combine duplicates, the way merge()
+    does with 'acc'.
+    """
+    for key, group in groupby(heapq.merge(*(t.items() for t in trees),
+                                          key=itemgetter(0)),
+                              key=itemgetter(0)):
+        it = iter(group)
+        val = next(it)[1]
+        for _, v in it:
+            val = acc(val, v)
+        yield key, val
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--trees', type=int, default=32)
+    parser.add_argument('--size', type=int, default=100000,
+                        help="Keys per tree")
+    parser.add_argument('--overlap', type=float, default=0.5,
+                        help="Chance of a key to be shared with other "
+                             "trees")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+    shared = range(args.size)
+    trees = []
+    for i in range(args.trees):
+        keys = [k if rnd.random() < args.overlap
+                else args.size * (i + 1) + k for k in shared]
+        trees.append(TreeDict.load_sorted_items(
+            (k, 1) for k in sorted(set(keys))))
+    total = sum(len(t) for t in trees)
+
+    def consume(make: Callable) -> Callable[[], None]:
+        def run() -> None:
+            for _ in make():
+                pass
+        return run
+
+    add = int.__add__
+    cases: Dict[str, Callable[[], None]] = {
+        'heapq.merge(items())': consume(
+            lambda: heapq.merge(*(t.items() for t in trees))),
+        'merge(dedupe=False)': consume(
+            lambda: merge(*trees, dedupe=False)),
+        'heapq.merge(keys())': consume(
+            lambda: heapq.merge(*(t.keys() for t in trees))),
+        'merge(key_only, dedupe=False)': consume(
+            lambda: merge(*trees, key_only=True, dedupe=False)),
+        'heapq.merge + groupby, summed': consume(
+            lambda: heapq_dedupe(trees, add)),
+        'merge(acc=add)': consume(lambda: merge(*trees, acc=add)),
+        'merge(reverse=True)': consume(
+            lambda: merge(*trees, reverse=True)),
+        }
+    for name, func in cases.items():
+        ns = timed(func, total, args.repeat)
+        print(f"{name:<32} {ns:>8.1f} ns/item")
+
+
+if __name__ == '__main__':
+    main()
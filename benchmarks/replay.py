@@ -0,0 +1,45 @@
+"""
+Replay a recorded trace against tree implementations and print
+throughput and latency percentiles for each.
+
+    python -m benchmarks.replay trace.bin --engines Tree TreeDict
+"""
+import argparse
+import json
+
+from redblack import DefaultTreeDict, Tree, TreeDict
+from redblack.trace import replay
+
+ENGINES = {
+    'Tree': Tree,
+    'TreeDict': TreeDict,
+    'DefaultTreeDict': lambda: DefaultTreeDict(int),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('trace')
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES),
+                        default=['TreeDict'])
+    parser.add_argument('--json', action='store_true',
+                        help="Print the full reports as JSON")
+    args = parser.parse_args()
+    reports = {}
+    for name in args.engines:
+        with open(args.trace, 'rb') as f:
+            reports[name] = replay(f, ENGINES[name])
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    for name, r in reports.items():
+        print(f"{name}: {r['ops']} ops in {r['seconds']:.3f} s, "
+              f"{r['ops_per_s']:.0f} ops/s")
+        for op, lat in r['latency_ns'].items():
+            print(f"  {op:<16} n={lat['count']:<9} p50={lat['p50']:<7} "
+                  f"p90={lat['p90']:<7} p99={lat['p99']:<7} "
+                  f"max={lat['max']} ns")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Compare lookups in splay trees, with the default lazy splaying and
+splaying every lookup, with the red-black and AVL trees on traces drawn
+from zipf distributions of increasing skew and from the uniform
+distribution, in time per lookup and average nodes visited.
+
+    python -m benchmarks.splay --size 1000000 --lookups 1000000
+"""
+import argparse
+import random
+from itertools import accumulate
+from typing import Dict, List, Type
+
+from redblack import Tree
+from redblack.engines import AVLTree, SplayTree
+from benchmarks.suite import timed
+
+
+class ClassicSplayTree(SplayTree):
+    """
+    Splay tree splaying every lookup.
+    """
+    splay_depth = 0
+    splay_probability = 1.0
+
+
+ENGINES: Dict[str, Type[Tree]] = {
+    'red-black': Tree,
+    'avl': AVLTree,
+    'splay': SplayTree,
+    'classic splay': ClassicSplayTree,
+    }
+
+
+def zipf_trace(
+        rnd: random.Random,
+        keys: List[int],
+        count: int,
+        s: float,
+        ) -> List[int]:
+    """
+    Draw keys with probability proportional to 1 / rank ** s, with
+    ranks assigned to the keys in random order. s = 0 is uniform.
+    """
+    ranked = keys[:]
+    rnd.shuffle(ranked)
+    weights = list(accumulate(1 / r ** s for r in range(1, len(keys) + 1)))
+    return rnd.choices(ranked, cum_weights=weights, k=count)
+
+
+def lookup_all(tree: Tree, trace: List[int]) -> None:
+    for k in trace:
+        tree[k]
+
+
+def depth(tree: Tree, key: int) -> int:
+    node = tree.root
+    d = 1
+    while node.key != key:
+        node = node.left if key < node.key else node.right
+        d += 1
+    return d
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=10 ** 5)
+    parser.add_argument('--lookups', type=int, default=2 * 10 ** 5)
+    parser.add_argument('--skews', type=float, nargs='+',
+                        default=[0.0, 1.0, 1.2, 1.5])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+    keys = list(range(args.size))
+
+    print(f"{'ns (depth)':<12}"
+          + ''.join(f"{name:>16}" for name in ENGINES))
+    for s in args.skews:
+        trace = zipf_trace(rnd, keys, args.lookups, s)
+        row = f"{'uniform' if s == 0 else f'zipf {s}':<12}"
+        for engine in ENGINES.values():
+            tree = engine.load_sorted(keys)
+            # Warm up the splay tree on the trace, as in a steady state
+            lookup_all(tree, trace)
+            ns = timed(lambda: lookup_all(tree, trace), args.lookups,
+                       args.repeat)
+            # Depth of the keys when they are looked up
+            total = 0
+            for k in trace[:10 ** 4]:
+                total += depth(tree, k)
+                tree[k]
+            row += f"{ns:>10.0f} ({total / len(trace[:10 ** 4]):>3.0f})"
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
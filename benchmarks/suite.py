@@ -0,0 +1,371 @@
+"""
+Benchmark suite for Tree, TreeDict and DefaultTreeDict, with a sorted
+list maintained through the bisect module as baseline.
+
+Run the suite and store the results as JSON:
+
+    python -m benchmarks.suite run -o before.json --sizes 1000 100000
+
+Compare two runs, exiting with status 1 if any case got slower by more
+than the threshold:
+
+    python -m benchmarks.suite compare before.json after.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from itertools import islice
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from redblack import DefaultTreeDict, Tree, TreeDict
+
+
+class Subject:
+    """
+    Uniform interface over the benchmarked containers.
+    """
+    name = ''
+
+    def fill(self, keys: Iterable[int]) -> None:
+        raise NotImplementedError
+
+    def lookup(self, key: int) -> object:
+        raise NotImplementedError
+
+    def floor_and_ceil(self, key: int) -> object:
+        raise NotImplementedError
+
+    def get_neighbors(self, key: int) -> object:
+        raise NotImplementedError
+
+    def slice(self, lo: int, hi: int) -> list:
+        raise NotImplementedError
+
+    def iterate(self, count: Optional[int] = None) -> None:
+        raise NotImplementedError
+
+    def remove(self, key: int) -> None:
+        raise NotImplementedError
+
+
+class TreeSubject(Subject):
+    def __init__(self, treetype: Callable[[], Tree], name: str):
+        self.name = name
+        self.tree = treetype()
+        self.keyed = isinstance(self.tree, TreeDict)
+
+    def fill(self, keys: Iterable[int]) -> None:
+        tree = self.tree
+        if self.keyed:
+            for k in keys:
+                tree[k] = k
+        else:
+            for k in keys:
+                tree.insert(k)
+
+    def lookup(self, key: int) -> object:
+        try:
+            return self.tree[key]
+        except KeyError:
+            return None
+
+    def floor_and_ceil(self, key: int) -> object:
+        return self.tree.floor_and_ceil(key)
+
+    def get_neighbors(self, key: int) -> object:
+        return self.tree.get_neighbors(key)
+
+    def slice(self, lo: int, hi: int) -> list:
+        return self.tree[lo:hi]
+
+    def iterate(self, count: Optional[int] = None) -> None:
+        it = self.tree.items() if self.keyed else self.tree.keys()
+        for _ in islice(it, count):
+            pass
+
+    def remove(self, key: int) -> None:
+        try:
+            del self.tree[key]
+        except KeyError:
+            pass
+
+
+class BisectSubject(Subject):
+    """
+    Sorted list of keys with a parallel list of values.
+    """
+    name = 'bisect'
+
+    def __init__(self):
+        self.keys: List[int] = []
+        self.vals: List[int] = []
+
+    def fill(self, keys: Iterable[int]) -> None:
+        ks, vs = self.keys, self.vals
+        for k in keys:
+            i = bisect_left(ks, k)
+            if i < len(ks) and ks[i] == k:
+                vs[i] = k
+            else:
+                ks.insert(i, k)
+                vs.insert(i, k)
+
+    def lookup(self, key: int) -> object:
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.vals[i]
+        return None
+
+    def floor_and_ceil(self, key: int) -> object:
+        ks = self.keys
+        i = bisect_right(ks, key)
+        floor = ks[i - 1] if i else None
+        if floor == key:
+            return floor, floor
+        return floor, ks[i] if i < len(ks) else None
+
+    def get_neighbors(self, key: int) -> object:
+        ks = self.keys
+        i = bisect_left(ks, key)
+        j = bisect_right(ks, key)
+        return ks[i - 1] if i else None, ks[j] if j < len(ks) else None
+
+    def slice(self, lo: int, hi: int) -> list:
+        return self.keys[bisect_left(self.keys, lo):bisect_left(self.keys, hi)]
+
+    def iterate(self, count: Optional[int] = None) -> None:
+        for _ in islice(zip(self.keys, self.vals), count):
+            pass
+
+    def remove(self, key: int) -> None:
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+            del self.vals[i]
+
+
+SUBJECTS: Dict[str, Callable[[], Subject]] = {
+    'Tree': lambda: TreeSubject(Tree, 'Tree'),
+    'TreeDict': lambda: TreeSubject(TreeDict, 'TreeDict'),
+    'DefaultTreeDict': lambda: TreeSubject(
+        lambda: DefaultTreeDict(int), 'DefaultTreeDict'),
+    'bisect': BisectSubject,
+    }
+
+
+def zipf_keys(n: int, rnd: random.Random, alpha: float = 1.0) -> List[int]:
+    """
+    Return n keys from range(n), drawn with pareto-distributed ranks so
+    that a few keys occur very often, like in a zipf distribution.
+    """
+    return [min(int(rnd.paretovariate(alpha)) - 1, n - 1)
+            for _ in range(n)]
+
+
+def timed(
+        func: Callable[..., object],
+        ops: int,
+        repeat: int,
+        setup: Optional[Callable[[], object]] = None,
+        ) -> float:
+    """
+    Return the best time per operation in nanoseconds over 'repeat'
+    runs of 'func', which performs 'ops' operations. If passed, 'setup'
+    is called untimed before each run and its result passed to 'func'.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = perf_counter()
+        func(*args)
+        best = min(best, perf_counter() - start)
+    return best * 1e9 / max(ops, 1)
+
+
+def run_cases(
+        make: Callable[[], Subject],
+        n: int,
+        repeat: int,
+        seed: int,
+        ) -> Dict[str, float]:
+    """
+    Run every case for a single subject and size, returning the time
+    per operation in nanoseconds by case name.
+    """
+    rnd = random.Random(seed)
+    # Even keys are stored, odd ones are guaranteed misses
+    shuffled = list(range(0, 2 * n, 2))
+    rnd.shuffle(shuffled)
+    probes = shuffled[:min(n, 100000)]
+    misses = [k + 1 for k in probes]
+    orders = {
+        'random': shuffled,
+        'sorted': sorted(shuffled),
+        'reverse': sorted(shuffled, reverse=True),
+        'zipf': [2 * k for k in zipf_keys(n, rnd)],
+        }
+    results: Dict[str, float] = {}
+
+    for order, keys in orders.items():
+        def insert() -> None:
+            make().fill(keys)
+        results[f'insert_{order}'] = timed(insert, len(keys), repeat)
+
+    subject = make()
+    subject.fill(shuffled)
+
+    def loop(func: Callable[[int], object], args: Sequence[int]):
+        def run() -> None:
+            for a in args:
+                func(a)
+        return run
+
+    cases = {
+        'lookup_hit': loop(subject.lookup, probes),
+        'lookup_miss': loop(subject.lookup, misses),
+        'floor_and_ceil': loop(subject.floor_and_ceil, misses),
+        'get_neighbors': loop(subject.get_neighbors, probes),
+        }
+    for name, func in cases.items():
+        results[name] = timed(func, len(probes), repeat)
+
+    # Slices of about 100 keys each
+    width = min(200, 2 * n)
+    starts = probes[:1000]
+
+    def slices() -> None:
+        for lo in starts:
+            subject.slice(lo, lo + width)
+    results['slice_100'] = timed(slices, len(starts), repeat)
+    results['iterate_full'] = timed(subject.iterate, n, repeat)
+    partial = max(1, n // 100)
+    results['iterate_1pct'] = timed(
+        lambda: subject.iterate(partial), partial, repeat)
+
+    def filled() -> Subject:
+        s = make()
+        s.fill(shuffled)
+        return s
+
+    # Two removals for every insertion
+    def remove_heavy(s: Subject) -> None:
+        for i, k in enumerate(misses):
+            s.remove(probes[i])
+            if i % 2:
+                s.fill((k,))
+    results['remove_heavy'] = timed(
+        remove_heavy, len(misses) * 3 // 2, repeat, filled)
+    return results
+
+
+def environment() -> Dict[str, object]:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': sys.version,
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        }
+
+
+def run(args: argparse.Namespace) -> None:
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name in args.subjects:
+        for n in args.sizes:
+            if name == 'bisect' and n > args.bisect_limit:
+                continue
+            print(f"{name} n={n}", file=sys.stderr)
+            results.setdefault(name, {})[str(n)] = run_cases(
+                SUBJECTS[name], n, args.repeat, args.seed)
+    report = {
+        'environment': environment(),
+        'settings': {
+            'sizes': args.sizes,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            },
+        'results': results,
+        }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+def compare(args: argparse.Namespace) -> int:
+    with open(args.old) as f:
+        old = json.load(f)['results']
+    with open(args.new) as f:
+        new = json.load(f)['results']
+    regressions = 0
+    print(f"{'subject':<16} {'n':>9} {'case':<16} "
+          f"{'old ns':>10} {'new ns':>10} {'change':>8}")
+    for name, sizes in new.items():
+        for n, cases in sizes.items():
+            for case, t in cases.items():
+                try:
+                    before = old[name][n][case]
+                except KeyError:
+                    continue
+                change = t / before - 1
+                flag = ''
+                if change > args.threshold:
+                    flag = '  REGRESSION'
+                    regressions += 1
+                elif change < -args.threshold:
+                    flag = '  improved'
+                print(f"{name:<16} {n:>9} {case:<16} {before:>10.1f} "
+                      f"{t:>10.1f} {change:>+8.1%}{flag}")
+    return 1 if regressions else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('run', help="Run the benchmarks")
+    p.add_argument('-o', '--output', help="JSON file, stdout by default")
+    p.add_argument('--sizes', type=int, nargs='+',
+                   default=[10 ** 3, 10 ** 4, 10 ** 5],
+                   help="Number of keys, up to 10^7")
+    p.add_argument('--subjects', nargs='+', choices=list(SUBJECTS),
+                   default=list(SUBJECTS))
+    p.add_argument('--repeat', type=int, default=3)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--bisect-limit', type=int, default=10 ** 6,
+                   help="Skip the list baseline above this size, random "
+                        "insertion into a list is quadratic")
+    p = sub.add_parser('compare', help="Compare two result files")
+    p.add_argument('old')
+    p.add_argument('new')
+    p.add_argument('--threshold', type=float, default=0.1,
+                   help="Relative slowdown flagged as regression")
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Compare the stackless, parent-pointer traversal used by Node and Tree
+iteration with the explicit-stack traversal it replaced, in time per
+node and peak memory allocated while iterating.
+
+    python -m benchmarks.traversal --size 10000000
+"""
+import argparse
+import tracemalloc
+from timeit import repeat
+from typing import Callable, Iterator, List, Optional
+
+from redblack import Tree
+from redblack.tree import Node
+
+
+def stack_iter(root: Node) -> Iterator[Node]:
+    """
+    Former implementation of Node.__iter__.
+    """
+    stack: List[Node] = []
+    cur: Optional[Node] = root
+    while stack or cur:
+        while cur:
+            stack.append(cur)
+            cur = cur.left
+        cur = stack.pop()
+        yield cur
+        cur = cur.right
+
+
+def stack_reversed(root: Node) -> Iterator[Node]:
+    """
+    Former implementation of Node.__reversed__.
+    """
+    stack: List[Node] = []
+    cur: Optional[Node] = root
+    while stack or cur:
+        while cur:
+            stack.append(cur)
+            cur = cur.right
+        cur = stack.pop()
+        yield cur
+        cur = cur.left
+
+
+def nested_iter_from(start: Node) -> Iterator[Node]:
+    """
+    Former implementation of Tree.iter_from(), without version checks.
+    """
+    n: Optional[Node] = start
+    while n:
+        if n >= start:
+            yield n
+            if n.right:
+                yield from stack_iter(n.right)
+        n = n.parent
+
+
+def consume(it: Iterator[Node]) -> None:
+    for _ in it:
+        pass
+
+
+def peak(func: Callable[[], None]) -> int:
+    """
+    Return the peak number of bytes allocated while running 'func'.
+    """
+    tracemalloc.start()
+    func()
+    _, top = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return top
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=10 ** 6)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    tree = Tree.load_sorted(range(args.size))
+    root = tree.root
+    start = tree.first
+    cases = {
+        'stack iter(root)': lambda: consume(stack_iter(root)),
+        'stackless iter(root)': lambda: consume(iter(root)),
+        'stack reversed(root)': lambda: consume(stack_reversed(root)),
+        'stackless reversed(root)': lambda: consume(reversed(root)),
+        'nested iter_from(first)':
+            lambda: consume(nested_iter_from(start)),
+        'stackless iter_from(first)':
+            lambda: consume(tree.iter_from(start)),
+        }
+    print(f"{'':<30} {'ns/node':>8} {'peak bytes':>11}")
+    for name, func in cases.items():
+        best = min(repeat(func, number=1, repeat=args.repeat))
+        print(f"{name:<30} {best * 1e9 / args.size:>8.1f} "
+              f"{peak(func):>11}")
+
+
+if __name__ == '__main__':
+    main()
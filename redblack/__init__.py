@@ -1,2 +1,13 @@
 from .tree import Tree, Node
 from .treedict import TreeDict, DefaultTreeDict, DictNode
+from .threadsafe import ConcurrentTree, ConcurrentTreeDict, RWLock
+from .sharded import ShardedTreeDict
+from .mapped import MappedTreeView
+from .spill import SpillingTreeDict
+from .combine import merge, join
+from .engines import (
+    AVLTree, AVLTreeDict, WAVLTree, WAVLTreeDict, TreapTree, TreapTreeDict,
+    SplayTree, SplayTreeDict,
+    )
+from .btree import BTree, BTreeDict
+from .listtree import ListTree, ListTreeDict
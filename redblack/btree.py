@@ -0,0 +1,729 @@
+"""
+B+ tree engine with wide nodes, offering the Tree and TreeDict API.
+
+A red-black tree descends one Node, and thus a few Python attribute
+loads, per level. Nodes of a B+ tree instead hold up to 'fanout' sorted
+keys, searched with bisect in C, so for fanouts of 64 to 256 a lookup
+runs only a handful of Python-level steps. Keys are stored in the
+leaves, which are chained for iteration; branches only hold separator
+keys.
+
+Lookups return Entry handles with 'key' and, in BTreeDict, 'val'
+attributes, in place of the Node a Tree returns. Handles stay valid
+while their key is in the tree.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Collection,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Reversible,
+    Tuple,
+    Type,
+    Union,
+    overload,
+    )
+
+from .tree import CHANGED_DURING_ITERATION, K
+from .treedict import V, overwrite
+
+
+class Entry(Generic[K]):
+    """
+    Handle of a key stored in a BTree. Compares like a Node.
+    """
+    __slots__ = ('key',)
+
+    def __init__(self, key: K):
+        self.key = key
+
+    def __str__(self) -> str:
+        return f"({self.key})"
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}{self}"
+
+    def __eq__(self, other: object) -> bool: return self.key == other
+    def __ne__(self, other: object) -> bool: return self.key != other
+    def __lt__(self, other: object) -> bool: return self.key < other
+    def __gt__(self, other: object) -> bool: return self.key > other
+    def __le__(self, other: object) -> bool: return self.key <= other
+    def __ge__(self, other: object) -> bool: return self.key >= other
+
+    __hash__ = None  # type: ignore[assignment]
+
+
+class DictEntry(Entry[K], Generic[K, V]):
+    """
+    Handle of a key and its value stored in a BTreeDict.
+    """
+    __slots__ = ('val',)
+
+    def __init__(self, key: K, val: V = None):
+        super().__init__(key)
+        self.val = val
+
+    def __str__(self) -> str:
+        return f"({self.key}, {self.val})"
+
+
+OE = Optional[Entry]
+
+
+class _Leaf:
+    """
+    Sorted keys, their entries and the neighboring leaves.
+    """
+    __slots__ = ('keys', 'entries', 'prev', 'next')
+
+    def __init__(self, keys: List[K], entries: List[Entry]):
+        self.keys = keys
+        self.entries = entries
+        self.prev: Optional[_Leaf] = None
+        self.next: Optional[_Leaf] = None
+
+
+class _Branch:
+    """
+    Children and the separator keys between them: all keys below
+    children[i] are lower than keys[i], all keys below children[i + 1]
+    greater equal.
+    """
+    __slots__ = ('keys', 'children')
+
+    def __init__(self, keys: List[K], children: List[_Node]):
+        self.keys = keys
+        self.children = children
+
+
+_Node = Union[_Leaf, _Branch]
+# Branches along a search path with the index of the child taken
+_Path = List[Tuple[_Branch, int]]
+
+
+class BTree(Collection, Reversible):
+    """
+    Self-sorting container of unique keys based on a B+ tree.
+    """
+    # Type of entries to construct. Can be overridden in child classes.
+    entrytype: ClassVar[Type[Entry]] = Entry
+
+    def __init__(self, keys: Iterable[K] = [], fanout: int = 128):
+        """
+        :param keys: Initialize the tree with an entry for each key
+        :param fanout: Maximal number of keys in a leaf and of children
+            of a branch. Nodes hold at least half as many, except the
+            root. Must be at least 4.
+        """
+        if fanout < 4:
+            raise ValueError("Fanout must be at least 4")
+        self.fanout = fanout
+        self._root: _Node = _Leaf([], [])
+        self._head: _Leaf = self._root
+        self._tail: _Leaf = self._root
+        self._len = 0
+        # Incremented on every modification, so iterators can detect
+        # that the tree was modified underneath them.
+        self._version = 0
+        for k in keys:
+            self.insert(k)
+
+    @classmethod
+    def load_sorted(cls, keys: Iterable[K], **kwargs) -> BTree:
+        """
+        Construct a tree from keys in ascending order in O(n), filling
+        the leaves evenly. Repeated keys are stored once. Keyword
+        arguments are passed on to the constructor.
+        Raises ValueError if a key is less than its predecessor.
+        """
+        make = cls.entrytype
+        return cls._from_sorted_entries(
+            (make(k) for k in keys), lambda old, new: None, **kwargs)
+
+    @classmethod
+    def _from_sorted_entries(
+            cls,
+            entries: Iterable[Entry],
+            merge: Callable[[Entry, Entry], None],
+            **kwargs,
+            ) -> BTree:
+        """
+        Construct a tree from entries in ascending key order in O(n).
+        'merge' is called with the kept and the dropped entry whenever
+        two consecutive entries share a key.
+        Raises ValueError if a key is less than its predecessor.
+        """
+        tree = cls(**kwargs)
+        tree._link(*_sorted_unique(entries, merge))
+        return tree
+
+    def _link(self, keys: List[K], entries: List[Entry]) -> None:
+        """
+        Fill the empty tree with leaves holding the sorted, unique keys
+        and their entries evenly, and build the branches above them.
+        """
+        if not entries:
+            return
+        fanout = self.fanout
+        leaves = [_Leaf(keys[i:j], entries[i:j])
+                  for i, j in _even_splits(len(entries), fanout)]
+        for a, b in zip(leaves, leaves[1:]):
+            a.next = b
+            b.prev = a
+        self._head = leaves[0]
+        self._tail = leaves[-1]
+        # Build the branch levels bottom-up, with the lowest key below
+        # each node
+        level: List[_Node] = list(leaves)
+        lows = [leaf.keys[0] for leaf in leaves]
+        while len(level) > 1:
+            splits = _even_splits(len(level), fanout)
+            level, lows = (
+                [_Branch(lows[i + 1:j], level[i:j]) for i, j in splits],
+                [lows[i] for i, _ in splits],
+                )
+        self._root = level[0]
+        self._len = len(entries)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        Pickle the tree as flat list of its sorted keys instead of the
+        node graph, whose leaf chain recurses as deep as the tree has
+        leaves.
+        """
+        state = self.__dict__.copy()
+        for attr in ('_root', '_head', '_tail', '_len', '_version'):
+            state.pop(attr, None)
+        entries = [e for leaf in self._leaves() for e in leaf.entries]
+        state['keys'] = [e.key for e in entries]
+        self._add_cargo_state(entries, state)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """
+        Rebuild a pickled tree in linear time.
+        """
+        entries = self._entries_from_state(state)
+        self.__dict__.update(state)
+        self._root = self._head = self._tail = _Leaf([], [])
+        self._len = 0
+        self._version = 0
+        self._link([e.key for e in entries], entries)
+
+    def _add_cargo_state(
+            self,
+            entries: List[Entry],
+            state: Dict[str, Any],
+            ) -> None:
+        """
+        Add the "cargo" attributes of the given entries to the pickled
+        state. Overridden in child classes storing cargo.
+        """
+        pass
+
+    def _entries_from_state(self, state: Dict[str, Any]) -> List[Entry]:
+        """
+        Remove the pickled keys and cargo from the state and return
+        entries storing them.
+        """
+        make = self.entrytype
+        return [make(k) for k in state.pop('keys')]
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __str__(self) -> str:
+        return ' '.join(map(str, self))
+
+    def _leaves(self, reverse: bool = False) -> Iterator[_Leaf]:
+        leaf: Optional[_Leaf] = self._tail if reverse else self._head
+        while leaf is not None:
+            yield leaf
+            leaf = leaf.prev if reverse else leaf.next
+
+    def __iter__(self) -> Iterator[Entry]:
+        version = self._version
+        for leaf in self._leaves():
+            for entry in leaf.entries:
+                yield entry
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
+
+    def __reversed__(self) -> Iterator[Entry]:
+        version = self._version
+        for leaf in self._leaves(reverse=True):
+            for entry in reversed(leaf.entries):
+                yield entry
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
+
+    def keys(self) -> Iterator[K]:
+        """
+        Yield an iterator over all the tree's keys
+        """
+        version = self._version
+        for leaf in self._leaves():
+            for key in leaf.keys:
+                yield key
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
+
+    @property
+    def first(self) -> OE:
+        """
+        Return the lowest-key entry, or None if tree is empty.
+        """
+        entries = self._head.entries
+        return entries[0] if entries else None
+
+    @property
+    def last(self) -> OE:
+        """
+        Return the highest-key entry, or None if tree is empty.
+        """
+        entries = self._tail.entries
+        return entries[-1] if entries else None
+
+    def _find_leaf(self, key: K) -> _Leaf:
+        """
+        Return the leaf whose key range includes the given key.
+        """
+        node = self._root
+        while type(node) is _Branch:
+            node = node.children[bisect_right(node.keys, key)]
+        return node  # type: ignore[return-value]
+
+    def _find_path(self, key: K) -> Tuple[_Path, _Leaf]:
+        """
+        Return the branches visited searching the key and its leaf.
+        """
+        path: _Path = []
+        node = self._root
+        while type(node) is _Branch:
+            i = bisect_right(node.keys, key)
+            path.append((node, i))
+            node = node.children[i]
+        return path, node  # type: ignore[return-value]
+
+    @overload
+    def __getitem__(self, key: slice) -> List[Entry]:
+        pass
+
+    @overload
+    def __getitem__(self, key: K) -> Entry:
+        pass
+
+    def __getitem__(self, key: Union[K, slice]) -> Union[Entry, List[Entry]]:
+        if isinstance(key, slice):
+            if key.step is not None:
+                raise NotImplementedError(
+                    "Slice steps are not implemented"
+                    )
+            return list(self._iter_range(key.start, key.stop))
+        node = self._root
+        while type(node) is _Branch:
+            node = node.children[bisect_right(node.keys, key)]
+        keys = node.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return node.entries[i]
+        raise KeyError(key)
+
+    def __delitem__(self, key: K) -> Entry:
+        return self.remove(self[key])
+
+    def __contains__(self, key: K) -> bool:
+        node = self._root
+        while type(node) is _Branch:
+            node = node.children[bisect_right(node.keys, key)]
+        keys = node.keys
+        i = bisect_left(keys, key)
+        return i < len(keys) and keys[i] == key
+
+    def _iter_range(
+            self,
+            lo: Optional[K] = None,
+            hi: Optional[K] = None,
+            ) -> Iterator[Entry]:
+        """
+        Iterate over the entries with keys greater equal 'lo' and lower
+        than 'hi' in order. None stands for an open bound.
+        """
+        if lo is None:
+            leaf: Optional[_Leaf] = self._head
+            i = 0
+        else:
+            leaf = self._find_leaf(lo)
+            i = bisect_left(leaf.keys, lo)
+        version = self._version
+        while leaf is not None:
+            keys = leaf.keys
+            end = len(keys) if hi is None else bisect_left(keys, hi)
+            for entry in leaf.entries[i:end]:
+                yield entry
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
+            if end < len(keys):
+                return
+            leaf = leaf.next
+            i = 0
+
+    def insert(self, key: K) -> Tuple[Entry, bool]:
+        """
+        Add a new entry to the tree. If the key is already present in
+        the tree, return a tuple of the already existent entry and
+        False. Otherwise, return the newly added entry and True.
+        :return: (entry, bool)
+        """
+        return self._insert(key, self.entrytype(key))
+
+    def _insert(self, key: K, entry: Entry) -> Tuple[Entry, bool]:
+        path, leaf = self._find_path(key)
+        keys = leaf.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return leaf.entries[i], False
+        keys.insert(i, key)
+        leaf.entries.insert(i, entry)
+        if len(keys) > self.fanout:
+            self._split(path, leaf)
+        self._len += 1
+        self._version += 1
+        return entry, True
+
+    def _split(self, path: _Path, node: _Node) -> None:
+        """
+        Split an overfull node in halves, adding the right half to the
+        parent, and split the parents which overflow in turn.
+        """
+        while True:
+            if type(node) is _Leaf:
+                mid = len(node.keys) // 2
+                right: _Node = _Leaf(node.keys[mid:], node.entries[mid:])
+                del node.keys[mid:]
+                del node.entries[mid:]
+                right.next = node.next
+                right.prev = node
+                if node.next is None:
+                    self._tail = right
+                else:
+                    node.next.prev = right
+                node.next = right
+                sep = right.keys[0]
+            else:
+                mid = len(node.keys) // 2
+                sep = node.keys[mid]
+                right = _Branch(node.keys[mid + 1:], node.children[mid + 1:])
+                del node.keys[mid:]
+                del node.children[mid + 1:]
+            if not path:
+                self._root = _Branch([sep], [node, right])
+                return
+            parent, i = path.pop()
+            parent.keys.insert(i, sep)
+            parent.children.insert(i + 1, right)
+            if len(parent.children) <= self.fanout:
+                return
+            node = parent
+
+    def remove(self, entry: Entry) -> Entry:
+        """
+        Remove the given entry from the tree.
+        Raises KeyError if its key is not in the tree.
+        """
+        key = entry.key
+        path, leaf = self._find_path(key)
+        keys = leaf.keys
+        i = bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            raise KeyError(key)
+        del keys[i]
+        removed = leaf.entries.pop(i)
+        if path and len(keys) < self.fanout // 2:
+            self._fill(path, leaf)
+        self._len -= 1
+        self._version += 1
+        return removed
+
+    def _fill(self, path: _Path, node: _Node) -> None:
+        """
+        Refill an underfull node by moving a key from a sibling, or
+        merge it with a sibling, and refill the parents which underflow
+        in turn.
+        """
+        half = self.fanout // 2
+        while path:
+            parent, i = path.pop()
+            children = parent.children
+            left = children[i - 1] if i else None
+            right = children[i + 1] if i + 1 < len(children) else None
+            if type(node) is _Leaf:
+                if left is not None and len(left.keys) > half:
+                    node.keys.insert(0, left.keys.pop())
+                    node.entries.insert(0, left.entries.pop())
+                    parent.keys[i - 1] = node.keys[0]
+                    return
+                if right is not None and len(right.keys) > half:
+                    node.keys.append(right.keys.pop(0))
+                    node.entries.append(right.entries.pop(0))
+                    parent.keys[i] = right.keys[0]
+                    return
+                if left is None:
+                    # Merge the right sibling into this node instead
+                    left, node, i = node, right, i + 1
+                left.keys += node.keys
+                left.entries += node.entries
+                left.next = node.next
+                if node.next is None:
+                    self._tail = left
+                else:
+                    node.next.prev = left
+            else:
+                if left is not None and len(left.children) > half:
+                    node.keys.insert(0, parent.keys[i - 1])
+                    node.children.insert(0, left.children.pop())
+                    parent.keys[i - 1] = left.keys.pop()
+                    return
+                if right is not None and len(right.children) > half:
+                    node.keys.append(parent.keys[i])
+                    node.children.append(right.children.pop(0))
+                    parent.keys[i] = right.keys.pop(0)
+                    return
+                if left is None:
+                    left, node, i = node, right, i + 1
+                left.keys.append(parent.keys[i - 1])
+                left.keys += node.keys
+                left.children += node.children
+            del parent.keys[i - 1]
+            del children[i]
+            if not path:
+                if len(children) == 1:
+                    self._root = children[0]
+                return
+            if len(children) >= half:
+                return
+            node = parent
+
+    def floor_and_ceil(self, key: K) -> Tuple[OE, OE]:
+        """
+        For a given key, return its floor and ceil entries in the tree.
+        Floor is an entry with a key less equal the given key.
+        Ceil is an entry with a key greater equal the given key.
+        Both entries are the same if the tree contains a key matching
+        the given one. None is returned for an entry that wasn't found.
+        :return (floor entry, ceil entry):
+        """
+        leaf = self._find_leaf(key)
+        keys = leaf.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            entry = leaf.entries[i]
+            return entry, entry
+        return self._at(leaf, i - 1), self._at(leaf, i)
+
+    def get_neighbors(self, key: K) -> Tuple[OE, OE]:
+        """
+        For a given key, return its predecessor and successor entry in
+        the tree. This functions differs from floor_and_ceil() only
+        when a key equal to the passed one exists in the tree. In this
+        case, this function does not return the same entry two times.
+        None is returned for an entry that wasn't found.
+        :return (predecessor entry, successor entry):
+        """
+        leaf = self._find_leaf(key)
+        keys = leaf.keys
+        return (self._at(leaf, bisect_left(keys, key) - 1),
+                self._at(leaf, bisect_right(keys, key)))
+
+    def _at(self, leaf: _Leaf, i: int) -> OE:
+        """
+        Return the entry at index i of the leaf, continuing into the
+        neighboring leaves for indices out of its range.
+        """
+        if i < 0:
+            prev = leaf.prev
+            return prev.entries[-1] if prev is not None else None
+        if i >= len(leaf.entries):
+            nxt = leaf.next
+            return nxt.entries[0] if nxt is not None else None
+        return leaf.entries[i]
+
+    def validate(self) -> None:
+        """
+        Check key order, node fill, separators, the leaf chain and the
+        stored length. Raises AssertionError describing the first
+        violation found.
+        """
+        half = self.fanout // 2
+        leaves: List[_Leaf] = []
+        depths = set()
+        # (node, depth, inclusive lower and exclusive upper key bound)
+        stack: List[Tuple[_Node, int, Optional[K], Optional[K]]] = \
+            [(self._root, 0, None, None)]
+        while stack:
+            node, depth, lo, hi = stack.pop()
+            keys = node.keys
+            if any(not a < b for a, b in zip(keys, keys[1:])):
+                raise AssertionError(f"Keys {keys} are not ascending")
+            if keys and ((lo is not None and keys[0] < lo)
+                         or (hi is not None and not keys[-1] < hi)):
+                raise AssertionError(f"Keys {keys} violate separators")
+            if type(node) is _Leaf:
+                if [e.key for e in node.entries] != keys:
+                    raise AssertionError(f"Entries of {keys} differ")
+                size = len(keys)
+                depths.add(depth)
+                leaves.append(node)
+            else:
+                if len(node.children) != len(keys) + 1:
+                    raise AssertionError(f"Branch {keys} miscounts")
+                size = len(node.children)
+                bounds = [lo] + keys + [hi]
+                for j in reversed(range(len(node.children))):
+                    stack.append((node.children[j], depth + 1,
+                                  bounds[j], bounds[j + 1]))
+            if node is not self._root and (size < half or size > self.fanout):
+                raise AssertionError(f"Node {keys} has {size} entries")
+        if len(depths) > 1:
+            raise AssertionError("Leaves at different depths")
+        if leaves[0] is not self._head or leaves[-1] is not self._tail:
+            raise AssertionError("Head or tail leaf is wrong")
+        for a, b in zip(leaves, leaves[1:]):
+            if a.next is not b or b.prev is not a:
+                raise AssertionError("Leaf chain is broken")
+        count = sum(len(leaf.keys) for leaf in leaves)
+        if count != self._len:
+            raise AssertionError(
+                f"Tree has {count} keys, but length {self._len}")
+
+
+class BTreeDict(BTree, MutableMapping[K, V]):
+    """
+    Dictionary based on a B+ tree.
+    """
+    entrytype: ClassVar[Type[Entry]] = DictEntry
+
+    def __init__(
+            self,
+            items: Mapping[K, V] = {},
+            acc: Callable[[V, V], V] = overwrite,
+            fanout: int = 128,
+            ):
+        """
+        :param items: Initialize the dictionary with the key, value
+            pairs in the mapping.
+        :param acc: Called with the contained and the passed value when
+            inserting a contained key, returning the value to store. By
+            default, the old value is overridden by the new one.
+        :param fanout: See BTree
+        """
+        super().__init__(fanout=fanout)
+        self.acc = acc
+        for i in items.items():
+            self.__setitem__(*i)
+
+    @classmethod
+    def load_sorted_items(
+            cls,
+            items: Iterable[Tuple[K, V]],
+            acc: Callable[[V, V], V] = overwrite,
+            **kwargs,
+            ) -> BTreeDict:
+        """
+        Construct a dictionary from key, value pairs in ascending key
+        order in O(n). Values of repeated keys are combined with 'acc'.
+        Other keyword arguments are passed on to the constructor.
+        Raises ValueError if a key is less than its predecessor.
+        """
+        make = cls.entrytype
+
+        def merge(old: DictEntry, new: DictEntry) -> None:
+            old.val = acc(old.val, new.val)
+
+        return cls._from_sorted_entries(  # type: ignore[return-value]
+            (make(k, v) for k, v in items), merge, acc=acc, **kwargs)
+
+    def __setitem__(self, key: K, val: V) -> Tuple[DictEntry, bool]:
+        entry, success = self._insert(key, self.entrytype(key, val))
+        if not success:
+            entry.val = self.acc(entry.val, val)
+        return entry, success  # type: ignore[return-value]
+
+    insert = __setitem__  # type: ignore[assignment]
+
+    def _add_cargo_state(
+            self,
+            entries: List[DictEntry],
+            state: Dict[str, Any],
+            ) -> None:
+        state['values'] = [e.val for e in entries]
+
+    def _entries_from_state(self, state: Dict[str, Any]) -> List[DictEntry]:
+        make = self.entrytype
+        return [make(k, v)  # type: ignore[call-arg]
+                for k, v in zip(state.pop('keys'), state.pop('values'))]
+
+    def values(self) -> Iterator[V]:
+        version = self._version
+        for leaf in self._leaves():
+            for entry in leaf.entries:
+                yield entry.val
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
+
+    def items(self) -> Iterator[Tuple[K, V]]:
+        version = self._version
+        for leaf in self._leaves():
+            for entry in leaf.entries:
+                yield (entry.key, entry.val)
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
+
+
+def _sorted_unique(
+        entries: Iterable[Entry],
+        merge: Callable[[Entry, Entry], None],
+        ) -> Tuple[List[K], List[Entry]]:
+    """
+    Return the keys and entries of entries in ascending key order,
+    calling 'merge' with the kept and the dropped entry whenever two
+    consecutive entries share a key.
+    Raises ValueError if a key is less than its predecessor.
+    """
+    keys: List[K] = []
+    kept: List[Entry] = []
+    for entry in entries:
+        if kept:
+            last = kept[-1]
+            if entry.key < last.key:
+                raise ValueError(
+                    f"Key {entry.key!r} at position {len(kept)} is "
+                    f"less than its predecessor {last.key!r}"
+                    )
+            if not last.key < entry.key:
+                merge(last, entry)
+                continue
+        keys.append(entry.key)
+        kept.append(entry)
+    return keys, kept
+
+
+def _even_splits(n: int, size: int) -> List[Tuple[int, int]]:
+    """
+    Split range(n) into as few slices of at most 'size' elements as
+    possible, as even as possible. Return their start and stop indices.
+    """
+    count = -(-n // size)
+    bounds = [n * j // count for j in range(count + 1)]
+    return list(zip(bounds, bounds[1:]))
@@ -0,0 +1,327 @@
+"""
+Opt-in cache of hot keys in front of tree lookups.
+
+enable_cache() switches a tree to a subclass checking a bounded dict of
+recently or frequently looked-up keys before descending the tree, so
+hot keys are found in O(1):
+
+    cache = enable_cache(tree, maxsize=4096, policy='lfu')
+    ...
+    print(cache.hit_rate)
+    disable_cache(tree)
+
+Lookups through tree[key], 'in' and the TreeDict reads built on them
+are cached. Entries are invalidated when their node is removed, when
+removal moves a key to another node and when the tree is cleared.
+
+Trees without a cache keep their original type, so the cache costs
+nothing unless enabled. Lookups update the cache, so a cached tree must
+not be read concurrently under a shared read lock. Copies of a cached
+tree get an empty cache of their own, pickled trees are loaded without
+a cache.
+"""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    )
+
+from .tree import K, Node, Tree
+
+
+T = TypeVar('T', bound=Tree)
+
+
+class LookupCache(ABC, Generic[K]):
+    """
+    Bounded map of keys to their nodes, counting hits and misses.
+    """
+    def __init__(self, maxsize: int):
+        """
+        :param maxsize: Maximal number of keys held
+        """
+        if maxsize < 1:
+            raise ValueError("Cache size must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Return the share of lookups answered by the cache.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def reset_counters(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, key: K) -> Optional[Node]:
+        """
+        Return the node cached for the key, or None.
+        Raises TypeError if the key is not hashable.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, key: K, node: Node) -> None:
+        """
+        Cache the node of a key not in the cache, evicting another key
+        if the cache is full.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def pop(self, key: K) -> None:
+        """
+        Remove the key from the cache, if present.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class LRUCache(LookupCache[K]):
+    """
+    Cache evicting the least recently looked-up key.
+    """
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self._nodes: OrderedDict[K, Node] = OrderedDict()
+
+    def get(self, key: K) -> Optional[Node]:
+        node = self._nodes.get(key)
+        if node is None:
+            self.misses += 1
+            return None
+        self._nodes.move_to_end(key)
+        self.hits += 1
+        return node
+
+    def put(self, key: K, node: Node) -> None:
+        self._nodes[key] = node
+        if len(self._nodes) > self.maxsize:
+            self._nodes.popitem(last=False)
+
+    def pop(self, key: K) -> None:
+        self._nodes.pop(key, None)
+
+    def clear(self) -> None:
+        self._nodes.clear()
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+
+class LFUCache(LookupCache[K]):
+    """
+    Cache evicting the least frequently looked-up key, and of those the
+    least recently looked-up one, in O(1): keys are kept in buckets by
+    lookup count, which preserve the order in which keys entered them.
+    Keeps hot keys cached through bursts of cold lookups, but a hit
+    costs several dict operations more than with LRUCache.
+    """
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self._nodes: Dict[K, Node] = {}
+        self._counts: Dict[K, int] = {}
+        self._buckets: Dict[int, Dict[K, None]] = {}
+        # Lowest count of any key, may be too low after pop()
+        self._min = 1
+
+    def get(self, key: K) -> Optional[Node]:
+        node = self._nodes.get(key)
+        if node is None:
+            self.misses += 1
+            return None
+        counts = self._counts
+        buckets = self._buckets
+        count = counts[key]
+        bucket = buckets[count]
+        del bucket[key]
+        if not bucket:
+            del buckets[count]
+            if count == self._min:
+                self._min = count + 1
+        count += 1
+        counts[key] = count
+        bucket = buckets.get(count)
+        if bucket is None:
+            buckets[count] = {key: None}
+        else:
+            bucket[key] = None
+        self.hits += 1
+        return node
+
+    def put(self, key: K, node: Node) -> None:
+        if len(self._nodes) >= self.maxsize:
+            if self._min not in self._buckets:
+                self._min = min(self._buckets)
+            victim = next(iter(self._buckets[self._min]))
+            self.pop(victim)
+        self._nodes[key] = node
+        self._counts[key] = 1
+        self._buckets.setdefault(1, {})[key] = None
+        self._min = 1
+
+    def pop(self, key: K) -> None:
+        if self._nodes.pop(key, None) is not None:
+            self._unbucket(key, self._counts.pop(key))
+
+    def _unbucket(self, key: K, count: int) -> None:
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+
+    def clear(self) -> None:
+        self._nodes.clear()
+        self._counts.clear()
+        self._buckets.clear()
+        self._min = 1
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+
+POLICIES: Dict[str, Type[LookupCache]] = {
+    'lru': LRUCache,
+    'lfu': LFUCache,
+    }
+
+
+class CachedMixin(Tree):
+    """
+    Tree methods checking and maintaining the lookup cache. Mixed into
+    subclasses of tree types by enable_cache(). Derives from Tree, as
+    CPython only allows switching the class of a tree to a subclass
+    whose first base has the same instance layout.
+    """
+    lookup_cache: LookupCache
+    # Tree type the cached type was derived from
+    _uncached: Type[Tree]
+
+    def __getitem__(self, key: Union[K, slice]) -> Union[Node, List[Node]]:
+        if isinstance(key, slice):
+            return super().__getitem__(key)
+        cache = self.lookup_cache
+        try:
+            node = cache.get(key)
+        except TypeError:
+            # Key is not hashable
+            return super().__getitem__(key)
+        if node is None:
+            node = super().__getitem__(key)
+            # Skip defaults of DefaultTreeDict
+            if isinstance(node, Node):
+                cache.put(key, node)
+        return node
+
+    def remove(self, node: Node) -> Node:
+        try:
+            self.lookup_cache.pop(node.key)
+        except TypeError:
+            pass
+        return super().remove(node)
+
+    def _copy_node_attr(self, source: Node, target: Node) -> None:
+        # The source's key moves to the target node, and the target's
+        # key is about to be removed.
+        try:
+            self.lookup_cache.pop(source.key)
+            self.lookup_cache.pop(target.key)
+        except TypeError:
+            pass
+        super()._copy_node_attr(source, target)
+
+    def clear(self) -> None:
+        self.lookup_cache.clear()
+        super().clear()
+
+    def copy(self) -> Tree:
+        new = super().copy()
+        cache = self.lookup_cache
+        new.lookup_cache = type(cache)(cache.maxsize)
+        return new
+
+    __copy__ = copy
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = super().__getstate__()
+        state.pop('lookup_cache', None)
+        return state
+
+    def __reduce_ex__(self, protocol: Any) -> Tuple[Any, ...]:
+        # Pickle as the uncached type, cached types only exist at runtime
+        return object.__new__, (self._uncached,), self.__getstate__()
+
+
+_cache: Dict[type, type] = {}
+
+
+def _cached_type(treetype: Type[T]) -> Type[T]:
+    """
+    Return the subclass of the given tree type with a lookup cache.
+    Repeated calls return the same subclass.
+    """
+    cls = _cache.get(treetype)
+    if cls is None:
+        cls = _cache[treetype] = type(
+            f'Cached{treetype.__name__}',
+            (CachedMixin, treetype),
+            {'_uncached': treetype},
+            )
+    return cls
+
+
+def enable_cache(
+        tree: Tree,
+        maxsize: int = 1024,
+        policy: str = 'lru',
+        ) -> LookupCache:
+    """
+    Put a cache of hot keys in front of the tree's lookups, replacing
+    any cache it already has. Return the cache, which is also
+    accessible as 'tree.lookup_cache' and counts hits and misses.
+    :param maxsize: Maximal number of keys cached
+    :param policy: 'lru' to evict the least recently or 'lfu' to
+        evict the least frequently looked-up key
+    """
+    try:
+        make = POLICIES[policy]
+    except KeyError:
+        raise ValueError(f"Unknown cache policy {policy!r}") from None
+    cache = make(maxsize)
+    if not isinstance(tree, CachedMixin):
+        tree.__class__ = _cached_type(type(tree))
+    tree.lookup_cache = cache  # type: ignore[attr-defined]
+    return cache
+
+
+def disable_cache(tree: Tree) -> None:
+    """
+    Remove the tree's lookup cache, restoring its original type. Does
+    nothing if the tree has no cache.
+    """
+    if isinstance(tree, CachedMixin):
+        tree.__class__ = tree._uncached
+        del tree.lookup_cache
@@ -0,0 +1,314 @@
+"""
+Ordered combination of several trees: a lazy k-way merge and key joins.
+
+Both read trees through cursors, nodes of the input trees advanced along
+the parent pointers instead of iterating generators. Joins also skip
+ahead with a finger search starting at a cursor. Like iterating a tree,
+both raise RuntimeError when resumed after an input tree was modified.
+"""
+from __future__ import annotations
+
+import heapq
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    )
+
+from .tree import CHANGED_DURING_ITERATION, K, ON, Node, Tree
+from .treedict import DictNode, TreeDict, V, overwrite
+
+
+_NOTHING = object()
+# Public max-heap functions, added in Python 3.14
+_MAX_HEAP = getattr(heapq, 'heapreplace_max', None) is not None
+
+
+class _Descending:
+    """
+    Key wrapper inverting the order of keys, so that a min-heap yields
+    the highest key first.
+    """
+    __slots__ = ('key',)
+
+    def __init__(self, key: K):
+        self.key = key
+
+    def __lt__(self, other: _Descending) -> bool:
+        return other.key < self.key
+
+    def __eq__(self, other: object) -> bool:
+        return self.key == other.key  # type: ignore[attr-defined]
+
+
+def _below(tree: Tree, key: K) -> ON:
+    """
+    Return the node with the highest key lower than the given one.
+    """
+    best = None
+    node = tree.root
+    while node:
+        if node.key < key:
+            best = node
+            node = node.right
+        else:
+            node = node.left
+    return best
+
+
+def _cursor_range(
+        tree: Tree,
+        lo: Optional[K],
+        hi: Optional[K],
+        reverse: bool,
+        ) -> Tuple[ON, ON]:
+    """
+    Return the first node of the tree's key range [lo, hi) in the given
+    direction and the node at which to stop, which is not part of the
+    range. Either may be None.
+    """
+    if reverse:
+        start = tree.last if hi is None else _below(tree, hi)
+        stop = None if lo is None else _below(tree, lo)
+    else:
+        start = tree.first if lo is None else tree.floor_and_ceil(lo)[1]
+        stop = None if hi is None else tree.floor_and_ceil(hi)[1]
+    return start, stop
+
+
+def _finger_ceil(node: Node, key: K) -> ON:
+    """
+    Return the node with the lowest key greater equal the given one,
+    searching from a node with a lower key. Climbs from the node only as
+    far as necessary, so the cost is logarithmic in the distance to the
+    result, not in the size of the tree.
+    """
+    n = node
+    while n.parent is not None and n.key < key:
+        n = n.parent
+    if n.key < key:
+        # Climbed to the root
+        best = None
+        n = n.right
+    else:
+        best = n
+        n = n.left
+    while n:
+        if n.key < key:
+            n = n.right
+        else:
+            best = n
+            n = n.left
+    return best
+
+
+def merge(
+        *trees: Tree,
+        key_only: bool = False,
+        dedupe: bool = True,
+        acc: Optional[Callable[[V, V], V]] = None,
+        lo: Optional[K] = None,
+        hi: Optional[K] = None,
+        reverse: bool = False,
+        ) -> Iterator[Union[K, Tuple[K, V]]]:
+    """
+    Lazily merge the trees into one sorted stream. Each tree is read
+    through a cursor stepping from node to node, and a heap holds the
+    head key of every tree.
+    :param key_only: Yield keys instead of key, value pairs. Always done
+        if not all trees are TreeDicts.
+    :param dedupe: Yield every key once. If false, equal keys are
+        yielded in the order of the trees passed.
+    :param acc: Combines the values of equal keys, called with the
+        value accumulated so far and the value of the next tree in the
+        order passed. Defaults to keeping the last tree's value.
+    :param lo: Lowest key to include, None for no bound
+    :param hi: Key to stop before, None for no bound
+    :param reverse: Merge in descending order
+    """
+    keyed = not key_only and all(isinstance(t, TreeDict) for t in trees)
+    if acc is None:
+        acc = overwrite
+    versions = [t._version for t in trees]
+    # Whether heap entries hold keys wrapped in _Descending
+    wrapped = reverse and not _MAX_HEAP
+    if reverse and not wrapped:
+        heapify = heapq.heapify_max  # type: ignore[attr-defined]
+        heappop = heapq.heappop_max  # type: ignore[attr-defined]
+        heapreplace = heapq.heapreplace_max  # type: ignore[attr-defined]
+    else:
+        heapify = heapq.heapify
+        heappop = heapq.heappop
+        heapreplace = heapq.heapreplace
+    # Entries of sort key, tie breaker, node and stop node. Tie breakers
+    # are unique, so nodes are never compared, and order equal keys by
+    # tree.
+    heap: List[List[Any]] = []
+    for i, tree in enumerate(trees):
+        start, stop = _cursor_range(tree, lo, hi, reverse)
+        if start is not None and start is not stop:
+            heap.append([
+                _Descending(start.key) if wrapped else start.key,
+                -i if reverse and not wrapped else i,
+                start,
+                stop,
+                ])
+    heapify(heap)
+
+    pending: Any = _NOTHING
+    while heap:
+        entry = heap[0]
+        # Only the nodes of the tree at the top are accessed, so only
+        # its version is checked per step. The others are checked when
+        # they reach the top, and all once the heap runs empty.
+        i = -entry[1] if reverse and not wrapped else entry[1]
+        tree = trees[i]
+        if tree._version != versions[i]:
+            raise RuntimeError(CHANGED_DURING_ITERATION)
+        node = entry[2]
+        key = node.key
+        out: Any = _NOTHING
+        if not keyed:
+            if not dedupe or key != pending:
+                out = pending = key
+        elif pending is _NOTHING:
+            pending = (key, node.val)
+        elif dedupe and key == pending[0]:
+            pending = (key, acc(pending[1], node.val))
+        else:
+            out = pending
+            pending = (key, node.val)
+        if out is not _NOTHING:
+            yield out
+            if tree._version != versions[i]:
+                raise RuntimeError(CHANGED_DURING_ITERATION)
+        # Step the cursor to its successor or predecessor, inlined
+        if reverse:
+            if node.left:
+                node = node.left
+                while node.right:
+                    node = node.right
+            else:
+                parent = node.parent
+                while parent and parent.left is node:
+                    node = parent
+                    parent = node.parent
+                node = parent
+        elif node.right:
+            node = node.right
+            while node.left:
+                node = node.left
+        else:
+            parent = node.parent
+            while parent and parent.right is node:
+                node = parent
+                parent = node.parent
+            node = parent
+        if node is None or node is entry[3]:
+            heappop(heap)
+        else:
+            if wrapped:
+                entry[0].key = node.key
+            else:
+                entry[0] = node.key
+            entry[2] = node
+            heapreplace(heap, entry)
+    _check_versions(trees, versions)
+    if keyed and pending is not _NOTHING:
+        yield pending
+        _check_versions(trees, versions)
+
+
+def _check_versions(trees: Sequence[Tree], versions: List[int]) -> None:
+    """
+    Raise RuntimeError if a tree's version differs from the one at the
+    same index.
+    """
+    for tree, version in zip(trees, versions):
+        if tree._version != version:
+            raise RuntimeError(CHANGED_DURING_ITERATION)
+
+
+def join(
+        a: TreeDict,
+        b: TreeDict,
+        how: str = 'inner',
+        ) -> Iterator[Tuple[K, Optional[V], Optional[V]]]:
+    """
+    Join two trees by key, walking both in lockstep. Yield the key and
+    the values of both trees for every key in
+    - 'inner': both trees
+    - 'left': the left tree
+    - 'outer': any of the trees
+    with None for the value of a tree missing the key.
+
+    Cursors are advanced to their successor if that is close enough,
+    otherwise by a finger search. Keys the join skips in one tree thus
+    cost logarithmic time in the gap, and the whole join between
+    O(n + m) and O(n log m) for trees of n and m keys.
+    """
+    if how not in ('inner', 'left', 'outer'):
+        raise ValueError(f"Unknown join type {how!r}")
+    version_a = a._version
+    version_b = b._version
+    for row in _join(a, b, how):
+        yield row
+        if a._version != version_a or b._version != version_b:
+            raise RuntimeError(CHANGED_DURING_ITERATION)
+
+
+def _join(
+        a: TreeDict,
+        b: TreeDict,
+        how: str,
+        ) -> Iterator[Tuple[K, Optional[V], Optional[V]]]:
+    """
+    Perform join() without checking the trees for modifications.
+    """
+    # Trees may be skipped in unless all their keys must be yielded
+    skip_a = how == 'inner'
+    skip_b = how != 'outer'
+    x: Optional[DictNode] = a.first
+    y: Optional[DictNode] = b.first
+    while x is not None and y is not None:
+        if x.key == y.key:
+            yield x.key, x.val, y.val
+            x = x.successor
+            y = y.successor
+        elif x.key < y.key:
+            if not skip_a:
+                yield x.key, x.val, None
+                x = x.successor
+            else:
+                x = _advance(x, y.key)
+        elif not skip_b:
+            yield y.key, None, y.val
+            y = y.successor
+        else:
+            y = _advance(y, x.key)
+    if how != 'inner':
+        while x is not None:
+            yield x.key, x.val, None
+            x = x.successor
+    if how == 'outer':
+        while y is not None:
+            yield y.key, None, y.val
+            y = y.successor
+
+
+def _advance(node: Node, key: K) -> ON:
+    """
+    Return the node with the lowest key greater equal the given one,
+    which is greater than the node's key. Steps to the successor first,
+    which is cheapest if keys are dense, and falls back to a finger
+    search.
+    """
+    succ = node.successor
+    if succ is None or not succ.key < key:
+        return succ
+    return _finger_ceil(succ, key)
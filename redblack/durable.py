@@ -0,0 +1,310 @@
+"""
+Durability layer for trees: a write-ahead log of mutations and periodic
+checkpoints, so a tree can be recovered after a crash without rebuilding
+it from upstream data.
+
+A directory holds numbered checkpoints and log segments. Checkpoint n
+is a pickled tree, which stores its keys in sorted order and is rebuilt
+in linear time, holding all mutations logged in segments before n. On
+recovery, the latest checkpoint is loaded and the mutations logged in
+the segments from n onwards are replayed.
+
+Log records consist of the payload size, its CRC32 and the pickled
+payload. A record torn by a crash fails the checksum and ends replay.
+"""
+from __future__ import annotations
+
+import os
+import pickle
+import struct
+import threading
+import zlib
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    )
+
+from .tree import K, ON, Node, Tree
+from .treedict import TreeDict, V
+
+
+INSERT, REMOVE = range(2)
+_RECORD = struct.Struct('<II')
+_CHECKPOINT = 'checkpoint.{:012d}'
+_SEGMENT = 'wal.{:012d}'
+
+
+def _numbered(directory: str, prefix: str) -> List[int]:
+    """
+    Return the sorted numbers of all files named prefix.number.
+    """
+    nums = []
+    for name in os.listdir(directory):
+        head, _, tail = name.partition('.')
+        if head == prefix and tail.isdigit():
+            nums.append(int(tail))
+    return sorted(nums)
+
+
+def _fsync_dir(directory: str) -> None:
+    """
+    Make the creation, renaming and removal of files in the directory
+    durable. Windows can't open directories and doesn't need this.
+    """
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_log(path: str) -> Iterator[Tuple[Any, ...]]:
+    """
+    Yield the mutations logged in a segment, up to the first incomplete
+    or corrupt record.
+    """
+    with open(path, 'rb') as f:
+        buf = f.read()
+    pos = 0
+    end = len(buf) - _RECORD.size
+    while pos <= end:
+        size, crc = _RECORD.unpack_from(buf, pos)
+        pos += _RECORD.size
+        payload = buf[pos:pos + size]
+        if len(payload) < size or zlib.crc32(payload) != crc:
+            return
+        pos += size
+        yield pickle.loads(payload)
+
+
+class DurableTree:
+    """
+    Wrapper around a Tree or TreeDict logging every mutation before
+    returning. Log records are buffered and written with a single fsync
+    once 'sync_every' mutations are pending or the oldest pending one
+    waited 'sync_interval' seconds (group commit), so a crash loses at
+    most the mutations of that window.
+
+    Reads go straight to the wrapped tree, also accessible as 'tree'.
+    Mutating the wrapped tree directly bypasses the log.
+    """
+    def __init__(
+            self,
+            directory: str,
+            factory: Callable[[], Tree] = TreeDict,
+            sync_every: int = 1000,
+            sync_interval: Optional[float] = 0.01,
+            checkpoint_every: Optional[int] = None,
+            ):
+        """
+        :param directory: Directory of checkpoints and log segments. If
+            it holds a previous state, the tree is recovered from it.
+        :param factory: Creates the empty tree if there is no
+            checkpoint. Trees are pickled, so any accumulator function
+            must be picklable, as well.
+        :param sync_every: Maximal number of mutations per fsync. Pass 1
+            to sync every mutation.
+        :param sync_interval: Seconds after which pending mutations are
+            synced by a background thread. Pass None to sync only every
+            'sync_every' mutations.
+        :param checkpoint_every: Number of mutations after which a
+            checkpoint is written automatically. Pass None to only write
+            checkpoints when calling checkpoint().
+        """
+        self.directory = directory
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.checkpoint_every = checkpoint_every
+        os.makedirs(directory, exist_ok=True)
+        self.tree, last = recover(directory, factory)
+        # Never append to a recovered segment, its tail may be torn
+        self._segment = last + 1
+        self._file = open(self._path(_SEGMENT, self._segment), 'ab')
+        _fsync_dir(directory)
+        self._buf = bytearray()
+        self._pending = 0
+        self._since_checkpoint = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if sync_interval is not None:
+            self._flusher = threading.Thread(target=self._flush_loop,
+                                             daemon=True)
+            self._flusher.start()
+
+    def _path(self, pattern: str, num: int) -> str:
+        return os.path.join(self.directory, pattern.format(num))
+
+    def _apply(
+            self,
+            mutate: Callable[[], Any],
+            record: Tuple[Any, ...],
+            ) -> Any:
+        """
+        Call 'mutate' and log the record describing it. Both happen
+        under the lock, so a checkpoint either holds a mutation or the
+        segment after it logs the mutation, never both.
+        """
+        payload = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            result = mutate()
+            self._buf += _RECORD.pack(len(payload), zlib.crc32(payload))
+            self._buf += payload
+            self._pending += 1
+            if self._pending >= self.sync_every:
+                self._sync()
+            self._since_checkpoint += 1
+            due = (self.checkpoint_every is not None
+                   and self._since_checkpoint >= self.checkpoint_every)
+        if due:
+            self.checkpoint()
+        return result
+
+    def _sync(self) -> None:
+        """
+        Write and fsync all pending records. Requires the lock.
+        """
+        if not self._buf:
+            return
+        self._file.write(self._buf)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._buf.clear()
+        self._pending = 0
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.sync_interval):
+            with self._lock:
+                self._sync()
+
+    def sync(self) -> None:
+        """
+        Make all logged mutations durable.
+        """
+        with self._lock:
+            self._sync()
+
+    def checkpoint(self) -> None:
+        """
+        Write the tree as new checkpoint, start a new log segment and
+        delete the checkpoints and segments the new one supersedes.
+        """
+        with self._lock:
+            self._sync()
+            self._file.close()
+            self._segment += 1
+            self._file = open(self._path(_SEGMENT, self._segment), 'ab')
+            # Copy the tree as of the rotation. Cloning the nodes is
+            # quicker than pickling, which is done after releasing the
+            # lock.
+            snapshot = self.tree.copy()
+            segment = self._segment
+            self._since_checkpoint = 0
+        path = self._path(_CHECKPOINT, segment)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(snapshot, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        # The checkpoint and the new segment must be on disk before the
+        # files they supersede are removed
+        _fsync_dir(self.directory)
+        for num in _numbered(self.directory, 'checkpoint'):
+            if num < segment:
+                os.remove(self._path(_CHECKPOINT, num))
+        for num in _numbered(self.directory, 'wal'):
+            if num < segment:
+                os.remove(self._path(_SEGMENT, num))
+
+    def close(self) -> None:
+        """
+        Sync the log and stop the background thread. The tree stays
+        usable, but further mutations are not logged.
+        """
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            self._sync()
+            self._file.close()
+
+    def __enter__(self) -> DurableTree:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.tree)
+
+    def __iter__(self) -> Iterator[Node]:
+        return iter(self.tree)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.tree
+
+    def __getitem__(self, key: Union[K, slice]) -> Union[Node, List[Node]]:
+        return self.tree[key]
+
+    def __setitem__(self, key: K, val: V) -> Tuple[Node, bool]:
+        return self._apply(lambda: self.tree.__setitem__(key, val),
+                           (INSERT, key, val))
+
+    def __delitem__(self, key: K) -> Node:
+        return self._apply(lambda: self.tree.__delitem__(key), (REMOVE, key))
+
+    def insert(self, *args) -> Tuple[Node, bool]:
+        return self._apply(lambda: self.tree.insert(*args), (INSERT, *args))
+
+    def remove(self, node: Node) -> Node:
+        return self._apply(lambda: self.tree.remove(node), (REMOVE, node.key))
+
+    def floor_and_ceil(self, key: K) -> Tuple[ON, ON]:
+        return self.tree.floor_and_ceil(key)
+
+    def get_neighbors(self, key: K) -> Tuple[ON, ON]:
+        return self.tree.get_neighbors(key)
+
+
+def recover(
+        directory: str,
+        factory: Callable[[], Tree] = TreeDict,
+        ) -> Tuple[Tree, int]:
+    """
+    Load the latest checkpoint in the directory and replay the log
+    segments written after it. Return the tree and the number of the
+    last segment.
+    :param factory: Creates the empty tree if there is no checkpoint
+    """
+    checkpoints = _numbered(directory, 'checkpoint')
+    if checkpoints:
+        start = checkpoints[-1]
+        with open(os.path.join(directory, _CHECKPOINT.format(start)),
+                  'rb') as f:
+            tree = pickle.load(f)
+    else:
+        start = 0
+        tree = factory()
+    last = start
+    for num in _numbered(directory, 'wal'):
+        if num < start:
+            continue
+        last = num
+        for op, key, *val in read_log(
+                os.path.join(directory, _SEGMENT.format(num))):
+            if op == INSERT:
+                tree.insert(key, *val)
+            else:
+                try:
+                    del tree[key]
+                except KeyError:
+                    pass
+    return tree, last
@@ -0,0 +1,631 @@
+"""
+Alternative balancing engines behind the Tree and TreeDict API.
+
+Tree keeps its red-black balancing in two methods: _try_rebalance(),
+called with every node insert() links as a leaf, and _remove(), called
+with a node of at most one child that remove() unlinks. The linear-time
+constructors call _linked() once the nodes are linked. Everything else,
+traversal along Node parent pointers, floor_and_ceil(), slicing and the
+TreeDict semantics, only relies on the nodes forming a search tree, so
+the engines here override just these methods and store their balance
+information in a 'rank' slot instead of the color:
+
+- AVLTree: rank is the subtree height, which differs by at most one
+  between siblings. The shallowest of the engines, so lookups descend
+  the fewest nodes, at the price of more rotations on updates.
+- WAVLTree: rank differences to the parent are one or two and leaves
+  have rank one. Inserting builds the same trees as AVLTree, but
+  removal does at most two rotations, fewer than both AVL and
+  red-black trees.
+- TreapTree: rank is a random priority, which parents exceed. No
+  bookkeeping beyond the priority, but the trees are only balanced in
+  expectation.
+- SplayTree: no balance information at all. Every lookup rotates the
+  node found to the root, so frequently accessed keys stay close to it,
+  with amortized logarithmic costs for any access sequence.
+
+Each has a dictionary variant, e.g. AVLTreeDict.
+"""
+from __future__ import annotations
+
+import random
+from collections import deque
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+    overload,
+    )
+
+from .tree import K, ON, Node, Tree
+from .treedict import DictNode, TreeDict
+
+
+class RankNode(Node):
+    """
+    Node storing an integer or float rank used by a balancing engine.
+    """
+    __slots__ = ('rank',)
+
+    def __init__(self, *args, rank: float = 1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rank = rank
+
+    def __str__(self) -> str:
+        return f"({self.key}, {self.rank})"
+
+
+class RankDictNode(DictNode):
+    """
+    Dictionary node storing an integer or float rank used by a balancing
+    engine.
+    """
+    __slots__ = ('rank',)
+
+    def __init__(self, *args, rank: float = 1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rank = rank
+
+    def __str__(self) -> str:
+        return f"({self.key}, {self.val}, {self.rank})"
+
+
+class TreapNode(RankNode):
+    """
+    Node drawing a random priority as rank.
+    """
+    __slots__ = ()
+
+    def __init__(self, *args, rank: Optional[float] = None, **kwargs):
+        if rank is None:
+            rank = random.random()
+        super().__init__(*args, rank=rank, **kwargs)
+
+
+class TreapDictNode(RankDictNode):
+    """
+    Dictionary node drawing a random priority as rank.
+    """
+    __slots__ = ()
+
+    def __init__(self, *args, rank: Optional[float] = None, **kwargs):
+        if rank is None:
+            rank = random.random()
+        super().__init__(*args, rank=rank, **kwargs)
+
+
+def _level_order(root: ON) -> List[Node]:
+    """
+    Return the nodes below root, parents before their children.
+    """
+    nodes: List[Node] = []
+    queue = deque([root] if root else [])
+    while queue:
+        node = queue.popleft()
+        nodes.append(node)
+        if node.left:
+            queue.append(node.left)
+        if node.right:
+            queue.append(node.right)
+    return nodes
+
+
+def _set_heights(root: ON) -> None:
+    """
+    Set the rank of every node below root to the height of its subtree,
+    one for leaves.
+    """
+    for node in reversed(_level_order(root)):
+        left, right = node.left, node.right
+        node.rank = max(left.rank if left else 0,
+                        right.rank if right else 0) + 1
+
+
+class EngineTree(Tree):
+    """
+    Base of balancing engines replacing the red-black balancing. Child
+    classes implement the balancing in _try_rebalance(), _remove() and
+    _linked(), and check their invariants per node in _check_node().
+    """
+    def _splice(self, node: Node) -> Tuple[ON, bool]:
+        """
+        Unlink a node with one child or less, replacing it by its child.
+        Return the former parent and whether the node was its left
+        child.
+        """
+        child = node.left if node.left else node.right
+        parent = node.parent
+        if child:
+            child.parent = parent
+        if parent is None:
+            self.root = child
+            return None, False
+        if parent.left is node:
+            parent.left = child
+            return parent, True
+        parent.right = child
+        return parent, False
+
+    def _check_node(self, node: Node) -> None:
+        """
+        Raise AssertionError if the node violates the engine's balance
+        invariant.
+        """
+        pass
+
+    def validate(self) -> None:
+        """
+        Check the engine's invariants, parent links, key order and the
+        stored length in a single iterative pass. Raises AssertionError
+        describing the first violation found.
+        """
+        root = self.root
+        if root is None:
+            if self._len:
+                raise AssertionError(f"Empty tree has length {self._len}")
+            return
+        if root.parent is not None:
+            raise AssertionError("Root has a parent")
+        count = 0
+        # (node, exclusive lower and upper key bound)
+        stack: List[Tuple[Node, ON, ON]] = [(root, None, None)]
+        while stack:
+            node, lo, hi = stack.pop()
+            count += 1
+            if (lo is not None and not lo.key < node.key) \
+                    or (hi is not None and not node.key < hi.key):
+                raise AssertionError(f"Node {node} violates key order")
+            for child in (node.left, node.right):
+                if child is not None and child.parent is not node:
+                    raise AssertionError(
+                        f"Parent link of {child} doesn't point to {node}")
+            self._check_node(node)
+            if node.left:
+                stack.append((node.left, lo, node))
+            if node.right:
+                stack.append((node.right, node, hi))
+        if count != self._len:
+            raise AssertionError(
+                f"Tree has {count} nodes, but length {self._len}")
+
+
+class RankTree(EngineTree):
+    """
+    Base of balancing engines storing a rank per node instead of a
+    color.
+    """
+    nodetype: ClassVar[Type[Node]] = RankNode
+
+    def _clone_node(self, node: Node) -> Node:
+        clone = super()._clone_node(node)
+        clone.rank = node.rank
+        return clone
+
+
+class AVLTree(RankTree):
+    """
+    AVL tree: the heights of sibling subtrees differ by one at most.
+    """
+    def _linked(self) -> None:
+        _set_heights(self.root)
+
+    def _try_rebalance(self, node: Node) -> None:
+        node.rank = 1
+        self._retrace(node.parent)
+
+    def _remove(self, node: Node) -> None:
+        self._retrace(self._splice(node)[0])
+
+    def _retrace(self, node: ON) -> None:
+        """
+        Update heights from the node upwards, rotating where siblings
+        differ by two, until a subtree keeps its height.
+        """
+        while node:
+            old = node.rank
+            node = self._balance(node)
+            if node.rank == old:
+                return
+            node = node.parent
+
+    def _balance(self, node: Node) -> Node:
+        """
+        Restore the height difference of the node's children and update
+        its height. Return the node now at its position.
+        """
+        left, right = node.left, node.right
+        lh = left.rank if left else 0
+        rh = right.rank if right else 0
+        if lh > rh + 1:
+            assert left
+            inner = left.right
+            outer = left.left
+            if inner and (not outer or inner.rank > outer.rank):
+                self._rotate_left(inner, left)
+                _update_height(left)
+                left = inner
+            self._rotate_right(left, node)
+            _update_height(node)
+            _update_height(left)
+            return left
+        if rh > lh + 1:
+            assert right
+            inner = right.left
+            outer = right.right
+            if inner and (not outer or inner.rank > outer.rank):
+                self._rotate_right(inner, right)
+                _update_height(right)
+                right = inner
+            self._rotate_left(right, node)
+            _update_height(node)
+            _update_height(right)
+            return right
+        node.rank = (lh if lh > rh else rh) + 1
+        return node
+
+    def _check_node(self, node: Node) -> None:
+        lh = node.left.rank if node.left else 0
+        rh = node.right.rank if node.right else 0
+        if node.rank != max(lh, rh) + 1:
+            raise AssertionError(f"Height of {node} is wrong")
+        if abs(lh - rh) > 1:
+            raise AssertionError(f"Subtrees of {node} differ in height")
+
+
+def _update_height(node: Node) -> None:
+    left, right = node.left, node.right
+    lh = left.rank if left else 0
+    rh = right.rank if right else 0
+    node.rank = (lh if lh > rh else rh) + 1
+
+
+class WAVLTree(RankTree):
+    """
+    Weak AVL tree: every node's rank exceeds its children's by one or
+    two, and leaves have rank one, missing children rank zero.
+    Insertions rebalance like AVLTree, removals do at most two rotations
+    and amortized constant rank changes.
+    """
+    def _linked(self) -> None:
+        # Heights of a tree balanced by linking are valid ranks
+        _set_heights(self.root)
+
+    def _try_rebalance(self, node: Node) -> None:
+        node.rank = 1
+        parent = node.parent
+        # Promote parents while the node's rank equals its parent's
+        while parent and parent.rank == node.rank:
+            if parent.left is node:
+                sibling = parent.right
+            else:
+                sibling = parent.left
+            if parent.rank - (sibling.rank if sibling else 0) == 1:
+                parent.rank += 1
+                node = parent
+                parent = node.parent
+                continue
+            # The sibling is a 2-child, rotate the node up
+            if parent.left is node:
+                inner = node.right
+                if inner is None or node.rank - inner.rank == 2:
+                    self._rotate_right(node, parent)
+                    parent.rank -= 1
+                else:
+                    self._rotate_left(inner, node)
+                    self._rotate_right(inner, parent)
+                    inner.rank += 1
+                    node.rank -= 1
+                    parent.rank -= 1
+            else:
+                inner = node.left
+                if inner is None or node.rank - inner.rank == 2:
+                    self._rotate_left(node, parent)
+                    parent.rank -= 1
+                else:
+                    self._rotate_right(inner, node)
+                    self._rotate_left(inner, parent)
+                    inner.rank += 1
+                    node.rank -= 1
+                    parent.rank -= 1
+            return
+
+    def _remove(self, node: Node) -> None:
+        parent, is_left = self._splice(node)
+        if parent is None:
+            return
+        child = parent.left if is_left else parent.right
+        if parent.left is None and parent.right is None and parent.rank == 2:
+            # A leaf of rank two
+            parent.rank = 1
+            child = parent
+            parent = child.parent
+            if parent:
+                is_left = parent.left is child
+        # Demote or rotate while the child is a 3-child
+        while parent and parent.rank - (child.rank if child else 0) == 3:
+            sibling = parent.right if is_left else parent.left
+            assert sibling
+            if parent.rank - sibling.rank == 2:
+                parent.rank -= 1
+            else:
+                sl = sibling.left.rank if sibling.left else 0
+                sr = sibling.right.rank if sibling.right else 0
+                if sibling.rank - sl == 2 and sibling.rank - sr == 2:
+                    parent.rank -= 1
+                    sibling.rank -= 1
+                else:
+                    self._rotate_removal(parent, sibling, is_left)
+                    return
+            child = parent
+            parent = child.parent
+            if parent:
+                is_left = parent.left is child
+
+    def _rotate_removal(
+            self,
+            parent: Node,
+            sibling: Node,
+            is_left: bool,
+            ) -> None:
+        """
+        Rebalance a parent of a 3-child by rotating its 1-child sibling,
+        which has a 1-child itself, up.
+        """
+        if is_left:
+            outer, inner = sibling.right, sibling.left
+        else:
+            outer, inner = sibling.left, sibling.right
+        if sibling.rank - (outer.rank if outer else 0) == 1:
+            if is_left:
+                self._rotate_left(sibling, parent)
+            else:
+                self._rotate_right(sibling, parent)
+            sibling.rank += 1
+            parent.rank -= 1
+            if parent.left is None and parent.right is None:
+                parent.rank -= 1
+        else:
+            assert inner
+            if is_left:
+                self._rotate_right(inner, sibling)
+                self._rotate_left(inner, parent)
+            else:
+                self._rotate_left(inner, sibling)
+                self._rotate_right(inner, parent)
+            inner.rank += 2
+            sibling.rank -= 1
+            parent.rank -= 2
+
+    def _check_node(self, node: Node) -> None:
+        for child in (node.left, node.right):
+            if node.rank - (child.rank if child else 0) not in (1, 2):
+                raise AssertionError(
+                    f"Rank difference between {node} and {child} is "
+                    f"not one or two")
+        if node.left is None and node.right is None and node.rank != 1:
+            raise AssertionError(f"Leaf {node} doesn't have rank one")
+
+
+class TreapTree(RankTree):
+    """
+    Treap: a search tree by key and a heap by random priority, so its
+    shape is that of a tree built by inserting the keys in random order.
+    """
+    nodetype: ClassVar[Type[Node]] = TreapNode
+
+    def _linked(self) -> None:
+        # Hand out sorted random priorities, parents before children
+        nodes = _level_order(self.root)
+        ranks = sorted((random.random() for _ in nodes), reverse=True)
+        for node, rank in zip(nodes, ranks):
+            node.rank = rank
+
+    def _try_rebalance(self, node: Node) -> None:
+        parent = node.parent
+        while parent and parent.rank < node.rank:
+            if parent.left is node:
+                self._rotate_right(node, parent)
+            else:
+                self._rotate_left(node, parent)
+            parent = node.parent
+
+    def _remove(self, node: Node) -> None:
+        # Replacing a node of one child or less by that child keeps the
+        # heap order.
+        self._splice(node)
+
+    def _check_node(self, node: Node) -> None:
+        for child in (node.left, node.right):
+            if child is not None and child.rank > node.rank:
+                raise AssertionError(
+                    f"Priority of {child} exceeds its parent's")
+
+
+class SplayTree(EngineTree):
+    """
+    Splay tree: lookups rotate the node found, or the last one visited,
+    to the root, as do inserts and removals with the node inserted or
+    the parent of the one removed. Keys looked up often are thus found
+    after a few steps, with amortized logarithmic costs for any access
+    sequence.
+
+    Rotations are what make splaying expensive in Python, so lookups
+    splay less eagerly by default, both settable per tree:
+    - Only nodes deeper than 'splay_depth' are splayed. Shallower
+      lookups cost constant time, so the amortized bounds hold for any
+      threshold, while hot keys stop paying for rotations once they are
+      close enough to the root.
+    - Deeper nodes are splayed with probability 'splay_probability'.
+      Randomized splaying keeps the amortized bounds in expectation,
+      since hot keys are still splayed often, but cold keys rarely push
+      them down.
+    Set both to 0 and 1 for classic splaying.
+
+    Lookups don't splay while an iterator over the tree is open, so
+    reading the tree inside a loop over it is safe. Otherwise, lookups
+    may rotate, so they count as modifications for cursors merge() and
+    join() hold and are unsafe under a shared read lock.
+    """
+    # Depth below the root up to which lookups don't splay
+    splay_depth: int = 8
+    # Probability of splaying a deeper node
+    splay_probability: float = 0.05
+    # Number of open iterators, which pause splaying
+    _iterating: int = 0
+
+    @overload
+    def __getitem__(self, key: slice) -> List[Node]:
+        pass
+
+    @overload
+    def __getitem__(self, key: K) -> Node:
+        pass
+
+    def __getitem__(self, key: Union[K, slice]) -> Union[Node, List[Node]]:
+        if isinstance(key, slice):
+            return super().__getitem__(key)
+        node = self.root
+        last = None
+        depth = -1
+        while node:
+            last = node
+            depth += 1
+            if key < node.key:
+                node = node.left
+            elif key > node.key:
+                node = node.right
+            else:
+                if depth > self.splay_depth and not self._iterating \
+                        and random.random() < self.splay_probability:
+                    self._splay(node)
+                return node
+        if depth > self.splay_depth and not self._iterating \
+                and random.random() < self.splay_probability:
+            # Splaying misses, too, keeps the amortized bounds
+            self._splay(last)
+        raise KeyError(key)
+
+    def copy(self) -> Tree:
+        new = super().copy()
+        new._iterating = 0  # type: ignore[attr-defined]
+        return new
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = super().__getstate__()
+        state.pop('_iterating', None)
+        return state
+
+    def _try_rebalance(self, node: Node) -> None:
+        self._splay(node)
+
+    def _remove(self, node: Node) -> None:
+        parent = self._splice(node)[0]
+        if parent is not None:
+            self._splay(parent)
+
+    def _splay(self, node: Node) -> None:
+        """
+        Rotate the node up to the root, pairwise in zig-zig and zig-zag
+        steps, which roughly halves the depth of the nodes on its path.
+        Rotations are inlined, skipping the key comparisons of
+        _set_parent(), as they dominate the cost of splaying.
+        """
+        self._version += 1
+        parent = node.parent
+        while parent is not None:
+            grampa = parent.parent
+            if grampa is not None and \
+                    (grampa.left is parent) == (parent.left is node):
+                # Zig-zig: rotate the parent up first
+                _rotate_up(parent, grampa)
+            _rotate_up(node, parent)
+            if grampa is not None and node.parent is grampa:
+                # Zig-zag: rotate the node up a second time
+                _rotate_up(node, grampa)
+            parent = node.parent
+        self.root = node
+
+
+def _pausing_splays(name: str) -> Callable:
+    """
+    Wrap the SplayTree iteration method of the given name so that
+    lookups don't splay while the iterator it returns is open.
+    """
+    method = getattr(TreeDict if name in ('values', 'items') else Tree, name)
+
+    def wrapper(self, *args, **kwargs) -> Iterator:
+        self._iterating += 1
+        try:
+            yield from getattr(super(SplayTree, self), name)(*args, **kwargs)
+        finally:
+            self._iterating -= 1
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for _name in ('__iter__', '__reversed__', 'keys', 'iter_unchecked',
+              'iter_from', 'reverse_from', '_iter_slice', '_chunks'):
+    setattr(SplayTree, _name, _pausing_splays(_name))
+
+
+def _rotate_up(child: Node, parent: Node) -> None:
+    """
+    Rotate the child above its parent, relinking the grandparent.
+    """
+    grampa = parent.parent
+    if parent.left is child:
+        inner = child.right
+        parent.left = inner
+        child.right = parent
+    else:
+        inner = child.left
+        parent.right = inner
+        child.left = parent
+    if inner is not None:
+        inner.parent = parent
+    parent.parent = child
+    child.parent = grampa
+    if grampa is not None:
+        if grampa.left is parent:
+            grampa.left = child
+        else:
+            grampa.right = child
+
+
+class AVLTreeDict(AVLTree, TreeDict):
+    """
+    Dictionary based on an AVL tree.
+    """
+    nodetype: ClassVar[Type[Node]] = RankDictNode
+
+
+class WAVLTreeDict(WAVLTree, TreeDict):
+    """
+    Dictionary based on a weak AVL tree.
+    """
+    nodetype: ClassVar[Type[Node]] = RankDictNode
+
+
+class TreapTreeDict(TreapTree, TreeDict):
+    """
+    Dictionary based on a treap.
+    """
+    nodetype: ClassVar[Type[Node]] = TreapDictNode
+
+
+class SplayTreeDict(SplayTree, TreeDict):
+    """
+    Dictionary based on a splay tree.
+    """
+
+
+for _name in ('values', 'items'):
+    setattr(SplayTreeDict, _name, _pausing_splays(_name))
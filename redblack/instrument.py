@@ -0,0 +1,383 @@
+"""
+Opt-in instrumentation of tree operations.
+
+instrumented() derives a subclass of a tree type that counts, for every
+operation, the key comparisons and nodes visited while descending the
+tree, the rotations, recolored nodes and fix-up steps spent
+rebalancing, and the operation's latency. Counters are aggregated per
+operation type and can be exported through hooks:
+
+    tree = instrumented(TreeDict)(acc=operator.add)
+    tree.add_hook(lambda record: export(record.op, record.ns))
+
+Trees created from the original types are unaffected, so instrumentation
+costs nothing unless selected when constructing the tree. Copies of an
+instrumented tree start with counters and hooks of their own, pickled
+trees are loaded uninstrumented.
+"""
+from __future__ import annotations
+
+import threading
+from time import perf_counter_ns
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    )
+
+from .tree import K, ON, Node, Tree
+from .treedict import TreeDict
+
+
+T = TypeVar('T', bound=Tree)
+
+
+class OpRecord:
+    """
+    Counters collected during a single tree operation.
+    """
+    __slots__ = (
+        'op',
+        'comparisons',
+        'visits',
+        'rotations',
+        'recolors',
+        'fixups',
+        'ns',
+        '_last',
+        )
+
+    def __init__(self, op: str):
+        self.op = op
+        # Key comparisons while descending the tree
+        self.comparisons = 0
+        # Distinct nodes whose key was compared
+        self.visits = 0
+        self.rotations = 0
+        # Nodes whose color changed
+        self.recolors = 0
+        # Steps of the rebalancing after insertion or removal
+        self.fixups = 0
+        # Latency in nanoseconds
+        self.ns = 0
+        self._last: object = None
+
+    def __repr__(self) -> str:
+        return (f"OpRecord({self.op}, comparisons={self.comparisons}, "
+                f"visits={self.visits}, rotations={self.rotations}, "
+                f"recolors={self.recolors}, fixups={self.fixups}, "
+                f"ns={self.ns})")
+
+
+class OpStats:
+    """
+    Counters aggregated over all operations of one type. Latencies are
+    collected in a histogram with power-of-two nanosecond buckets:
+    bucket b counts operations that took less than 2**b ns, but at least
+    2**(b-1) ns.
+    """
+    def __init__(self, op: str):
+        self.op = op
+        self.calls = 0
+        self.comparisons = 0
+        self.visits = 0
+        self.rotations = 0
+        self.recolors = 0
+        self.fixups = 0
+        self.max_fixups = 0
+        self.total_ns = 0
+        self.histogram: Dict[int, int] = {}
+
+    def add(self, rec: OpRecord) -> None:
+        self.calls += 1
+        self.comparisons += rec.comparisons
+        self.visits += rec.visits
+        self.rotations += rec.rotations
+        self.recolors += rec.recolors
+        self.fixups += rec.fixups
+        self.max_fixups = max(self.max_fixups, rec.fixups)
+        self.total_ns += rec.ns
+        b = rec.ns.bit_length()
+        self.histogram[b] = self.histogram.get(b, 0) + 1
+
+    def percentile(self, p: float) -> int:
+        """
+        Return an upper bound in nanoseconds for the latency of the
+        fastest p percent of all operations.
+        """
+        target = self.calls * p / 100
+        seen = 0
+        for b in sorted(self.histogram):
+            seen += self.histogram[b]
+            if seen >= target:
+                return 1 << b
+        return 0
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            'calls': self.calls,
+            'comparisons': self.comparisons,
+            'visits': self.visits,
+            'rotations': self.rotations,
+            'recolors': self.recolors,
+            'fixups': self.fixups,
+            'max_fixups': self.max_fixups,
+            'total_ns': self.total_ns,
+            'histogram': dict(sorted(self.histogram.items())),
+            }
+
+
+class _Local(threading.local):
+    # Record of the operation running in this thread
+    op: Optional[OpRecord] = None
+
+
+_local = _Local()
+
+
+class _Probe:
+    """
+    Wraps a searched key, counting each comparison with a node's key in
+    the running operation's record.
+    """
+    __slots__ = 'key'
+
+    def __init__(self, key: K):
+        self.key = key
+
+    def _count(self, other: object) -> None:
+        rec = _local.op
+        if rec is not None:
+            rec.comparisons += 1
+            if other is not rec._last:
+                rec.visits += 1
+                rec._last = other
+
+    def __lt__(self, other: object) -> bool:
+        self._count(other)
+        return self.key < other
+
+    def __gt__(self, other: object) -> bool:
+        self._count(other)
+        return self.key > other
+
+    def __le__(self, other: object) -> bool:
+        self._count(other)
+        return self.key <= other
+
+    def __ge__(self, other: object) -> bool:
+        self._count(other)
+        return self.key >= other
+
+    def __eq__(self, other: object) -> bool:
+        self._count(other)
+        return self.key == other
+
+    def __ne__(self, other: object) -> bool:
+        self._count(other)
+        return self.key != other
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+
+def _operation(op: str, func: Callable) -> Callable:
+    """
+    Wrap a tree method so that it runs as operation 'op'. Operations
+    called by other operations count towards the outermost one.
+    """
+    def wrapper(self, *args, **kwargs):
+        if _local.op is not None:
+            return func(self, *args, **kwargs)
+        rec = _local.op = OpRecord(op)
+        start = perf_counter_ns()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            rec.ns = perf_counter_ns() - start
+            _local.op = None
+            self._record(rec)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+class InstrumentedMixin:
+    """
+    Mixed into tree types by instrumented().
+    """
+    # Tree type the instrumented type was derived from
+    _uninstrumented: Type[Tree]
+
+    def __init__(self, *args, **kwargs):
+        self.instrumentation: Dict[str, OpStats] = {}
+        self._hooks: List[Callable[[OpRecord], None]] = []
+        super().__init__(*args, **kwargs)
+
+    def add_hook(self, hook: Callable[[OpRecord], None]) -> None:
+        """
+        Register a function called with the record of every finished
+        operation.
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[OpRecord], None]) -> None:
+        self._hooks.remove(hook)
+
+    def reset_instrumentation(self) -> None:
+        """
+        Discard all aggregated counters.
+        """
+        self.instrumentation.clear()
+
+    def _record(self, rec: OpRecord) -> None:
+        stats = self.instrumentation.get(rec.op)
+        if stats is None:
+            stats = self.instrumentation[rec.op] = OpStats(rec.op)
+        stats.add(rec)
+        for hook in self._hooks:
+            hook(rec)
+
+    def copy(self) -> Tree:
+        new = super().copy()
+        new.instrumentation = {}
+        new._hooks = []
+        return new
+
+    __copy__ = copy
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = super().__getstate__()
+        state.pop('instrumentation', None)
+        state.pop('_hooks', None)
+        return state
+
+    def __reduce_ex__(self, protocol: Any) -> Tuple[Any, ...]:
+        # Pickle as the uninstrumented type, instrumented types only
+        # exist at runtime
+        return object.__new__, (self._uninstrumented,), self.__getstate__()
+
+    def __getitem__(self, key: Union[K, slice]) -> Union[Node, List[Node]]:
+        if isinstance(key, slice):
+            return self._slice(key)
+        return self._lookup(key)
+
+    def _slice(self, key: slice) -> List[Node]:
+        return super().__getitem__(key)
+
+    def _lookup(self, key: K) -> Node:
+        try:
+            return super().__getitem__(_Probe(key))
+        except KeyError:
+            raise KeyError(key) from None
+
+    def insert(self, *args, **kwargs):
+        return super().insert(*args, **kwargs)
+
+    def remove(self, node: Node) -> Node:
+        return super().remove(node)
+
+    def __delitem__(self, key: K) -> Node:
+        return super().__delitem__(key)
+
+    def floor_and_ceil(self, key: K) -> Tuple[ON, ON]:
+        return super().floor_and_ceil(_Probe(key))
+
+    def get_neighbors(self, key: K) -> Tuple[ON, ON]:
+        return super().get_neighbors(_Probe(key))
+
+    def _find_parent(self, key: K):
+        return super()._find_parent(_Probe(key))
+
+    def _rotate_left(self, a: Node, b: Node) -> None:
+        rec = _local.op
+        if rec is not None:
+            rec.rotations += 1
+        super()._rotate_left(a, b)
+
+    def _rotate_right(self, a: Node, b: Node) -> None:
+        rec = _local.op
+        if rec is not None:
+            rec.rotations += 1
+        super()._rotate_right(a, b)
+
+    def _try_rebalance(self, node: Node) -> None:
+        rec = _local.op
+        if rec is not None:
+            rec.fixups += 1
+        super()._try_rebalance(node)
+
+    def _prepare_removal(self, node: Node) -> None:
+        rec = _local.op
+        if rec is not None:
+            rec.fixups += 1
+        super()._prepare_removal(node)
+
+
+for _name, _op in (
+        ('_slice', 'slice'),
+        ('_lookup', 'lookup'),
+        ('insert', 'insert'),
+        ('remove', 'remove'),
+        ('__delitem__', 'remove'),
+        ('floor_and_ceil', 'floor_and_ceil'),
+        ('get_neighbors', 'get_neighbors'),
+        ):
+    setattr(InstrumentedMixin, _name,
+            _operation(_op, getattr(InstrumentedMixin, _name)))
+
+
+def _counting_nodetype(nodetype: Type[Node]) -> Type[Node]:
+    """
+    Derive a node type counting color changes in the running operation.
+    """
+    slot = Node.red
+
+    def get_red(self) -> bool:
+        return slot.__get__(self)
+
+    def set_red(self, red: bool) -> None:
+        rec = _local.op
+        if rec is not None:
+            try:
+                if slot.__get__(self) != red:
+                    rec.recolors += 1
+            except AttributeError:
+                # Node is just being constructed
+                pass
+        slot.__set__(self, red)
+
+    return type(f'Counting{nodetype.__name__}', (nodetype,), {
+        '__slots__': (),
+        'red': property(get_red, set_red),
+        })
+
+
+_cache: Dict[type, type] = {}
+
+
+def instrumented(treetype: Type[T]) -> Type[T]:
+    """
+    Return a subclass of the given tree type collecting counters for
+    every operation. Repeated calls return the same subclass.
+    """
+    cls = _cache.get(treetype)
+    if cls is None:
+        ns: Dict[str, object] = {
+            'nodetype': _counting_nodetype(treetype.nodetype),
+            '_uninstrumented': treetype,
+            }
+        if issubclass(treetype, TreeDict):
+            ns['__setitem__'] = InstrumentedMixin.insert
+        cls = _cache[treetype] = type(
+            f'Instrumented{treetype.__name__}',
+            (InstrumentedMixin, treetype),
+            ns,
+            )
+    return cls
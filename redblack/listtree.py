@@ -0,0 +1,509 @@
+"""
+Sorted list of lists engine offering the Tree and TreeDict API.
+
+Keys are kept in a list of sorted segments of up to 'segment' keys,
+plus a list of the highest key of every segment. A lookup bisects the
+maxima and then one segment, both in C, and iterating or slicing copies
+whole segments with list slicing instead of stepping from node to node.
+Inserting and removing shift up to 'segment' list items, which is cheap
+in CPython for a few thousand keys. The layout suits bulk loads followed
+by many lookups and range scans with rare updates best.
+
+Like BTree, lookups return Entry handles with 'key' and, in
+ListTreeDict, 'val' attributes. Keys can also be accessed by position
+with at() and index().
+"""
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, chain
+from typing import (
+    Callable,
+    ClassVar,
+    Collection,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Reversible,
+    Tuple,
+    Type,
+    Union,
+    overload,
+    )
+
+from .btree import OE, DictEntry, Entry, _sorted_unique
+from .tree import CHANGED_DURING_ITERATION, K
+from .treedict import V, overwrite
+
+
+class ListTree(Collection, Reversible):
+    """
+    Self-sorting container of unique keys based on a list of sorted
+    lists. Iterators detect modifications of the tree at the end of the
+    segment they are iterating.
+    """
+    # Type of entries to construct. Can be overridden in child classes.
+    entrytype: ClassVar[Type[Entry]] = Entry
+
+    def __init__(self, keys: Iterable[K] = [], segment: int = 2000):
+        """
+        :param keys: Initialize the tree with an entry for each key
+        :param segment: Maximal number of keys per segment. Segments
+            exceeding it are split in halves, segments shrinking below a
+            quarter of it are merged with a neighbor. Must be at least 4.
+        """
+        if segment < 4:
+            raise ValueError("Segment size must be at least 4")
+        self.segment = segment
+        self._keys: List[List[K]] = []
+        self._entries: List[List[Entry]] = []
+        self._maxes: List[K] = []
+        # Position of the first key of every segment and the length,
+        # None until needed after a modification
+        self._offsets: Optional[List[int]] = None
+        self._len = 0
+        # Incremented on every modification, so iterators can detect
+        # that the tree was modified underneath them.
+        self._version = 0
+        for k in keys:
+            self.insert(k)
+
+    @classmethod
+    def load_sorted(cls, keys: Iterable[K], **kwargs) -> ListTree:
+        """
+        Construct a tree from keys in ascending order in O(n), filling
+        segments half, so following inserts rarely split them. Repeated
+        keys are stored once. Keyword arguments are passed on to the
+        constructor.
+        Raises ValueError if a key is less than its predecessor.
+        """
+        make = cls.entrytype
+        return cls._from_sorted_entries(
+            (make(k) for k in keys), lambda old, new: None, **kwargs)
+
+    @classmethod
+    def _from_sorted_entries(
+            cls,
+            entries: Iterable[Entry],
+            merge: Callable[[Entry, Entry], None],
+            **kwargs,
+            ) -> ListTree:
+        """
+        Construct a tree from entries in ascending key order in O(n).
+        'merge' is called with the kept and the dropped entry whenever
+        two consecutive entries share a key.
+        Raises ValueError if a key is less than its predecessor.
+        """
+        tree = cls(**kwargs)
+        keys, kept = _sorted_unique(entries, merge)
+        size = tree.segment // 2
+        starts = range(0, len(kept), size)
+        tree._keys = [keys[i:i + size] for i in starts]
+        tree._entries = [kept[i:i + size] for i in starts]
+        tree._maxes = [seg[-1] for seg in tree._keys]
+        tree._len = len(kept)
+        return tree
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __str__(self) -> str:
+        return ' '.join(map(str, self))
+
+    def __iter__(self) -> Iterator[Entry]:
+        return chain.from_iterable(self._segments(self._entries))
+
+    def __reversed__(self) -> Iterator[Entry]:
+        return chain.from_iterable(self._segments(self._entries, True))
+
+    def keys(self) -> Iterator[K]:
+        """
+        Yield an iterator over all the tree's keys. Iterates copies of
+        whole segments in C, without resuming a generator per key.
+        """
+        return chain.from_iterable(self._segments(self._keys))
+
+    def _segments(
+            self,
+            segments: List[list],
+            reverse: bool = False,
+            ) -> Iterator[list]:
+        """
+        Yield a copy of every segment of keys or entries, reversed if
+        'reverse' is true. Raises RuntimeError when resumed after the
+        tree was modified.
+        """
+        version = self._version
+        for seg in reversed(segments) if reverse else segments:
+            if self._version != version:
+                raise RuntimeError(CHANGED_DURING_ITERATION)
+            yield seg[::-1] if reverse else seg[:]
+        if self._version != version:
+            raise RuntimeError(CHANGED_DURING_ITERATION)
+
+    @property
+    def first(self) -> OE:
+        """
+        Return the lowest-key entry, or None if tree is empty.
+        """
+        return self._entries[0][0] if self._entries else None
+
+    @property
+    def last(self) -> OE:
+        """
+        Return the highest-key entry, or None if tree is empty.
+        """
+        return self._entries[-1][-1] if self._entries else None
+
+    def _find(self, key: K) -> Tuple[int, int]:
+        """
+        Return the segment and the position in it of the lowest key
+        greater equal the given one. The segment is the number of
+        segments if all keys are lower.
+        """
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return i, 0
+        return i, bisect_left(self._keys[i], key)
+
+    @overload
+    def __getitem__(self, key: slice) -> List[Entry]:
+        pass
+
+    @overload
+    def __getitem__(self, key: K) -> Entry:
+        pass
+
+    def __getitem__(self, key: Union[K, slice]) -> Union[Entry, List[Entry]]:
+        """
+        Return the entry of a key, or the entries of a key slice. Slices
+        include the keys greater equal their start and lower than their
+        stop, and take every step-th of those, in reverse order for a
+        negative step.
+        """
+        if isinstance(key, slice):
+            lo = 0 if key.start is None else self._position(key.start)
+            hi = self._len if key.stop is None else self._position(key.stop)
+            return self._take(range(lo, max(lo, hi))[::key.step or 1])
+        i = bisect_left(self._maxes, key)
+        if i < len(self._maxes):
+            keys = self._keys[i]
+            j = bisect_left(keys, key)
+            if keys[j] == key:
+                return self._entries[i][j]
+        raise KeyError(key)
+
+    def __delitem__(self, key: K) -> Entry:
+        return self.remove(self[key])
+
+    def __contains__(self, key: K) -> bool:
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return False
+        keys = self._keys[i]
+        return keys[bisect_left(keys, key)] == key
+
+    def _positions(self) -> List[int]:
+        offsets = self._offsets
+        if offsets is None:
+            offsets = self._offsets = [0]
+            offsets += accumulate(map(len, self._keys))
+        return offsets
+
+    def _position(self, key: K) -> int:
+        """
+        Return the position of the lowest key greater equal the given
+        one, or the length if all keys are lower.
+        """
+        i, j = self._find(key)
+        return self._positions()[i] + j
+
+    def index(self, key: K) -> int:
+        """
+        Return the position of the key in ascending key order.
+        Raises KeyError if the key is not in the tree.
+        """
+        i, j = self._find(key)
+        if i == len(self._keys) or self._keys[i][j] != key:
+            raise KeyError(key)
+        return self._positions()[i] + j
+
+    @overload
+    def at(self, index: int) -> Entry:
+        pass
+
+    @overload
+    def at(self, index: slice) -> List[Entry]:
+        pass
+
+    def at(self, index: Union[int, slice]) -> Union[Entry, List[Entry]]:
+        """
+        Return the entry at a position in ascending key order, or the
+        entries of a slice of positions, like indexing a list.
+        Raises IndexError if the position is out of range.
+        """
+        if isinstance(index, slice):
+            return self._take(range(self._len)[index])
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("Tree index out of range")
+        offsets = self._positions()
+        i = bisect_right(offsets, index) - 1
+        return self._entries[i][index - offsets[i]]
+
+    def _take(self, positions: range) -> List[Entry]:
+        """
+        Return the entries at the positions, slicing each segment once.
+        """
+        if not positions:
+            return []
+        step = positions.step
+        if step < 0:
+            return self._take(positions[::-1])[::-1]
+        pos, stop = positions.start, positions.stop
+        offsets = self._positions()
+        i = bisect_right(offsets, pos) - 1
+        out: List[Entry] = []
+        while pos < stop:
+            base = offsets[i]
+            entries = self._entries[i]
+            if pos - base < len(entries):
+                chunk = entries[pos - base:stop - base:step]
+                out += chunk
+                pos += step * len(chunk)
+            i += 1
+        return out
+
+    def insert(self, key: K) -> Tuple[Entry, bool]:
+        """
+        Add a new entry to the tree. If the key is already present in
+        the tree, return a tuple of the already existent entry and
+        False. Otherwise, return the newly added entry and True.
+        :return: (entry, bool)
+        """
+        return self._insert(key, self.entrytype(key))
+
+    def _insert(self, key: K, entry: Entry) -> Tuple[Entry, bool]:
+        maxes = self._maxes
+        i = bisect_left(maxes, key)
+        if not maxes:
+            self._keys.append([key])
+            self._entries.append([entry])
+            maxes.append(key)
+        elif i == len(maxes):
+            i -= 1
+            self._keys[i].append(key)
+            self._entries[i].append(entry)
+            maxes[i] = key
+        else:
+            keys = self._keys[i]
+            j = bisect_left(keys, key)
+            if keys[j] == key:
+                return self._entries[i][j], False
+            keys.insert(j, key)
+            self._entries[i].insert(j, entry)
+        if len(self._keys[i]) > self.segment:
+            self._split(i)
+        self._offsets = None
+        self._len += 1
+        self._version += 1
+        return entry, True
+
+    def _split(self, i: int) -> None:
+        """
+        Split segment i in halves.
+        """
+        keys = self._keys[i]
+        entries = self._entries[i]
+        half = len(keys) // 2
+        self._keys.insert(i + 1, keys[half:])
+        self._entries.insert(i + 1, entries[half:])
+        del keys[half:]
+        del entries[half:]
+        self._maxes.insert(i, keys[-1])
+
+    def remove(self, entry: Entry) -> Entry:
+        """
+        Remove the given entry from the tree.
+        Raises KeyError if its key is not in the tree.
+        """
+        key = entry.key
+        i, j = self._find(key)
+        if i == len(self._keys) or self._keys[i][j] != key:
+            raise KeyError(key)
+        keys = self._keys[i]
+        del keys[j]
+        removed = self._entries[i].pop(j)
+        if not keys:
+            del self._keys[i]
+            del self._entries[i]
+            del self._maxes[i]
+        else:
+            self._maxes[i] = keys[-1]
+            if len(keys) < self.segment // 4 and len(self._keys) > 1:
+                self._merge(i if i + 1 < len(self._keys) else i - 1)
+        self._offsets = None
+        self._len -= 1
+        self._version += 1
+        return removed
+
+    def _merge(self, i: int) -> None:
+        """
+        Merge segment i + 1 into segment i, splitting the result if it
+        is too large.
+        """
+        self._keys[i] += self._keys.pop(i + 1)
+        self._entries[i] += self._entries.pop(i + 1)
+        del self._maxes[i]
+        if len(self._keys[i]) > self.segment:
+            self._split(i)
+
+    def floor_and_ceil(self, key: K) -> Tuple[OE, OE]:
+        """
+        For a given key, return its floor and ceil entries in the tree.
+        Floor is an entry with a key less equal the given key.
+        Ceil is an entry with a key greater equal the given key.
+        Both entries are the same if the tree contains a key matching
+        the given one. None is returned for an entry that wasn't found.
+        :return (floor entry, ceil entry):
+        """
+        i, j = self._find(key)
+        if i == len(self._keys):
+            return self.last, None
+        ceil = self._entries[i][j]
+        if self._keys[i][j] == key:
+            return ceil, ceil
+        return self._before(i, j), ceil
+
+    def get_neighbors(self, key: K) -> Tuple[OE, OE]:
+        """
+        For a given key, return its predecessor and successor entry in
+        the tree. This functions differs from floor_and_ceil() only
+        when a key equal to the passed one exists in the tree. In this
+        case, this function does not return the same entry two times.
+        None is returned for an entry that wasn't found.
+        :return (predecessor entry, successor entry):
+        """
+        i, j = self._find(key)
+        if i == len(self._keys):
+            return self.last, None
+        if self._keys[i][j] != key:
+            return self._before(i, j), self._entries[i][j]
+        if j + 1 < len(self._keys[i]):
+            succ: OE = self._entries[i][j + 1]
+        elif i + 1 < len(self._keys):
+            succ = self._entries[i + 1][0]
+        else:
+            succ = None
+        return self._before(i, j), succ
+
+    def _before(self, i: int, j: int) -> OE:
+        """
+        Return the entry before position j of segment i.
+        """
+        if j:
+            return self._entries[i][j - 1]
+        return self._entries[i - 1][-1] if i else None
+
+    def validate(self) -> None:
+        """
+        Check key order, segment sizes and maxima, entries and the
+        stored length. Raises AssertionError describing the first
+        violation found.
+        """
+        if not len(self._keys) == len(self._entries) == len(self._maxes):
+            raise AssertionError("Segment lists differ in length")
+        prev = None
+        count = 0
+        for keys, entries, top in zip(self._keys, self._entries,
+                                      self._maxes):
+            if not 0 < len(keys) <= self.segment:
+                raise AssertionError(f"Segment has {len(keys)} keys")
+            if prev is not None and not prev < keys[0]:
+                raise AssertionError(f"Key {keys[0]} follows {prev}")
+            if any(not a < b for a, b in zip(keys, keys[1:])):
+                raise AssertionError(f"Keys {keys} are not ascending")
+            if [e.key for e in entries] != keys:
+                raise AssertionError(f"Entries of {keys} differ")
+            if top != keys[-1]:
+                raise AssertionError(f"Maximum of {keys} is {top}")
+            prev = keys[-1]
+            count += len(keys)
+        if count != self._len:
+            raise AssertionError(
+                f"Tree has {count} keys, but length {self._len}")
+
+
+class ListTreeDict(ListTree, MutableMapping[K, V]):
+    """
+    Dictionary based on a list of sorted lists.
+    """
+    entrytype: ClassVar[Type[Entry]] = DictEntry
+
+    def __init__(
+            self,
+            items: Mapping[K, V] = {},
+            acc: Callable[[V, V], V] = overwrite,
+            segment: int = 2000,
+            ):
+        """
+        :param items: Initialize the dictionary with the key, value
+            pairs in the mapping.
+        :param acc: Called with the contained and the passed value when
+            inserting a contained key, returning the value to store. By
+            default, the old value is overridden by the new one.
+        :param segment: See ListTree
+        """
+        super().__init__(segment=segment)
+        self.acc = acc
+        for i in items.items():
+            self.__setitem__(*i)
+
+    @classmethod
+    def load_sorted_items(
+            cls,
+            items: Iterable[Tuple[K, V]],
+            acc: Callable[[V, V], V] = overwrite,
+            **kwargs,
+            ) -> ListTreeDict:
+        """
+        Construct a dictionary from key, value pairs in ascending key
+        order in O(n). Values of repeated keys are combined with 'acc'.
+        Other keyword arguments are passed on to the constructor.
+        Raises ValueError if a key is less than its predecessor.
+        """
+        make = cls.entrytype
+
+        def merge(old: DictEntry, new: DictEntry) -> None:
+            old.val = acc(old.val, new.val)
+
+        return cls._from_sorted_entries(  # type: ignore[return-value]
+            (make(k, v) for k, v in items), merge, acc=acc, **kwargs)
+
+    def __setitem__(self, key: K, val: V) -> Tuple[DictEntry, bool]:
+        entry, success = self._insert(key, self.entrytype(key, val))
+        if not success:
+            entry.val = self.acc(entry.val, val)
+        return entry, success  # type: ignore[return-value]
+
+    insert = __setitem__  # type: ignore[assignment]
+
+    def values(self) -> Iterator[V]:
+        version = self._version
+        for entries in self._entries:
+            for entry in entries:
+                yield entry.val
+            if self._version != version:
+                raise RuntimeError(CHANGED_DURING_ITERATION)
+
+    def items(self) -> Iterator[Tuple[K, V]]:
+        version = self._version
+        for keys, entries in zip(self._keys, self._entries):
+            for key, entry in zip(keys, entries):
+                yield (key, entry.val)
+            if self._version != version:
+                raise RuntimeError(CHANGED_DURING_ITERATION)
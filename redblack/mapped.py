@@ -0,0 +1,283 @@
+"""
+Read-only, memory-mapped snapshot of a tree.
+
+Tree.dump() writes a tree to a file holding its keys as sorted array of
+fixed width, an index of every n-th key and, for dictionaries, a heap
+of pickled values with an offset table. MappedTreeView maps the file
+and answers lookups straight from the mapping, so opening a snapshot
+takes constant time and processes mapping the same file share its
+pages through the OS page cache.
+
+File layout, all integers in native byte order:
+    header          see _HEADER, padded to 64 bytes
+    keys            count keys of 8 bytes each
+    index           every index_stride-th key, 8 bytes each
+    value offsets   count + 1 offsets into the value heap, 8 bytes each
+    value heap      pickled values
+"""
+from __future__ import annotations
+
+import mmap
+import pickle
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import (
+    Any,
+    BinaryIO,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    overload,
+    )
+
+from .tree import K, Node, Tree
+from .treedict import DictNode, TreeDict, V
+
+
+MAGIC = b'RBMV'
+VERSION = 1
+_HEADER = struct.Struct('=4sBcBBQQQQQ')
+_HEADER_SIZE = 64
+_HAS_VALUES = 1
+_LITTLE_ENDIAN = 2
+
+ON = Optional[Node]
+
+
+def dump(
+        tree: Tree,
+        file: Union[str, BinaryIO],
+        index_stride: int = 64,
+        ) -> None:
+    """
+    Write the tree to a snapshot file readable by MappedTreeView. All
+    keys must be ints fitting into 64 bits, or all must be floats.
+    :param file: Path or binary file object to write to
+    :param index_stride: Every index_stride-th key is copied into a
+        separate, small index block. Lookups search the index first and
+        then only a single block of keys, touching fewer pages. Pass 0
+        to omit the index.
+    """
+    nodes = list(tree.iter_unchecked())
+    keys: List[Any] = [n.key for n in nodes]
+    if all(type(k) is int for k in keys):
+        typecode = 'q'
+    elif all(type(k) is float for k in keys):
+        typecode = 'd'
+    else:
+        raise TypeError("Only trees of int or float keys can be dumped")
+    try:
+        key_array = array(typecode, keys)
+    except OverflowError:
+        raise TypeError("Keys must fit into 64 bits") from None
+    index = key_array[::index_stride] if index_stride else array(typecode)
+    keyed = isinstance(tree, TreeDict)
+    flags = (_HAS_VALUES if keyed else 0) \
+        | (_LITTLE_ENDIAN if sys.byteorder == 'little' else 0)
+    keys_off = _HEADER_SIZE
+    index_off = keys_off + 8 * len(keys)
+    vals_off = index_off + 8 * len(index)
+    header = _HEADER.pack(
+        MAGIC, VERSION, typecode.encode(), flags, 0,
+        len(keys), index_stride, keys_off, index_off, vals_off,
+        )
+    if isinstance(file, str):
+        with open(file, 'wb') as f:
+            _write(f, header, key_array, index, nodes if keyed else None)
+    else:
+        _write(file, header, key_array, index, nodes if keyed else None)
+
+
+def _write(
+        f: BinaryIO,
+        header: bytes,
+        keys: array,
+        index: array,
+        nodes: Optional[List[DictNode]],
+        ) -> None:
+    f.write(header.ljust(_HEADER_SIZE, b'\0'))
+    f.write(keys.tobytes())
+    f.write(index.tobytes())
+    if nodes is None:
+        return
+    heap = [pickle.dumps(n.val, pickle.HIGHEST_PROTOCOL) for n in nodes]
+    offsets = array('Q', [0])
+    for blob in heap:
+        offsets.append(offsets[-1] + len(blob))
+    f.write(offsets.tobytes())
+    for blob in heap:
+        f.write(blob)
+
+
+class MappedTreeView:
+    """
+    Read-only view of a tree snapshot written by Tree.dump(). Keys are
+    searched by bisecting the mapped key array in place, and values are
+    only unpickled when accessed.
+
+    Lookups return unlinked nodes created on access, so the interface
+    matches the one of Tree or TreeDict for reading.
+    """
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, typecode, flags, _, count, self.index_stride,
+         keys_off, index_off, vals_off) = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is no tree snapshot")
+        if bool(flags & _LITTLE_ENDIAN) != (sys.byteorder == 'little'):
+            self._mmap.close()
+            raise ValueError(f"{path} was written with other byte order")
+        self._count = count
+        self.has_values = bool(flags & _HAS_VALUES)
+        self.nodetype = DictNode if self.has_values else Node
+        buf = memoryview(self._mmap)
+        tc = typecode.decode()
+        # Zero-copy views into the mapping, indexable like lists
+        self._keys = buf[keys_off:index_off].cast(tc)
+        # The index is small and searched first, so keep it in memory
+        self._index = array(tc, buf[index_off:vals_off].tobytes())
+        if self.has_values:
+            heap_off = vals_off + 8 * (count + 1)
+            self._offsets = buf[vals_off:heap_off].cast('Q')
+            self._heap = buf[heap_off:]
+
+    def close(self) -> None:
+        """
+        Unmap the file. Nodes handed out before stay valid, iterators
+        do not.
+        """
+        self._keys.release()
+        if self.has_values:
+            self._offsets.release()
+            self._heap.release()
+        self._mmap.close()
+
+    def __enter__(self) -> MappedTreeView:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Node]:
+        for i in range(self._count):
+            yield self._node(i)
+
+    def __reversed__(self) -> Iterator[Node]:
+        for i in range(self._count - 1, -1, -1):
+            yield self._node(i)
+
+    def __contains__(self, key: K) -> bool:
+        i = self._bisect_left(key)
+        return i < self._count and self._keys[i] == key
+
+    @overload
+    def __getitem__(self, key: slice) -> List[Node]:
+        pass
+
+    @overload
+    def __getitem__(self, key: K) -> Node:
+        pass
+
+    def __getitem__(self, key: Union[K, slice]) -> Union[Node, List[Node]]:
+        if isinstance(key, slice):
+            if key.step is not None:
+                raise NotImplementedError(
+                    "Slice steps are not implemented"
+                    )
+            begin = 0 if key.start is None else self._bisect_left(key.start)
+            end = self._count if key.stop is None \
+                else self._bisect_left(key.stop)
+            return [self._node(i) for i in range(begin, end)]
+        i = self._bisect_left(key)
+        if i < self._count and self._keys[i] == key:
+            return self._node(i)
+        raise KeyError(key)
+
+    @property
+    def first(self) -> ON:
+        return self._node(0) if self._count else None
+
+    @property
+    def last(self) -> ON:
+        return self._node(self._count - 1) if self._count else None
+
+    def keys(self) -> Iterator[K]:
+        return iter(self._keys)
+
+    def values(self) -> Iterator[V]:
+        for i in range(self._count):
+            yield self._value(i)
+
+    def items(self) -> Iterator[Tuple[K, V]]:
+        keys = self._keys
+        for i in range(self._count):
+            yield keys[i], self._value(i)
+
+    def keys_buffer(
+            self,
+            lo: Optional[K] = None,
+            hi: Optional[K] = None,
+            ) -> memoryview:
+        """
+        Return the keys in [lo, hi) as memoryview of the mapping, without
+        copying. It supports the buffer protocol, so for instance
+        numpy.frombuffer() wraps it without a copy, too. The view must
+        be released before closing the tree view.
+        """
+        begin = 0 if lo is None else self._bisect_left(lo)
+        end = self._count if hi is None else self._bisect_left(hi)
+        return self._keys[begin:end]
+
+    def floor_and_ceil(self, key: K) -> Tuple[ON, ON]:
+        """
+        See Tree.floor_and_ceil()
+        """
+        i = self._bisect_left(key)
+        if i < self._count and self._keys[i] == key:
+            node = self._node(i)
+            return node, node
+        return self._node(i - 1) if i else None, \
+            self._node(i) if i < self._count else None
+
+    def get_neighbors(self, key: K) -> Tuple[ON, ON]:
+        """
+        See Tree.get_neighbors()
+        """
+        i = self._bisect_left(key)
+        j = i + 1 if i < self._count and self._keys[i] == key else i
+        return self._node(i - 1) if i else None, \
+            self._node(j) if j < self._count else None
+
+    def _bisect_left(self, key: K) -> int:
+        """
+        Return the position of the lowest key greater equal the given
+        one. The in-memory index narrows the search down to a single
+        stride of the key array.
+        """
+        stride = self.index_stride
+        if not stride:
+            return bisect_left(self._keys, key)
+        block = bisect_right(self._index, key)
+        if not block:
+            return 0
+        lo = (block - 1) * stride
+        return bisect_left(self._keys, key, lo, min(lo + stride, self._count))
+
+    def _value(self, i: int) -> V:
+        if not self.has_values:
+            return None
+        return pickle.loads(self._heap[self._offsets[i]:self._offsets[i + 1]])
+
+    def _node(self, i: int) -> Node:
+        if self.has_values:
+            return self.nodetype(key=self._keys[i], val=self._value(i))
+        return self.nodetype(key=self._keys[i])
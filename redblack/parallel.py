@@ -0,0 +1,265 @@
+"""
+Build and merge large trees with the help of a process pool.
+
+Data is shipped between processes as sorted runs: a key sequence and an
+optional value sequence of equal length. Key sequences of ints or floats
+are packed into an array.array, which pickles as a flat byte buffer
+instead of one object per key.
+"""
+from __future__ import annotations
+
+import heapq
+import os
+from array import array
+from bisect import bisect_left
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice, repeat
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    )
+
+from .tree import K, Tree
+from .treedict import TreeDict, V, overwrite
+
+R = TypeVar('R')  # Result type
+
+# Sorted, duplicate-free keys and, for dictionaries, their values
+Run = Tuple[Sequence[K], Optional[Sequence[V]]]
+
+
+def pack(seq: Sequence) -> Sequence:
+    """
+    Return the sequence as compact array if all its items are ints or
+    all are floats. Otherwise return it as list.
+    """
+    for typecode, typ in (('q', int), ('d', float)):
+        if all(type(x) is typ for x in seq):
+            try:
+                return array(typecode, seq)
+            except OverflowError:
+                break
+    return seq if type(seq) is list else list(seq)
+
+
+def build(
+        items: Iterable,
+        workers: Optional[int] = None,
+        treetype: Type[Tree] = TreeDict,
+        acc: Callable[[V, V], V] = overwrite,
+        chunksize: int = 1 << 18,
+        ) -> Tree:
+    """
+    Construct a tree from unsorted input. Chunks of the input are sorted
+    and de-duplicated in worker processes, merged with a k-way merge
+    split by key ranges over the workers, and finally linked into a tree
+    in linear time.
+    :param items: Key, value pairs if 'treetype' is a TreeDict, keys
+        otherwise. Consumed lazily, one chunk at a time.
+    :param workers: Number of worker processes. Defaults to the number
+        of CPUs. With 1, everything runs in the calling process.
+    :param treetype: Type of tree to construct.
+    :param acc: Resolves key clashes like TreeDict.acc, with values
+        applied in input order. Must be picklable, so no lambda.
+    :param chunksize: Number of items sorted by a single task.
+    """
+    keyed = issubclass(treetype, TreeDict)
+    with _executor(workers) as pool:
+        futures = []
+        it = iter(items)
+        while True:
+            chunk = list(islice(it, chunksize))
+            if not chunk:
+                break
+            if keyed:
+                keys, vals = zip(*chunk)
+                run: Run = (pack(keys), list(vals))
+            else:
+                run = (pack(chunk), None)
+            futures.append(pool.submit(_sort_run, run, acc))
+        runs = [f.result() for f in futures]
+        merged = _merge(pool, runs, acc, workers)
+    kwargs = {'acc': acc} if keyed else {}
+    return _to_tree(treetype, merged, kwargs)
+
+
+def parallel_union(
+        *trees: Tree,
+        workers: Optional[int] = None,
+        acc: Optional[Callable[[V, V], V]] = None,
+        ) -> Tree:
+    """
+    Return a new tree containing the keys (and values) of all passed
+    trees, which must be of the same type. The trees are exported as
+    sorted runs, merged in worker processes and linked in linear time.
+    The passed trees are left untouched.
+    :param acc: Resolves key clashes, with values applied in the order
+        the trees were passed. Defaults to the first tree's accumulator.
+        Must be picklable, so no lambda.
+    """
+    assert trees
+    treetype = type(trees[0])
+    keyed = isinstance(trees[0], TreeDict)
+    if keyed and acc is None:
+        acc = trees[0].acc
+    runs: List[Run] = []
+    for t in trees:
+        if keyed:
+            runs.append((pack([n.key for n in t]), [n.val for n in t]))
+        else:
+            runs.append((pack([n.key for n in t]), None))
+    with _executor(workers) as pool:
+        merged = _merge(pool, runs, acc or overwrite, workers)
+    kwargs = {'acc': acc} if keyed else {}
+    return _to_tree(treetype, merged, kwargs)
+
+
+def map_partitions(
+        tree: Tree,
+        func: Callable[..., R],
+        k: Optional[int] = None,
+        workers: Optional[int] = None,
+        exact: bool = False,
+        ) -> List[R]:
+    """
+    Cut the tree into k key ranges of roughly equal size and call 'func'
+    on each in a worker process. The function receives the keys of its
+    range packed into an array if possible, and for a TreeDict the list
+    of values as second argument. Return the results in key order.
+    :param func: Must be picklable, so no lambda
+    :param k: Number of ranges, by default the number of workers
+    :param exact: See Tree.partition_points()
+    """
+    parts = k or workers or os.cpu_count() or 1
+    keyed = isinstance(tree, TreeDict)
+    with _executor(workers) as pool:
+        futures = []
+        for view in tree.partitions(parts, exact):
+            if keyed:
+                keys, vals = view.to_arrays()
+                futures.append(pool.submit(func, pack(keys), vals))
+            else:
+                futures.append(pool.submit(func, pack(view.to_arrays())))
+        return [f.result() for f in futures]
+
+
+@contextmanager
+def _executor(workers: Optional[int]) -> Iterator[Executor]:
+    if workers == 1:
+        yield _InlineExecutor()
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield pool
+
+
+class _InlineExecutor(Executor):
+    """
+    Executor running tasks synchronously in the calling process.
+    """
+    def submit(self, fn, *args, **kwargs):
+        f: Future = Future()
+        try:
+            f.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            f.set_exception(e)
+        return f
+
+
+def _merge(
+        pool: Executor,
+        runs: List[Run],
+        acc: Callable[[V, V], V],
+        workers: Optional[int],
+        ) -> List[Run]:
+    """
+    Merge sorted runs into a list of sorted runs covering consecutive,
+    disjoint key ranges. The key space is cut into one range per worker
+    at sampled quantiles and each range is merged by its own task.
+    """
+    runs = [r for r in runs if len(r[0])]
+    if len(runs) < 2:
+        return runs
+    parts = workers or os.cpu_count() or 1
+    # Sample every run evenly to estimate key quantiles
+    sample = sorted(k for keys, _ in runs
+                    for k in keys[::max(1, len(keys) // 64)])
+    bounds = sorted(set(sample[len(sample) * i // parts]
+                        for i in range(1, parts)))
+    futures = []
+    for lo, hi in zip([None] + bounds, bounds + [None]):
+        part: List[Run] = []
+        for keys, vals in runs:
+            a = 0 if lo is None else bisect_left(keys, lo)
+            b = len(keys) if hi is None else bisect_left(keys, hi)
+            if a < b:
+                part.append((keys[a:b], None if vals is None else vals[a:b]))
+        if part:
+            futures.append(pool.submit(_merge_runs, part, acc))
+    return [f.result() for f in futures]
+
+
+def _sort_run(run: Run, acc: Callable[[V, V], V]) -> Run:
+    """
+    Sort the run by key and remove duplicates, combining their values
+    with 'acc' in original order.
+    """
+    keys, vals = run
+    if vals is None:
+        return pack(sorted(set(keys))), None
+    # Sorting is stable, so equal keys keep their input order
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    out_keys: List[K] = []
+    out_vals: List[V] = []
+    for i in order:
+        k = keys[i]
+        if out_keys and out_keys[-1] == k:
+            out_vals[-1] = acc(out_vals[-1], vals[i])
+        else:
+            out_keys.append(k)
+            out_vals.append(vals[i])
+    return pack(out_keys), out_vals
+
+
+def _merge_runs(runs: List[Run], acc: Callable[[V, V], V]) -> Run:
+    """
+    k-way merge sorted runs into one. Values of keys present in several
+    runs are combined with 'acc' in run order.
+    """
+    out_keys: List[K] = []
+    if runs[0][1] is None:
+        for k in heapq.merge(*(keys for keys, _ in runs)):
+            if not out_keys or out_keys[-1] != k:
+                out_keys.append(k)
+        return pack(out_keys), None
+    out_vals: List[V] = []
+    # The run index breaks ties, so values are never compared
+    streams = [zip(keys, repeat(i), vals)
+               for i, (keys, vals) in enumerate(runs)]
+    for k, _, v in heapq.merge(*streams):
+        if out_keys and out_keys[-1] == k:
+            out_vals[-1] = acc(out_vals[-1], v)
+        else:
+            out_keys.append(k)
+            out_vals.append(v)
+    return pack(out_keys), out_vals
+
+
+def _to_tree(treetype: Type[Tree], runs: List[Run], kwargs: dict) -> Tree:
+    """
+    Link the consecutive runs into a tree of the given type.
+    """
+    make = treetype.nodetype
+    if issubclass(treetype, TreeDict):
+        nodes = [make(key=k, val=v)
+                 for keys, vals in runs for k, v in zip(keys, vals)]
+    else:
+        nodes = [make(key=k) for keys, _ in runs for k in keys]
+    return treetype._from_sorted_nodes(nodes, **kwargs)
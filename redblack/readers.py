@@ -0,0 +1,110 @@
+"""
+Lazy readers for sorted exports, meant to be passed on to
+Tree.load_sorted() or TreeDict.load_sorted_items(). Each reader yields
+one record at a time, so neither the file nor its parsed records are
+ever held in memory as a whole.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import struct
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Iterator,
+    Optional,
+    TextIO,
+    )
+
+
+def read_lines(
+        file: TextIO,
+        parse: Callable[[str], Any] = str.strip,
+        ) -> Iterator[Any]:
+    """
+    Yield parse(line) for every non-blank line of a text file.
+    """
+    for line in file:
+        if line.strip():
+            yield parse(line)
+
+
+def read_csv(
+        file: TextIO,
+        key_column: int = 0,
+        value_column: Optional[int] = 1,
+        key_type: Callable[[str], Any] = str,
+        value_type: Callable[[str], Any] = str,
+        header: bool = False,
+        **fmtparams,
+        ) -> Iterator[Any]:
+    """
+    Yield (key, value) pairs from the given columns of a CSV file, or
+    only keys if 'value_column' is None. Formatting parameters, like
+    'delimiter', are passed on to csv.reader().
+    :param header: Skip the first row
+    """
+    rows = csv.reader(file, **fmtparams)
+    if header:
+        next(rows, None)
+    for row in rows:
+        if not row:
+            continue
+        if value_column is None:
+            yield key_type(row[key_column])
+        else:
+            yield key_type(row[key_column]), value_type(row[value_column])
+
+
+def read_ndjson(
+        file: TextIO,
+        key: str = 'key',
+        value: Optional[str] = 'value',
+        ) -> Iterator[Any]:
+    """
+    Yield (key, value) pairs from a file holding one JSON object per
+    line. If 'value' is None, the whole object is yielded as value.
+    """
+    for line in file:
+        if not line.strip():
+            continue
+        obj = json.loads(line)
+        yield obj[key], obj if value is None else obj[value]
+
+
+def read_records(
+        file: BinaryIO,
+        fmt: str,
+        key_index: int = 0,
+        value_index: Optional[int] = 1,
+        chunk_records: int = 4096,
+        ) -> Iterator[Any]:
+    """
+    Yield (key, value) pairs from a binary file of fixed-size records,
+    or only keys if 'value_index' is None. Records are unpacked with the
+    given struct format and read in chunks of 'chunk_records'. Reads
+    may return less, like from pipes or sockets, records cut by a read
+    are completed by the next one.
+    Raises ValueError if the file ends within a record.
+    """
+    record = struct.Struct(fmt)
+    size = record.size * chunk_records
+    # Start of a record cut by the last read
+    rest = b''
+    while True:
+        data = file.read(size)
+        if not data:
+            if rest:
+                raise ValueError("File ends within a record")
+            return
+        if rest:
+            data = rest + data
+        end = len(data) - len(data) % record.size
+        rest = data[end:]
+        for fields in record.iter_unpack(memoryview(data)[:end]):
+            if value_index is None:
+                yield fields[key_index]
+            else:
+                yield fields[key_index], fields[value_index]
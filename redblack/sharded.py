@@ -0,0 +1,366 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from itertools import chain
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Tuple,
+    Union,
+    overload,
+    )
+
+from .threadsafe import RWLock
+from .tree import K
+from .treedict import DictNode, TreeDict, V, overwrite
+
+
+OD = Optional[DictNode]  # Dict node or None
+
+
+def _detach(node: OD) -> OD:
+    """
+    Return an unlinked copy of the node, or None. Must be called under
+    the lock of the node's shard.
+    """
+    return None if node is None else DictNode(node.val, node.key)
+
+
+class ShardedTreeDict(MutableMapping[K, V]):
+    """
+    Dictionary partitioning its key space into contiguous key ranges,
+    each stored in its own TreeDict (a shard). Writers touching
+    different shards don't block each other, and every operation only
+    descends the (smaller) tree of a single shard.
+
+    Shards are split in half when they grow past 'max_shard_size' and
+    merged with a neighbor when they shrink below 'min_shard_size', so
+    the partitioning follows the data. Both relink the existing nodes in
+    linear time.
+
+    The interface matches the one of TreeDict, so callers don't need to
+    know the dictionary is sharded. But all nodes handed out are
+    detached copies, taken under the shard's lock, as the shard's own
+    nodes may be modified or relinked by other threads at any time.
+    Modifying a copy doesn't affect the dictionary.
+    """
+    def __init__(
+            self,
+            items: Mapping[K, V] = {},
+            acc: Callable[[V, V], V] = overwrite,
+            bounds: Iterable[K] = (),
+            max_shard_size: int = 1 << 16,
+            min_shard_size: Optional[int] = None,
+            ):
+        """
+        :param items: Initialize the dictionary with these key, value
+            pairs.
+        :param acc: Handles key clashes. See TreeDict.
+        :param bounds: Initial lower key bounds of all shards except
+            the first one, in ascending order. Pass these to pre-split
+            the key space if its distribution is known in advance.
+        :param max_shard_size: A shard holding more entries is split.
+        :param min_shard_size: A shard holding fewer entries is merged
+            with its neighbor. Defaults to a quarter of max_shard_size.
+        """
+        self.acc = acc
+        self.max_shard_size = max_shard_size
+        self.min_shard_size = max_shard_size // 4 \
+            if min_shard_size is None else min_shard_size
+        assert self.min_shard_size * 2 < self.max_shard_size
+        # Lower bound of shard i + 1 is stored in _bounds[i]
+        self._bounds: List[K] = list(bounds)
+        assert all(a < b for a, b in zip(self._bounds, self._bounds[1:]))
+        self._shards: List[TreeDict] = [
+            TreeDict(acc=acc) for _ in range(len(self._bounds) + 1)
+            ]
+        self._locks: List[RWLock] = [RWLock() for _ in self._shards]
+        # Guards the partitioning. Held shared by all regular operations
+        # and exclusively while splitting or merging shards.
+        self._topology = RWLock()
+        for i in items.items():
+            self.__setitem__(*i)
+
+    def __len__(self) -> int:
+        return sum(s._len for s in self._shards)
+
+    def __str__(self) -> str:
+        return ' '.join(map(str, self))
+
+    def __iter__(self) -> Iterator[DictNode]:
+        """
+        Iterate over detached copies of the nodes, see _snapshots().
+        """
+        for k, v in chain.from_iterable(self._snapshots()):
+            yield DictNode(v, k)
+
+    def __reversed__(self) -> Iterator[DictNode]:
+        for k, v in chain.from_iterable(self._snapshots(reverse=True)):
+            yield DictNode(v, k)
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    @overload
+    def __getitem__(self, key: slice) -> List[DictNode]:
+        pass
+
+    @overload
+    def __getitem__(self, key: K) -> DictNode:
+        pass
+
+    def __getitem__(
+            self,
+            key: Union[K, slice],
+            ) -> Union[DictNode, List[DictNode]]:
+        if isinstance(key, slice):
+            return self._slice(key)
+        with self._topology.read():
+            i = self._route(key)
+            with self._locks[i].read():
+                return DictNode(self._shards[i][key].val, key)
+
+    def __setitem__(self, key: K, val: V) -> Tuple[DictNode, bool]:
+        with self._topology.read():
+            i = self._route(key)
+            shard = self._shards[i]
+            with self._locks[i].write():
+                node, success = shard.__setitem__(key, val)
+                node = DictNode(node.val, node.key)
+        if success and shard._len > self.max_shard_size:
+            self._split(key)
+        return node, success
+
+    insert = __setitem__
+
+    def __delitem__(self, key: K) -> DictNode:
+        with self._topology.read():
+            i = self._route(key)
+            shard = self._shards[i]
+            with self._locks[i].write():
+                node = shard[key]
+                removed = DictNode(node.val, key)
+                shard.remove(node)
+        if shard._len < self.min_shard_size:
+            self._merge(key)
+        return removed
+
+    def remove(self, node: DictNode) -> DictNode:
+        return self.__delitem__(node.key)
+
+    @property
+    def shard_count(self) -> int:
+        return len(self._shards)
+
+    @property
+    def first(self) -> OD:
+        """
+        Return the lowest-key node, or None if the dictionary is empty.
+        """
+        with self._topology.read():
+            for s, lock in zip(self._shards, self._locks):
+                with lock.read():
+                    n = _detach(s.first)
+                if n is not None:
+                    return n
+        return None
+
+    @property
+    def last(self) -> OD:
+        """
+        Return the highest-key node, or None if the dictionary is empty.
+        """
+        with self._topology.read():
+            for s, lock in zip(reversed(self._shards), reversed(self._locks)):
+                with lock.read():
+                    n = _detach(s.last)
+                if n is not None:
+                    return n
+        return None
+
+    def keys(self) -> Iterator[K]:
+        for k, _ in chain.from_iterable(self._snapshots()):
+            yield k
+
+    def values(self) -> Iterator[V]:
+        for _, v in chain.from_iterable(self._snapshots()):
+            yield v
+
+    def items(self) -> Iterator[Tuple[K, V]]:
+        return chain.from_iterable(self._snapshots())
+
+    def floor_and_ceil(self, key: K) -> Tuple[OD, OD]:
+        """
+        For a given key, return its floor and ceil nodes. See
+        Tree.floor_and_ceil().
+        """
+        with self._topology.read():
+            i = self._route(key)
+            with self._locks[i].read():
+                floor, ceil = map(_detach,
+                                  self._shards[i].floor_and_ceil(key))
+            if floor is None:
+                floor = self._last_before(i)
+            if ceil is None:
+                ceil = self._first_after(i)
+        return floor, ceil
+
+    def get_neighbors(self, key: K) -> Tuple[OD, OD]:
+        """
+        For a given key, return its predecessor and successor nodes. See
+        Tree.get_neighbors().
+        """
+        with self._topology.read():
+            i = self._route(key)
+            with self._locks[i].read():
+                prev, succ = map(_detach, self._shards[i].get_neighbors(key))
+            if prev is None:
+                prev = self._last_before(i)
+            if succ is None:
+                succ = self._first_after(i)
+        return prev, succ
+
+    def _route(self, key: K) -> int:
+        """
+        Return the index of the shard responsible for the given key.
+        """
+        return bisect_right(self._bounds, key)
+
+    def _last_before(self, i: int) -> OD:
+        """
+        Return the highest-key node of all shards left of shard i.
+        """
+        for j in range(i - 1, -1, -1):
+            with self._locks[j].read():
+                n = _detach(self._shards[j].last)
+            if n is not None:
+                return n
+        return None
+
+    def _first_after(self, i: int) -> OD:
+        """
+        Return the lowest-key node of all shards right of shard i.
+        """
+        for j in range(i + 1, len(self._shards)):
+            with self._locks[j].read():
+                n = _detach(self._shards[j].first)
+            if n is not None:
+                return n
+        return None
+
+    def _snapshots(
+            self,
+            reverse: bool = False,
+            ) -> Iterator[List[Tuple[K, V]]]:
+        """
+        Yield a list of each shard's key, value pairs in shard order.
+        Each list is copied under the shard's read lock, but no lock is
+        held while the caller processes it. The pairs are copied, as a
+        concurrent removal may move another key and value into a node.
+        Shards split or merged in between are handled by continuing from
+        the last shard bound.
+        """
+        bound: Optional[K] = None
+        while True:
+            with self._topology.read():
+                if reverse:
+                    i = len(self._shards) - 1 if bound is None \
+                        else bisect_left(self._bounds, bound)
+                    with self._locks[i].read():
+                        pairs = [(n.key, n.val)
+                                 for n in self._shards[i][:bound]]
+                    pairs.reverse()
+                    last = i == 0
+                    if not last:
+                        bound = self._bounds[i - 1]
+                else:
+                    i = 0 if bound is None else self._route(bound)
+                    with self._locks[i].read():
+                        pairs = [(n.key, n.val)
+                                 for n in self._shards[i][bound:]]
+                    last = i == len(self._bounds)
+                    if not last:
+                        bound = self._bounds[i]
+            yield pairs
+            if last:
+                return
+
+    def _slice(self, key: slice) -> List[DictNode]:
+        if key.step is not None:
+            raise NotImplementedError(
+                "Slice steps are not implemented"
+                )
+        with self._topology.read():
+            begin = 0 if key.start is None else self._route(key.start)
+            end = len(self._shards) - 1 if key.stop is None \
+                else self._route(key.stop)
+            ret: List[DictNode] = []
+            for i in range(begin, end + 1):
+                # Shard-local bounds are only needed at the edges
+                start = key.start if i == begin else None
+                stop = key.stop if i == end else None
+                with self._locks[i].read():
+                    ret += [DictNode(n.val, n.key)
+                            for n in self._shards[i][start:stop]]
+        return ret
+
+    def _split(self, key: K) -> None:
+        """
+        Split the shard containing 'key' in half, if it is still too
+        large once the partitioning can be modified.
+        """
+        with self._topology.write():
+            i = self._route(key)
+            shard = self._shards[i]
+            if shard._len <= self.max_shard_size:
+                # Someone else was faster
+                return
+            # Relink the existing nodes, so no node gets detached
+            nodes = list(shard)
+            mid = len(nodes) // 2
+            lower = TreeDict._from_sorted_nodes(nodes[:mid], acc=self.acc)
+            upper = TreeDict._from_sorted_nodes(nodes[mid:], acc=self.acc)
+            self._shards[i:i + 1] = [lower, upper]
+            self._locks.insert(i + 1, RWLock())
+            self._bounds.insert(i, nodes[mid].key)
+
+    def _merge(self, key: K) -> None:
+        """
+        Merge the shard containing 'key' with its smaller neighbor, if
+        it is still too small once the partitioning can be modified and
+        the merged shard doesn't immediately need a split again.
+        """
+        with self._topology.write():
+            if len(self._shards) < 2:
+                return
+            i = self._route(key)
+            if self._shards[i]._len >= self.min_shard_size:
+                return
+            if i == 0:
+                j = 1
+            elif i == len(self._shards) - 1:
+                j = i - 1
+            else:
+                j = min(i - 1, i + 1, key=lambda x: self._shards[x]._len)
+            lo, hi = min(i, j), max(i, j)
+            if self._shards[lo]._len + self._shards[hi]._len \
+                    > self.max_shard_size:
+                return
+            # Shards are adjacent, so their concatenated nodes are sorted
+            nodes = list(self._shards[lo])
+            nodes += self._shards[hi]
+            self._shards[lo:hi + 1] = [
+                TreeDict._from_sorted_nodes(nodes, acc=self.acc)
+                ]
+            del self._locks[hi]
+            # Drop the bound separating both shards
+            del self._bounds[lo]
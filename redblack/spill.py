@@ -0,0 +1,649 @@
+"""
+Dictionary spilling to disk once it outgrows a memory budget, organized
+like a log-structured merge tree.
+
+Writes go to an in-memory TreeDict, the memtable. When the memtable
+holds more than a configured number of entries, it is written to an
+immutable, sorted run file and replaced by an empty one. Removed keys
+are stored as tombstones until they are compacted away. Once enough
+runs pile up, a background thread merges all of them into one.
+
+Run file layout:
+    blocks      pickled (keys, values) list pairs of up to block_size
+                entries each
+    footer      pickled dict holding the fence index (first key, offset
+                and length of every block), the largest key, the entry
+                count, a bloom filter over all keys and, for compacted
+                runs, the names of the runs merged into it
+    trailer     8-byte footer offset, followed by MAGIC
+"""
+from __future__ import annotations
+
+import heapq
+import os
+import pickle
+import struct
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import repeat
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Tuple,
+    Union,
+    overload,
+    )
+
+from .durable import _fsync_dir
+from .tree import K
+from .treedict import DictNode, TreeDict, V, overwrite
+
+
+MAGIC = b'RBRUN\x01\0\0'
+_TRAILER = struct.Struct('<Q8s')
+# Compared against the stored value to detect if hash() of strings
+# differs from the process that wrote a run.
+_HASH_PROBE = 'redblack'
+_MASK64 = (1 << 64) - 1
+
+OD = Optional[DictNode]
+
+
+class _Tombstone:
+    """
+    Value marking a removed key.
+    """
+    __slots__ = ()
+
+    def __reduce__(self) -> str:
+        return '_TOMBSTONE'
+
+    def __repr__(self) -> str:
+        return '<removed>'
+
+
+_TOMBSTONE = _Tombstone()
+_MISSING = object()
+
+
+class BloomFilter:
+    """
+    Probabilistic set answering "maybe contained" or "not contained",
+    based on Python's hash() of the keys.
+    """
+    # Stored with the bits, increment when changing _positions()
+    scheme = 2
+
+    def __init__(
+            self,
+            capacity: int,
+            bits_per_key: int = 10,
+            hashes: int = 7,
+            bits: Optional[bytearray] = None,
+            ):
+        self.size = max(64, capacity * bits_per_key)
+        self.hashes = hashes
+        self.bits = bytearray((self.size + 7) // 8) if bits is None else bits
+
+    def _positions(self, key: Any) -> Iterator[int]:
+        # hash() of small ints is the int itself, so mix it first, then
+        # derive all probe positions from the two halves of the mix by
+        # double hashing.
+        h = (hash(key) * 0x9E3779B97F4A7C15) & _MASK64
+        h ^= h >> 32
+        h = (h * 0xBF58476D1CE4E5B9) & _MASK64
+        h ^= h >> 29
+        start = h & 0xFFFFFFFF
+        step = (h >> 32) | 1
+        for i in range(self.hashes):
+            yield (start + i * step) % self.size
+
+    def add(self, key: Any) -> None:
+        bits = self.bits
+        for p in self._positions(key):
+            bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key: Any) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7))
+                   for p in self._positions(key))
+
+
+class Run:
+    """
+    Immutable sorted run file. Its fence index and bloom filter are held
+    in memory, blocks are read on demand and the least recently used
+    ones evicted from the cache.
+    """
+    def __init__(self, path: str, cache_blocks: int = 32):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._lock = threading.Lock()
+        # Shared by reader threads and the background compaction
+        self._cache_lock = threading.Lock()
+        self._cache: OrderedDict[int, Tuple[list, list]] = OrderedDict()
+        self._cache_blocks = cache_blocks
+        size = self._file.seek(0, os.SEEK_END)
+        off, magic = _TRAILER.unpack(self._read(size - _TRAILER.size,
+                                                _TRAILER.size))
+        if magic != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is no run file")
+        footer = pickle.loads(self._read(off, size - _TRAILER.size - off))
+        self.fence: List[Any] = footer['fence']
+        self.offsets: List[int] = footer['offsets']
+        self.lengths: List[int] = footer['lengths']
+        self.count: int = footer['count']
+        self.max_key = footer['max']
+        # File names of the runs this one was compacted from
+        self.replaces: List[str] = footer.get('replaces', [])
+        if footer['hash_probe'] == hash(_HASH_PROBE) \
+                and footer.get('bloom_scheme') == BloomFilter.scheme:
+            self.bloom = BloomFilter(
+                footer['bloom_capacity'], hashes=footer['bloom_hashes'],
+                bits=footer['bloom'])
+        else:
+            # Written by a process with other string hashes, or with
+            # other probe positions
+            self.bloom = BloomFilter(max(self.count, 1))
+            for k, _ in self.iter_range():
+                self.bloom.add(k)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __del__(self) -> None:
+        # Not set if open() failed
+        file = getattr(self, '_file', None)
+        if file is not None:
+            file.close()
+
+    def _read(self, offset: int, length: int) -> bytes:
+        if hasattr(os, 'pread'):
+            return os.pread(self._file.fileno(), length, offset)
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def _block(self, i: int) -> Tuple[list, list]:
+        cache = self._cache
+        with self._cache_lock:
+            block = cache.get(i)
+            if block is not None:
+                cache.move_to_end(i)
+                return block
+        block = pickle.loads(self._read(self.offsets[i], self.lengths[i]))
+        with self._cache_lock:
+            cache[i] = block
+            if len(cache) > self._cache_blocks:
+                cache.popitem(last=False)
+        return block
+
+    def get(self, key: K) -> Any:
+        """
+        Return the value stored for the key, which may be a tombstone,
+        or _MISSING.
+        """
+        if not self.fence or key < self.fence[0] or key > self.max_key \
+                or key not in self.bloom:
+            return _MISSING
+        keys, vals = self._block(bisect_right(self.fence, key) - 1)
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return vals[i]
+        return _MISSING
+
+    def iter_range(
+            self,
+            lo: Optional[K] = None,
+            hi: Optional[K] = None,
+            reverse: bool = False,
+            ) -> Iterator[Tuple[K, Any]]:
+        """
+        Yield all stored key, value pairs, tombstones included, with
+        keys in [lo, hi).
+        """
+        if not self.fence:
+            return
+        first = 0 if lo is None else max(0, bisect_right(self.fence, lo) - 1)
+        last = len(self.fence) if hi is None else bisect_left(self.fence, hi)
+        blocks = range(first, last)
+        for b in reversed(blocks) if reverse else blocks:
+            keys, vals = self._block(b)
+            begin = 0 if lo is None else bisect_left(keys, lo)
+            end = len(keys) if hi is None else bisect_left(keys, hi)
+            idx = range(begin, end)
+            for i in reversed(idx) if reverse else idx:
+                yield keys[i], vals[i]
+
+
+def write_run(
+        path: str,
+        items: Iterable[Tuple[K, Any]],
+        capacity: int,
+        block_size: int = 256,
+        replaces: List[str] = [],
+        ) -> None:
+    """
+    Write sorted key, value pairs into a new run file. The file is
+    written under a temporary name and renamed when complete.
+    :param capacity: Upper bound of the number of items, used to size
+        the bloom filter
+    :param replaces: File names of older runs in the same directory the
+        new run supersedes. They are deleted when it is opened.
+    """
+    bloom = BloomFilter(max(capacity, 1))
+    fence: List[Any] = []
+    offsets: List[int] = []
+    lengths: List[int] = []
+    count = 0
+    max_key = None
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        keys: List[Any] = []
+        vals: List[Any] = []
+
+        def write_block() -> None:
+            data = pickle.dumps((keys, vals), pickle.HIGHEST_PROTOCOL)
+            fence.append(keys[0])
+            offsets.append(f.tell())
+            lengths.append(len(data))
+            f.write(data)
+
+        for k, v in items:
+            keys.append(k)
+            vals.append(v)
+            bloom.add(k)
+            count += 1
+            max_key = k
+            if len(keys) == block_size:
+                write_block()
+                keys, vals = [], []
+        if keys:
+            write_block()
+        footer = pickle.dumps({
+            'fence': fence,
+            'offsets': offsets,
+            'lengths': lengths,
+            'count': count,
+            'max': max_key,
+            'bloom': bloom.bits,
+            'bloom_capacity': max(capacity, 1),
+            'bloom_hashes': bloom.hashes,
+            'bloom_scheme': BloomFilter.scheme,
+            'hash_probe': hash(_HASH_PROBE),
+            'replaces': replaces,
+            }, pickle.HIGHEST_PROTOCOL)
+        off = f.tell()
+        f.write(footer)
+        f.write(_TRAILER.pack(off, MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class SpillingTreeDict(MutableMapping[K, V]):
+    """
+    Sorted dictionary keeping recent writes in a TreeDict and spilling
+    them to sorted run files in a directory once the memtable holds more
+    than 'memtable_size' entries. Lookups, floor_and_ceil and ordered
+    iteration merge the memtable and all runs, newest first. Bloom
+    filters and fence indexes let lookups skip runs and read a single
+    block from the others.
+
+    Like TreeDict, lookups return nodes, which are unlinked copies here.
+    Not safe for concurrent use by several threads, apart from the
+    internal background compaction.
+    """
+    def __init__(
+            self,
+            directory: str,
+            memtable_size: int = 100000,
+            block_size: int = 256,
+            compact_runs: int = 4,
+            acc: Callable[[V, V], V] = overwrite,
+            background: bool = True,
+            ):
+        """
+        :param directory: Directory for the run files. Runs left by an
+            earlier instance are opened, so closed dictionaries can be
+            reopened.
+        :param memtable_size: Number of entries, including tombstones,
+            above which the memtable is flushed to a new run
+        :param block_size: Number of entries per run file block
+        :param compact_runs: Number of runs starting a compaction
+        :param acc: Handles key clashes, see TreeDict. Unless left at
+            the default, every write needs a lookup of the old value.
+        :param background: Compact in a background thread. Otherwise,
+            compaction blocks the write triggering it.
+        """
+        self.directory = directory
+        self.memtable_size = memtable_size
+        self.block_size = block_size
+        self.compact_runs = compact_runs
+        self.acc = acc
+        self.background = background
+        os.makedirs(directory, exist_ok=True)
+        self._memtable = TreeDict()
+        # Oldest first. Replaced, never modified in place, so readers
+        # can work on the list they fetched.
+        self._runs: List[Run] = []
+        self._runs_lock = threading.Lock()
+        # Held while compacting, so no two compactions merge the same runs
+        self._compact_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self._seq = 0
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.run'):
+                self._seq = max(self._seq, int(name[:-4]) + 1)
+                self._runs.append(Run(os.path.join(directory, name)))
+            elif name.endswith('.run.tmp'):
+                os.remove(os.path.join(directory, name))
+        # Finish compactions interrupted before removing their inputs
+        replaced = {n for r in self._runs for n in r.replaces}
+        for r in self._runs:
+            if os.path.basename(r.path) in replaced:
+                r.close()
+                os.remove(r.path)
+        self._runs = [r for r in self._runs
+                      if os.path.basename(r.path) not in replaced]
+
+    def close(self) -> None:
+        """
+        Flush the memtable, wait for a running compaction and close all
+        run files. Reopen the directory to continue using the data.
+        """
+        self.flush()
+        self.wait()
+        with self._runs_lock:
+            runs = self._runs
+            self._runs = []
+        for r in runs:
+            r.close()
+
+    def __enter__(self) -> SpillingTreeDict:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def run_count(self) -> int:
+        return len(self._runs)
+
+    def __len__(self) -> int:
+        """
+        Count all contained keys. Writes don't look up whether their key
+        is new, so this is a full merge pass over the memtable and all
+        runs, reading every run file. Use bool() to test for emptiness.
+        """
+        return sum(1 for _ in self._merged())
+
+    def __bool__(self) -> bool:
+        """
+        Return whether any key is contained, merging only up to the
+        first key not removed.
+        """
+        for _ in self._merged():
+            return True
+        return False
+
+    def __iter__(self) -> Iterator[DictNode]:
+        for k, v in self._merged():
+            yield DictNode(key=k, val=v)
+
+    def __reversed__(self) -> Iterator[DictNode]:
+        for k, v in self._merged(reverse=True):
+            yield DictNode(key=k, val=v)
+
+    def keys(self) -> Iterator[K]:
+        for k, _ in self._merged():
+            yield k
+
+    def values(self) -> Iterator[V]:
+        for _, v in self._merged():
+            yield v
+
+    def items(self) -> Iterator[Tuple[K, V]]:
+        return self._merged()
+
+    def __contains__(self, key: object) -> bool:
+        return self._get(key) is not _MISSING
+
+    @overload
+    def __getitem__(self, key: slice) -> List[DictNode]:
+        pass
+
+    @overload
+    def __getitem__(self, key: K) -> DictNode:
+        pass
+
+    def __getitem__(
+            self,
+            key: Union[K, slice],
+            ) -> Union[DictNode, List[DictNode]]:
+        if isinstance(key, slice):
+            if key.step is not None:
+                raise NotImplementedError(
+                    "Slice steps are not implemented"
+                    )
+            return [DictNode(key=k, val=v)
+                    for k, v in self._merged(key.start, key.stop)]
+        val = self._get(key)
+        if val is _MISSING:
+            raise KeyError(key)
+        return DictNode(key=key, val=val)
+
+    def __setitem__(self, key: K, val: V) -> None:
+        if self.acc is not overwrite:
+            old = self._get(key)
+            if old is not _MISSING:
+                val = self.acc(old, val)
+        self._memtable[key] = val
+        self._maybe_flush()
+
+    insert = __setitem__
+
+    def __delitem__(self, key: K) -> None:
+        if self._get(key) is _MISSING:
+            raise KeyError(key)
+        self._memtable[key] = _TOMBSTONE
+        self._maybe_flush()
+
+    def floor_and_ceil(self, key: K) -> Tuple[OD, OD]:
+        """
+        See Tree.floor_and_ceil()
+        """
+        val = self._get(key)
+        if val is not _MISSING:
+            node = DictNode(key=key, val=val)
+            return node, node
+        return self.get_neighbors(key)
+
+    def get_neighbors(self, key: K) -> Tuple[OD, OD]:
+        """
+        See Tree.get_neighbors()
+        """
+        prev = succ = None
+        for k, v in self._merged(hi=key, reverse=True):
+            prev = DictNode(key=k, val=v)
+            break
+        for k, v in self._merged(lo=key):
+            if k == key:
+                continue
+            succ = DictNode(key=k, val=v)
+            break
+        return prev, succ
+
+    @property
+    def first(self) -> OD:
+        for k, v in self._merged():
+            return DictNode(key=k, val=v)
+        return None
+
+    @property
+    def last(self) -> OD:
+        for k, v in self._merged(reverse=True):
+            return DictNode(key=k, val=v)
+        return None
+
+    def flush(self) -> None:
+        """
+        Write the memtable into a new run, even if it isn't full.
+        """
+        mem = self._memtable
+        if not len(mem):
+            return
+        path = self._next_path()
+        write_run(path, mem.items(), len(mem), self.block_size)
+        run = Run(path)
+        with self._runs_lock:
+            self._runs = self._runs + [run]
+        self._memtable = TreeDict()
+
+    def compact(self) -> None:
+        """
+        Merge all runs into a single one, dropping tombstones and
+        overwritten values.
+        """
+        with self._compact_lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        with self._runs_lock:
+            runs = self._runs
+        if len(runs) < 2:
+            return
+        # The merged run replaces the newest input, so that it keeps its
+        # place in the order of runs when reopening the directory. It
+        # lists the other inputs, so that a crash before they are removed
+        # can't revive the keys whose tombstones were dropped.
+        path = runs[-1].path
+        write_run(
+            path,
+            _merge(((r.iter_range() for r in reversed(runs))), False, True),
+            sum(r.count for r in runs),
+            self.block_size,
+            [os.path.basename(r.path) for r in runs[:-1]],
+            )
+        merged = Run(path)
+        # The rename must be on disk before the inputs are removed
+        _fsync_dir(self.directory)
+        with self._runs_lock:
+            # Keep runs flushed in the meantime, they are newer
+            self._runs = [merged] + self._runs[len(runs):]
+        for r in runs[:-1]:
+            # Open file handles stay readable for readers still using
+            # the old runs.
+            os.remove(r.path)
+
+    def wait(self) -> None:
+        """
+        Block until a running background compaction is done.
+        """
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def _next_path(self) -> str:
+        with self._runs_lock:
+            seq = self._seq
+            self._seq += 1
+        return os.path.join(self.directory, f'{seq:012d}.run')
+
+    def _maybe_flush(self) -> None:
+        if len(self._memtable) <= self.memtable_size:
+            return
+        self.flush()
+        if len(self._runs) < self.compact_runs:
+            return
+        if not self.background:
+            self.compact()
+        elif self._compactor is None or not self._compactor.is_alive():
+            self._compactor = threading.Thread(
+                target=self.compact, daemon=True)
+            self._compactor.start()
+
+    def _get(self, key: K) -> Any:
+        """
+        Return the newest value stored for the key, or _MISSING if the
+        key isn't contained or removed.
+        """
+        try:
+            val = self._memtable[key].val
+        except KeyError:
+            val = _MISSING
+            for run in reversed(self._runs):
+                val = run.get(key)
+                if val is not _MISSING:
+                    break
+        return _MISSING if val is _TOMBSTONE else val
+
+    def _merged(
+            self,
+            lo: Optional[K] = None,
+            hi: Optional[K] = None,
+            reverse: bool = False,
+            ) -> Iterator[Tuple[K, V]]:
+        """
+        Yield the newest value of every contained key in [lo, hi).
+        """
+        mem = self._memtable
+        if reverse:
+            mem_items = _reverse_range(mem, lo, hi)
+        else:
+            mem_items = ((n.key, n.val) for n in mem._iter_range(lo, hi))
+        sources = [mem_items]
+        sources += [r.iter_range(lo, hi, reverse)
+                    for r in reversed(self._runs)]
+        return _merge(sources, reverse, True)
+
+
+def _reverse_range(
+        tree: TreeDict,
+        lo: Optional[K],
+        hi: Optional[K],
+        ) -> Iterator[Tuple[K, V]]:
+    """
+    Yield the tree's key, value pairs with keys in [lo, hi) in reverse.
+    """
+    start = tree.last if hi is None else tree.floor_and_ceil(hi)[0]
+    if start is None:
+        return
+    for n in tree.reverse_from(start):
+        if hi is not None and not n.key < hi:
+            continue
+        if lo is not None and n.key < lo:
+            return
+        yield n.key, n.val
+
+
+def _merge(
+        sources: Iterable[Iterator[Tuple[K, Any]]],
+        reverse: bool,
+        drop_tombstones: bool,
+        ) -> Iterator[Tuple[K, Any]]:
+    """
+    Merge sorted key, value streams, ordered newest first. Of equal
+    keys, only the newest pair is yielded.
+    """
+    # The source rank orders equal keys newest first and ensures values
+    # are never compared.
+    streams = [
+        ((k, rank, v) for (k, v), rank in zip(s, repeat(-i if reverse else i)))
+        for i, s in enumerate(sources)
+        ]
+    last: Any = _MISSING
+    for k, _, v in heapq.merge(*streams, reverse=reverse):
+        if last is not _MISSING and k == last:
+            continue
+        last = k
+        if drop_tombstones and v is _TOMBSTONE:
+            continue
+        yield k, v
@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import (
+    Any,
+    ClassVar,
+    Dict,
+    Generic,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    )
+
+from .tree import K, ON, Node, Tree
+from .treedict import TreeDict, V
+
+
+T = TypeVar('T', bound=Tree)  # Wrapped tree type
+
+
+class RWLock:
+    """
+    Reader-writer lock. Any number of readers may hold the lock at the
+    same time, writers get exclusive access. Writers are preferred: as
+    soon as a writer waits, new readers block until it is done, so a
+    steady stream of readers can't starve it.
+    Both locks are reentrant: a thread holding the read lock may
+    acquire it again even while a writer waits, and the thread holding
+    the write lock may acquire either lock. A thread holding only the
+    read lock must not acquire the write lock, which deadlocks.
+    """
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        # Read lock depth of each reading thread
+        self._readers: Dict[int, int] = {}
+        self._writers_waiting = 0
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+
+    def acquire_read(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                # Reading while holding the write lock is always safe.
+                self._write_depth += 1
+                return
+            depth = self._readers.get(me)
+            if depth:
+                # Nested read, waiting for a writer would deadlock
+                self._readers[me] = depth + 1
+                return
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers[me] = 1
+
+    def release_read(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth -= 1
+                return
+            depth = self._readers[me] - 1
+            if depth:
+                self._readers[me] = depth
+                return
+            del self._readers[me]
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            self._writers_waiting += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self) -> None:
+        with self._cond:
+            assert self._writer == threading.get_ident()
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class ConcurrentTree(Generic[T]):
+    """
+    Thread-safe wrapper around a Tree. Lookups take a shared read lock,
+    mutations an exclusive write lock. Use batch() to perform many
+    mutations under a single lock acquisition.
+
+    Lookups return copies of the found entries instead of live nodes,
+    which another thread's removal may assign a different key as soon
+    as the lock is released: keys for a ConcurrentTree and (key, value)
+    pairs for a ConcurrentTreeDict. Removals are by key, looking up and
+    unlinking the node in one critical section.
+
+    Iteration runs on a snapshot of the keys taken under the read lock,
+    so it never observes a half-rebalanced tree and never blocks
+    writers for longer than the copy takes. Use iter_locked() to
+    iterate the live nodes while holding the read lock instead.
+    """
+    # Type of tree to construct if none is passed. Can be overridden in
+    # child classes.
+    treetype: ClassVar[Type[Tree]] = Tree
+
+    def __init__(self, tree: Optional[T] = None):
+        """
+        :param tree: Tree to wrap. A new, empty one of type 'treetype'
+            is created if None is passed. The wrapped tree must not be
+            accessed directly afterwards, except through batch().
+        """
+        self._tree = self.treetype() if tree is None else tree
+        self._lock = RWLock()
+
+    @staticmethod
+    def _copy(node: Node) -> Any:
+        """
+        Return the copy of a node's entry handed out by lookups. Must be
+        called under the lock.
+        """
+        return node.key
+
+    def _copy_opt(self, node: ON) -> Any:
+        return None if node is None else self._copy(node)
+
+    def __len__(self) -> int:
+        # Reading an int attribute is atomic, so no lock is needed.
+        # The tree only updates its length after rebalancing, thus the
+        # result is always the length of some consistent state.
+        return self._tree._len
+
+    def __str__(self) -> str:
+        with self._lock.read():
+            return str(self._tree)
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self.keys())
+
+    def __reversed__(self) -> Iterator[K]:
+        return reversed(self.keys())
+
+    def __contains__(self, key: K) -> bool:
+        with self._lock.read():
+            return key in self._tree
+
+    def __getitem__(self, key: Union[K, slice]) -> Any:
+        """
+        Return the copy of the entry with the given key, or a list of
+        copies if a slice is passed.
+        """
+        with self._lock.read():
+            found = self._tree[key]
+            if isinstance(key, slice):
+                return [self._copy(n) for n in found]
+            return self._copy(found)
+
+    def __delitem__(self, key: K) -> None:
+        self.remove(key)
+
+    def remove(self, key: K) -> Any:
+        """
+        Remove the entry with the given key and return its copy.
+        Raises KeyError if the key is not contained.
+        """
+        with self._lock.write():
+            node = self._tree[key]
+            copy = self._copy(node)
+            self._tree.remove(node)
+            return copy
+
+    @property
+    def first(self) -> Any:
+        with self._lock.read():
+            return self._copy_opt(self._tree.first)
+
+    @property
+    def last(self) -> Any:
+        with self._lock.read():
+            return self._copy_opt(self._tree.last)
+
+    def keys(self) -> List[K]:
+        """
+        Return a snapshot list of all keys in the tree.
+        """
+        with self._lock.read():
+            return [n.key for n in self._tree]
+
+    def iter_locked(self, reverse: bool = False) -> Iterator[Node]:
+        """
+        Iterate over the live tree nodes while holding the read lock.
+        Writers block until the iterator is exhausted or closed, so
+        consume it quickly or close it explicitly. Lookups are allowed
+        inside the loop, mutations deadlock.
+        """
+        self._lock.acquire_read()
+        try:
+            if reverse:
+                yield from reversed(self._tree)
+            else:
+                yield from self._tree
+        finally:
+            self._lock.release_read()
+
+    def insert(self, key: K) -> Tuple[Any, bool]:
+        """
+        Add the key if not yet present. Return the copy of its entry and
+        whether it was added.
+        """
+        with self._lock.write():
+            node, success = self._tree.insert(key)
+            return self._copy(node), success
+
+    def floor_and_ceil(self, key: K) -> Tuple[Any, Any]:
+        with self._lock.read():
+            floor, ceil = self._tree.floor_and_ceil(key)
+            return self._copy_opt(floor), self._copy_opt(ceil)
+
+    def get_neighbors(self, key: K) -> Tuple[Any, Any]:
+        with self._lock.read():
+            pred, succ = self._tree.get_neighbors(key)
+            return self._copy_opt(pred), self._copy_opt(succ)
+
+    @contextmanager
+    def batch(self) -> Iterator[T]:
+        """
+        Take the write lock once and hand out the wrapped tree for any
+        number of mutations:
+
+            with ctree.batch() as tree:
+                for k in keys:
+                    tree.insert(k)
+        """
+        with self._lock.write():
+            yield self._tree
+
+    @contextmanager
+    def reading(self) -> Iterator[T]:
+        """
+        Take the read lock once and hand out the wrapped tree for any
+        number of lookups. The tree must not be mutated inside.
+        """
+        with self._lock.read():
+            yield self._tree
+
+
+class ConcurrentTreeDict(ConcurrentTree[TreeDict]):
+    """
+    Thread-safe wrapper around a TreeDict. Lookups return (key, value)
+    pairs.
+    """
+    treetype: ClassVar[Type[Tree]] = TreeDict
+
+    @staticmethod
+    def _copy(node: Node) -> Tuple[K, V]:
+        return node.key, node.val  # type: ignore[attr-defined]
+
+    def __setitem__(self, key: K, val: V) -> None:
+        with self._lock.write():
+            self._tree.__setitem__(key, val)
+
+    def insert(  # type: ignore[override]
+            self,
+            key: K,
+            val: V,
+            ) -> Tuple[Tuple[K, V], bool]:
+        """
+        Add the pair, or combine the value with the stored one by 'acc'
+        of the wrapped tree. Return the resulting pair and whether the
+        key was added.
+        """
+        with self._lock.write():
+            node, success = self._tree.__setitem__(key, val)
+            return self._copy(node), success
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """
+        Return the value stored for 'key', or 'default' if the key is
+        not contained.
+        """
+        with self._lock.read():
+            try:
+                return self._tree[key].val
+            except KeyError:
+                return default
+
+    def update(
+            self,
+            items: Union[TreeDict, dict],
+            ) -> None:
+        """
+        Insert all passed key, value pairs under a single write lock.
+        """
+        with self._lock.write():
+            for k, v in items.items():
+                self._tree.__setitem__(k, v)
+
+    def setdefault(self, key: K, default: V) -> V:
+        """
+        Atomically return the value for 'key', storing 'default' first
+        if the key is not contained.
+        """
+        with self._lock.write():
+            node, success = Tree.insert(self._tree, key)
+            if success:
+                # Bypass 'acc', there was no old value
+                node.val = default
+            return node.val
+
+    def pop(self, key: K, *default: V) -> V:
+        with self._lock.write():
+            try:
+                node = self._tree[key]
+            except KeyError:
+                if default:
+                    return default[0]
+                raise
+            val = node.val
+            self._tree.remove(node)
+            return val
+
+    def values(self) -> List[V]:
+        """
+        Return a snapshot list of all values in the tree.
+        """
+        with self._lock.read():
+            return list(self._tree.values())
+
+    def items(self) -> List[Tuple[K, V]]:
+        """
+        Return a snapshot list of all key, value pairs in the tree.
+        """
+        with self._lock.read():
+            return list(self._tree.items())
+
@@ -0,0 +1,265 @@
+"""
+Record the operations performed on a tree into a compact binary trace
+and replay traces against any tree implementation.
+
+A trace starts with a header, followed by one record per operation: the
+operation code and the operation's keys, each a type tag and payload.
+Ints and floats take 8 bytes, other keys are pickled. Values are not
+recorded, replaying inserts the key as value.
+"""
+from __future__ import annotations
+
+import pickle
+import random
+import struct
+from time import perf_counter, perf_counter_ns
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    )
+
+from .tree import K, ON, Node, Tree
+from .treedict import TreeDict, V
+
+
+MAGIC = b'RBTR\x01'
+
+INSERT, REMOVE, GET, FLOOR_AND_CEIL, NEIGHBORS, SLICE, CONTAINS = range(7)
+OPS = ('insert', 'remove', 'get', 'floor_and_ceil', 'get_neighbors',
+       'slice', 'contains')
+
+_NONE, _INT, _FLOAT, _PICKLED = range(4)
+_OP = struct.Struct('<B')
+_INT_KEY = struct.Struct('<Bq')
+_FLOAT_KEY = struct.Struct('<Bd')
+_PICKLED_KEY = struct.Struct('<BI')
+
+
+def _encode_key(key: Any, out: bytearray) -> None:
+    typ = type(key)
+    if typ is int and -(1 << 63) <= key < (1 << 63):
+        out += _INT_KEY.pack(_INT, key)
+    elif typ is float:
+        out += _FLOAT_KEY.pack(_FLOAT, key)
+    elif key is None:
+        out.append(_NONE)
+    else:
+        data = pickle.dumps(key, pickle.HIGHEST_PROTOCOL)
+        out += _PICKLED_KEY.pack(_PICKLED, len(data))
+        out += data
+
+
+def _decode_key(buf: bytes, pos: int) -> Tuple[Any, int]:
+    tag = buf[pos]
+    if tag == _INT:
+        return _INT_KEY.unpack_from(buf, pos)[1], pos + _INT_KEY.size
+    if tag == _FLOAT:
+        return _FLOAT_KEY.unpack_from(buf, pos)[1], pos + _FLOAT_KEY.size
+    if tag == _NONE:
+        return None, pos + 1
+    size = _PICKLED_KEY.unpack_from(buf, pos)[1]
+    pos += _PICKLED_KEY.size
+    return pickle.loads(buf[pos:pos + size]), pos + size
+
+
+class TraceRecorder:
+    """
+    Wrapper around a tree recording every operation into a trace file,
+    while forwarding it to the tree. Records are buffered and written
+    in blocks.
+
+    Recorded are insert(), remove(), floor_and_ceil(), get_neighbors(),
+    'in', and item access, assignment, deletion and slicing with [].
+    All other attributes, like keys(), items(), first and last, are
+    forwarded to the tree unrecorded, as are iteration and len().
+    Methods inherited by the tree, like TreeDict.get() or pop(), run
+    entirely on the tree and are not recorded either.
+    """
+    def __init__(
+            self,
+            tree: Tree,
+            file: BinaryIO,
+            sample: float = 1.0,
+            buffer_size: int = 1 << 16,
+            seed: Optional[int] = None,
+            ):
+        """
+        :param tree: Tree receiving all operations
+        :param file: Binary file the trace is written to
+        :param sample: Fraction of operations to record. Operations are
+            sampled randomly and independently.
+        :param buffer_size: Number of bytes buffered before writing
+        """
+        self.tree = tree
+        self.sample = sample
+        self.buffer_size = buffer_size
+        self._file = file
+        self._buf = bytearray(MAGIC)
+        self._random = random.Random(seed).random
+
+    def _record(self, op: int, *keys: Any) -> None:
+        if self.sample < 1 and self._random() >= self.sample:
+            return
+        buf = self._buf
+        buf.append(op)
+        for k in keys:
+            _encode_key(k, buf)
+        if len(buf) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self._file.write(self._buf)
+        self._buf.clear()
+        self._file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+    def __enter__(self) -> TraceRecorder:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes not found on the recorder
+        if name == 'tree':
+            # Not yet set, e.g. while unpickling
+            raise AttributeError(name)
+        return getattr(self.tree, name)
+
+    def __len__(self) -> int:
+        return len(self.tree)
+
+    def __str__(self) -> str:
+        return str(self.tree)
+
+    def __iter__(self) -> Iterator[Node]:
+        return iter(self.tree)
+
+    def __reversed__(self) -> Iterator[Node]:
+        return reversed(self.tree)
+
+    def __contains__(self, key: K) -> bool:
+        self._record(CONTAINS, key)
+        return key in self.tree
+
+    def __getitem__(self, key: Union[K, slice]) -> Union[Node, List[Node]]:
+        if isinstance(key, slice):
+            self._record(SLICE, key.start, key.stop)
+        else:
+            self._record(GET, key)
+        return self.tree[key]
+
+    def __setitem__(self, key: K, val: V) -> Tuple[Node, bool]:
+        self._record(INSERT, key)
+        return self.tree.__setitem__(key, val)
+
+    def __delitem__(self, key: K) -> Node:
+        self._record(REMOVE, key)
+        return self.tree.__delitem__(key)
+
+    def insert(self, *args) -> Tuple[Node, bool]:
+        self._record(INSERT, args[0])
+        return self.tree.insert(*args)
+
+    def remove(self, node: Node) -> Node:
+        self._record(REMOVE, node.key)
+        return self.tree.remove(node)
+
+    def floor_and_ceil(self, key: K) -> Tuple[ON, ON]:
+        self._record(FLOOR_AND_CEIL, key)
+        return self.tree.floor_and_ceil(key)
+
+    def get_neighbors(self, key: K) -> Tuple[ON, ON]:
+        self._record(NEIGHBORS, key)
+        return self.tree.get_neighbors(key)
+
+
+def read_trace(file: BinaryIO) -> Iterator[Tuple[int, Tuple[Any, ...]]]:
+    """
+    Yield the operation code and keys of every record in the trace.
+    """
+    buf = file.read()
+    if not buf.startswith(MAGIC):
+        raise ValueError("Not a tree trace")
+    pos = len(MAGIC)
+    end = len(buf)
+    while pos < end:
+        op = buf[pos]
+        pos += 1
+        key, pos = _decode_key(buf, pos)
+        if op == SLICE:
+            stop, pos = _decode_key(buf, pos)
+            yield op, (key, stop)
+        else:
+            yield op, (key,)
+
+
+def replay(
+        file: BinaryIO,
+        factory: Callable[[], Tree] = TreeDict,
+        ) -> Dict[str, Any]:
+    """
+    Drive a new tree created by 'factory' with the operations of a trace
+    and measure them. Return the overall throughput and latency
+    percentiles in nanoseconds per operation type.
+    """
+    records = list(read_trace(file))
+    tree = factory()
+    keyed = isinstance(tree, TreeDict)
+    latencies: List[List[int]] = [[] for _ in OPS]
+    clock = perf_counter_ns
+    start = perf_counter()
+    for op, args in records:
+        key = args[0]
+        t = clock()
+        try:
+            if op == INSERT:
+                if keyed:
+                    tree[key] = key
+                else:
+                    tree.insert(key)
+            elif op == GET:
+                tree[key]
+            elif op == FLOOR_AND_CEIL:
+                tree.floor_and_ceil(key)
+            elif op == REMOVE:
+                del tree[key]
+            elif op == CONTAINS:
+                key in tree
+            elif op == NEIGHBORS:
+                tree.get_neighbors(key)
+            else:
+                tree[key:args[1]]
+        except KeyError:
+            pass
+        latencies[op].append(clock() - t)
+    elapsed = perf_counter() - start
+    report: Dict[str, Any] = {
+        'ops': len(records),
+        'seconds': elapsed,
+        'ops_per_s': len(records) / elapsed if elapsed else 0.0,
+        'latency_ns': {},
+        }
+    for op, lat in enumerate(latencies):
+        if not lat:
+            continue
+        lat.sort()
+        n = len(lat)
+        report['latency_ns'][OPS[op]] = {
+            'count': n,
+            'p50': lat[n // 2],
+            'p90': lat[n * 9 // 10],
+            'p99': lat[n * 99 // 100],
+            'max': lat[-1],
+            }
+    return report
@@ -1,10 +1,20 @@
 from __future__ import annotations
 
-from itertools import takewhile
+import asyncio
+import heapq
+import random
+import sys
+from array import array, typecodes
+from bisect import bisect_left
+from itertools import islice
 from typing import (
+    Any,
+    AsyncIterator,
+    BinaryIO,
     Callable,
     ClassVar,
     Collection,
+    Dict,
     Generic,
     Iterable,
     Iterator,
@@ -12,6 +22,7 @@ from typing import (
     NewType,
     Optional,
     Reversible,
+    Sequence,
     Tuple,
     Type,
     TypeVar,
@@ -22,6 +33,8 @@ from typing import (
 
 K = TypeVar('K')  # Key Type
 
+CHANGED_DURING_ITERATION = "Tree changed during iteration"
+
 
 class Node(Generic[K]):
     """
@@ -50,6 +63,10 @@ class Node(Generic[K]):
         self.parent = parent
         self.left = left
         self.right = right
+        if left is not None:
+            left.parent = self
+        if right is not None:
+            right.parent = self
 
     def __str__(self) -> str:
         """
@@ -59,26 +76,117 @@ class Node(Generic[K]):
         return f"{self.key}{color}"
 
     def __iter__(self) -> Iterator[Node]:
-        stack: List[Node] = []
-        cur: Optional[Node] = self
-        while stack or cur:
-            while cur:
-                stack.append(cur)
-                cur = cur.left
-            cur = stack.pop()
-            yield cur
-            cur = cur.right
+        """
+        Iterate over the subtree rooted in this node in-order. Steps
+        from node to node along the parent pointers, so no stack is
+        needed.
+        """
+        node = self
+        while node.left:
+            node = node.left
+        while True:
+            yield node
+            if node.right:
+                node = node.right
+                while node.left:
+                    node = node.left
+                continue
+            # Climb up until arriving from a left child
+            last = node
+            while node is not self:
+                parent = node.parent
+                if parent is None or parent.right is not node:
+                    if parent is not None and parent.left is node:
+                        node = parent
+                        break
+                    # Nodes linked by hand may lack correct parent
+                    # pointers, continue without them
+                    yield from self._walk_after(last, False)
+                    return
+                node = parent
+            else:
+                return
 
     def __reversed__(self) -> Iterator[Node]:
+        node = self
+        while node.right:
+            node = node.right
+        while True:
+            yield node
+            if node.left:
+                node = node.left
+                while node.right:
+                    node = node.right
+                continue
+            last = node
+            while node is not self:
+                parent = node.parent
+                if parent is None or parent.left is not node:
+                    if parent is not None and parent.right is node:
+                        node = parent
+                        break
+                    yield from self._walk_after(last, True)
+                    return
+                node = parent
+            else:
+                return
+
+    def _walk_after(self, last: Node, reverse: bool) -> Iterator[Node]:
+        """
+        Iterate over the subtree rooted in this node, starting after the
+        node 'last', with a stack instead of the parent pointers.
+        """
         stack: List[Node] = []
-        cur: Optional[Node] = self
-        while stack or cur:
-            while cur:
-                stack.append(cur)
-                cur = cur.right
-            cur = stack.pop()
-            yield cur
-            cur = cur.left
+        node: Optional[Node] = self
+        # Stack the ancestors of 'last' still to be yielded
+        while node is not last:
+            if (last.key < node.key) != reverse:
+                stack.append(node)
+                node = node.right if reverse else node.left
+            else:
+                node = node.left if reverse else node.right
+        node = last.left if reverse else last.right
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.right if reverse else node.left
+            node = stack.pop()
+            yield node
+            node = node.left if reverse else node.right
+
+    @property
+    def successor(self) -> Optional[Node]:
+        """
+        Return the node with the next higher key in the tree, or None.
+        """
+        node = self.right
+        if node:
+            while node.left:
+                node = node.left
+            return node
+        node = self
+        parent = node.parent
+        while parent and parent.right is node:
+            node = parent
+            parent = node.parent
+        return parent
+
+    @property
+    def predecessor(self) -> Optional[Node]:
+        """
+        Return the node with the next lower key in the tree, or None.
+        """
+        node = self.left
+        if node:
+            while node.right:
+                node = node.right
+            return node
+        node = self
+        parent = node.parent
+        while parent and parent.left is node:
+            node = parent
+            parent = node.parent
+        return parent
 
     def __eq__(self, other: object) -> bool: return self.key == other
     def __ne__(self, other: object) -> bool: return self.key != other
@@ -130,12 +238,186 @@ class Tree(Collection, Reversible):
         """
         self.root = root
         self._len = 0
+        # Incremented on every structural modification, so iterators
+        # can detect that the tree was modified underneath them.
+        self._version = 0
         if root:
-            for n in root:
-                self._len += 1
+            self._relink(root)
         for k in keys:
             self.insert(k)
 
+    def _relink(self, root: Node) -> None:
+        """
+        Count the nodes below the passed root and point every child to
+        its parent, which nodes linked by hand may have left out.
+        """
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            self._len += 1
+            for child in (node.left, node.right):
+                if child is not None:
+                    child.parent = node
+                    stack.append(child)
+
+    @classmethod
+    def _from_sorted_nodes(cls, nodes: Sequence[Node], **kwargs) -> Tree:
+        """
+        Construct a tree from unlinked nodes in O(n). The nodes must be
+        sorted by key and keys must be unique. Keyword arguments are
+        passed on to the constructor.
+        """
+        tree = cls(**kwargs)
+        tree.root = _link_sorted(nodes)
+        tree._len = len(nodes)
+        tree._linked()
+        return tree
+
+    @classmethod
+    def load_sorted(cls, keys: Iterable[K], **kwargs) -> Tree:
+        """
+        Construct a tree from keys in ascending order in O(n). The keys
+        are consumed lazily in a single pass, e.g. from a generator
+        reading a file, and no list of them is ever built. Repeated keys
+        are stored once. Keyword arguments are passed on to the
+        constructor.
+        Raises ValueError if a key is less than its predecessor.
+        """
+        make = cls.nodetype
+        return cls._from_sorted_stream(
+            (make(key=k) for k in keys),
+            lambda old, new: None,
+            **kwargs,
+            )
+
+    @classmethod
+    def _from_sorted_stream(
+            cls,
+            nodes: Iterable[Node],
+            merge: Callable[[Node, Node], None],
+            **kwargs,
+            ) -> Tree:
+        """
+        Construct a tree from unlinked nodes in ascending key order in
+        O(n). While consuming them, the nodes are chained through their
+        right child, so they don't need to be collected in a list.
+        'merge' is called with the kept and the dropped node whenever
+        two consecutive nodes share a key.
+        Raises ValueError if a key is less than its predecessor.
+        """
+        head: ON = None
+        tail: ON = None
+        count = 0
+        for node in nodes:
+            if tail is None:
+                head = node
+            elif tail.key < node.key:
+                tail.right = node
+            elif node.key < tail.key:
+                raise ValueError(
+                    f"Key {node.key!r} at position {count} is less than "
+                    f"its predecessor {tail.key!r}"
+                    )
+            else:
+                merge(tail, node)
+                continue
+            tail = node
+            count += 1
+        if tail is not None:
+            tail.right = None
+        tree = cls(**kwargs)
+        tree.root = _link_chain(head, count)
+        tree._len = count
+        tree._linked()
+        return tree
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        Pickle the tree as flat list of its sorted keys instead of the
+        node graph, which is slower and recursive.
+        """
+        state = self.__dict__.copy()
+        for attr in ('root', '_len', '_version'):
+            state.pop(attr, None)
+        nodes = list(self.iter_unchecked())
+        state['keys'] = [n.key for n in nodes]
+        self._add_cargo_state(nodes, state)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """
+        Rebuild a pickled tree in linear time.
+        """
+        nodes = self._nodes_from_state(state)
+        self.__dict__.update(state)
+        self.root = _link_sorted(nodes)
+        self._len = len(nodes)
+        self._version = 0
+        self._linked()
+
+    def _linked(self) -> None:
+        """
+        Called after the nodes were linked into a balanced tree in
+        linear time, without insert(). Linking colors the nodes, so
+        there is nothing left to do for red-black trees. Overridden by
+        other balancing engines to derive their balance information.
+        """
+        pass
+
+    def _add_cargo_state(
+            self,
+            nodes: List[Node],
+            state: Dict[str, Any],
+            ) -> None:
+        """
+        Add the "cargo" attributes of the given nodes to the pickled
+        state. Overridden in child classes storing cargo.
+        """
+        pass
+
+    def _nodes_from_state(self, state: Dict[str, Any]) -> List[Node]:
+        """
+        Remove the pickled keys and cargo from the state and return
+        unlinked nodes storing them.
+        """
+        make = self.nodetype
+        return [make(key=k) for k in state.pop('keys')]
+
+    def copy(self) -> Tree:
+        """
+        Return a shallow copy of the tree. The node structure, including
+        colors, is cloned in one pass without re-inserting any key.
+        Keys and cargo are shared with this tree.
+        """
+        new = object.__new__(type(self))
+        new.__dict__.update(self.__dict__)
+        new._version = 0
+        new.root = None
+        if not self.root:
+            return new
+        new.root = self._clone_node(self.root)
+        # (original node, its clone)
+        stack: List[Tuple[Node, Node]] = [(self.root, new.root)]
+        while stack:
+            node, clone = stack.pop()
+            if node.left:
+                clone.left = self._clone_node(node.left)
+                clone.left.parent = clone
+                stack.append((node.left, clone.left))
+            if node.right:
+                clone.right = self._clone_node(node.right)
+                clone.right.parent = clone
+                stack.append((node.right, clone.right))
+        return new
+
+    __copy__ = copy
+
+    def _clone_node(self, node: Node) -> Node:
+        """
+        Return an unlinked node with the same color and cargo.
+        """
+        return self.nodetype(key=node.key, red=node.red)
+
     def __len__(self) -> int:
         return self._len
 
@@ -144,11 +426,30 @@ class Tree(Collection, Reversible):
 
     def __iter__(self) -> Iterator[Node]:
         if self.root:
-            yield from iter(self.root)
+            version = self._version
+            for node in self.root:
+                yield node
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
 
     def __reversed__(self) -> Iterator[Node]:
         if self.root:
-            yield from reversed(self.root)
+            version = self._version
+            for node in reversed(self.root):
+                yield node
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
+
+    def iter_unchecked(self, reverse: bool = False) -> Iterator[Node]:
+        """
+        Iterate over the tree's nodes without checking for concurrent
+        modification. Slightly faster than regular iteration, but
+        modifying the tree while iterating yields wrong results or
+        errors.
+        """
+        if not self.root:
+            return iter(())
+        return reversed(self.root) if reverse else iter(self.root)
 
     @property
     def first(self) -> Optional[Node]:
@@ -188,15 +489,7 @@ class Tree(Collection, Reversible):
                 raise NotImplementedError(
                     "Slice steps are not implemented"
                     )
-            begin = None
-            if key.start is not None:
-                _, begin = self.floor_and_ceil(key.start)
-                if begin is None:
-                    # Given key is bigger than any in tree.
-                    return []
-            end = None if key.stop is None else \
-                self.floor_and_ceil(key.stop)[1]
-            return [n for n in self._iter_slice(begin, end)]
+            return list(self._iter_range(key.start, key.stop))
         else:
             node = self.root
             while node:
@@ -223,8 +516,289 @@ class Tree(Collection, Reversible):
         Yield an iterator over all the tree's keys
         """
         if self.root:
+            version = self._version
             for node in self.root:
                 yield node.key
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
+
+    def to_arrays(
+            self,
+            lo: Optional[K] = None,
+            hi: Optional[K] = None,
+            dtype: Any = None,
+            ) -> Any:
+        """
+        Return the keys in [lo, hi) as a single array, collected by one
+        iterative traversal instead of a generator.
+        :param dtype: An array.array typecode, or else a NumPy dtype, in
+            which case NumPy must be installed. If None, an array of
+            type 'q' or 'd' is returned if all keys are ints or floats,
+            otherwise a list.
+        """
+        return _to_array([n.key for n in self._collect(lo, hi)], dtype)
+
+    def iter_chunks(
+            self,
+            size: int = 1024,
+            lo: Optional[K] = None,
+            hi: Optional[K] = None,
+            reverse: bool = False,
+            ) -> Iterator[List[K]]:
+        """
+        Yield the keys in [lo, hi) in lists of up to 'size' keys, filled
+        by a single iterative traversal. Much cheaper per key than
+        keys(), which resumes two generators for every key.
+        :param reverse: Yield chunks and the keys within them in
+            descending order
+        """
+        for keys, _ in self._chunks(size, lo, hi, reverse, False):
+            yield keys
+
+    def _chunks(
+            self,
+            size: int,
+            lo: Optional[K],
+            hi: Optional[K],
+            reverse: bool,
+            values: bool,
+            ) -> Iterator[Tuple[List[K], List[Any]]]:
+        """
+        Yield the keys in [lo, hi) in lists of up to 'size' keys for
+        iter_chunks() and its variants, each paired with a list of their
+        values if 'values' is true, or an empty list otherwise. Both are
+        filled directly by the traversal. Raises RuntimeError when
+        resumed after the tree was modified.
+        """
+        version = self._version
+        stack, stop = self._chunk_start(size, lo, hi, reverse)
+        push = stack.append
+        pop = stack.pop
+        while stack:
+            keys: List[K] = []
+            vals: List[Any] = []
+            add_key = keys.append
+            add_val = vals.append if values else None
+            if reverse:
+                for _ in range(size):
+                    node = pop()
+                    if node is stop:
+                        stack.clear()
+                        break
+                    add_key(node.key)
+                    if add_val is not None:
+                        add_val(node.val)
+                    node = node.left
+                    while node:
+                        push(node)
+                        node = node.right
+                    if not stack:
+                        break
+            else:
+                for _ in range(size):
+                    node = pop()
+                    if node is stop:
+                        stack.clear()
+                        break
+                    add_key(node.key)
+                    if add_val is not None:
+                        add_val(node.val)
+                    node = node.right
+                    while node:
+                        push(node)
+                        node = node.left
+                    if not stack:
+                        break
+            if keys:
+                yield keys, vals
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
+
+    def _chunk_start(
+            self,
+            size: int,
+            lo: Optional[K] = None,
+            hi: Optional[K] = None,
+            reverse: bool = False,
+            ) -> Tuple[List[Node], ON]:
+        """
+        Prepare the chunked traversal of the nodes with keys in [lo, hi).
+        Return the traversal stack and the node at which iteration ends,
+        resolved beforehand so that only its identity is tested per
+        node.
+        """
+        if size < 1:
+            raise ValueError("Chunk size must be positive")
+        stack: List[Node] = []
+        if lo is not None and hi is not None and not lo < hi:
+            return stack, None
+        push = stack.append
+        node = self.root
+        if reverse:
+            # Highest node below lo
+            stop = None
+            if lo is not None:
+                n = self.root
+                while n:
+                    if n.key < lo:
+                        stop = n
+                        n = n.right
+                    else:
+                        n = n.left
+            while node:
+                if hi is not None and not node.key < hi:
+                    node = node.left
+                else:
+                    push(node)
+                    node = node.right
+        else:
+            stop = None if hi is None else self.floor_and_ceil(hi)[1]
+            while node:
+                if lo is not None and node.key < lo:
+                    node = node.right
+                else:
+                    push(node)
+                    node = node.left
+        return stack, stop
+
+    def partition_points(
+            self,
+            k: int,
+            exact: bool = False,
+            oversample: int = 8,
+            ) -> List[K]:
+        """
+        Return up to k - 1 ascending keys cutting the tree into k ranges
+        of roughly equal size, each range starting at one of the keys.
+        The lowest key is never returned, so no range is empty. Trees of
+        fewer than k keys are cut into ranges of one key each.
+
+        Nodes don't know the size of their subtree, so by default sizes
+        are estimated from a few random descents. Starting at the root,
+        the subtree estimated largest is split into its root and its
+        child subtrees until all are estimated smaller than a
+        (oversample * k)-th of the tree. The keys at the estimated
+        quantile positions among the resulting subtrees are returned.
+        That takes O(oversample * k * log n) time.
+        :param exact: Find the exact quantile keys by an O(n) traversal
+        :param oversample: Number of sampled nodes per range. The more,
+            the more accurate the estimation.
+        """
+        if k < 1:
+            raise ValueError("Number of partitions must be positive")
+        if k == 1 or not self.root:
+            return []
+        n = self._len
+        if exact or n <= k * oversample:
+            nodes = self._collect()
+            # Index 0 repeats while n < k
+            return _dedupe([nodes[n * i // k].key for i in range(1, k)
+                            if n * i // k])
+
+        # Fixed seed, so that partitioning is deterministic
+        rnd = random.Random(0)
+        # Split the heaviest subtree into its root and child subtrees
+        # until no subtree is estimated larger than the limit.
+        limit = n / (k * oversample)
+        split: List[Node] = []
+        heap = [(-float(n), 0, self.root,
+                 _estimate_size(self.root.left, rnd),
+                 _estimate_size(self.root.right, rnd))]
+        tie = 1
+        while heap and -heap[0][0] > limit:
+            node = heapq.heappop(heap)[2]
+            split.append(node)
+            for child in (node.left, node.right):
+                if child:
+                    left = _estimate_size(child.left, rnd)
+                    right = _estimate_size(child.right, rnd)
+                    heapq.heappush(
+                        heap, (-(left + 1 + right), tie, child, left, right))
+                    tie += 1
+        # Nodes with left and right subtree size estimates
+        sample = [(node, 0.0, 0.0) for node in split]
+        sample += [(node, left, right) for _, _, node, left, right in heap]
+        sample.sort(key=lambda s: s[0].key)
+        # Estimated in-order position of every sampled node
+        positions: List[float] = []
+        pos = 0.0
+        for _, left, right in sample:
+            positions.append(pos + left)
+            pos += left + 1 + right
+        points = []
+        for i in range(1, k):
+            j = bisect_left(positions, pos * i / k)
+            if j < len(sample):
+                points.append(sample[j][0].key)
+        first = self.first.key  # type: ignore[union-attr]
+        return _dedupe([p for p in points if first < p])
+
+    def partitions(
+            self,
+            k: int,
+            exact: bool = False,
+            oversample: int = 8,
+            ) -> List[RangeView]:
+        """
+        Cut the tree into up to k consecutive key ranges of roughly
+        equal size, returned as lazy views. See partition_points().
+        """
+        points = self.partition_points(k, exact, oversample)
+        bounds: List[Optional[K]] = [None, *points, None]
+        return [RangeView(self, lo, hi) for lo, hi in zip(bounds, bounds[1:])]
+
+    def _collect(
+            self,
+            lo: Optional[K] = None,
+            hi: Optional[K] = None,
+            ) -> List[Node]:
+        """
+        Return a list of the nodes with keys in [lo, hi) in order. None
+        stands for an open bound.
+        """
+        out: List[Node] = []
+        append = out.append
+        stack: List[Node] = []
+        push = stack.append
+        pop = stack.pop
+        node = self.root
+        # Descend to lo, remembering nodes to visit after their left
+        # subtree. Right subtrees of these are all greater equal lo.
+        while node:
+            if lo is not None and node.key < lo:
+                node = node.right
+            else:
+                push(node)
+                node = node.left
+        while stack:
+            node = pop()
+            if hi is not None and not node.key < hi:
+                break
+            append(node)
+            node = node.right
+            while node:
+                push(node)
+                node = node.left
+        return out
+
+    def _iter_range(
+            self,
+            lo: Optional[K] = None,
+            hi: Optional[K] = None,
+            ) -> Iterator[Node]:
+        """
+        Iterate over the tree's nodes in-order, starting from the lowest
+        key greater equal 'lo' and stopping before the lowest key
+        greater equal 'hi'. None stands for an open bound.
+        """
+        begin = None
+        if lo is not None:
+            _, begin = self.floor_and_ceil(lo)
+            if begin is None:
+                # Given key is bigger than any in tree.
+                return iter(())
+        end = None if hi is None else self.floor_and_ceil(hi)[1]
+        return self._iter_slice(begin, end)
 
     def _iter_slice(
             self,
@@ -245,45 +819,139 @@ class Tree(Collection, Reversible):
             start = self.first
         # test again if there is actually a minimal node
         if start is not None:
-            if stop is None:
-                yield from self.iter_from(start)
-            else:
-                yield from takewhile(
-                    lambda x: x is not stop,
-                    self.iter_from(start),
-                    )
+            version = self._version
+            node: ON = start
+            while node is not None and node is not stop:
+                yield node
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
+                if node.right:
+                    node = node.right
+                    while node.left:
+                        node = node.left
+                else:
+                    parent = node.parent
+                    while parent and parent.right is node:
+                        node = parent
+                        parent = node.parent
+                    node = parent
 
     def iter_from(self, start: Node) -> Iterator[Node]:
         """
         Iterate over the tree's nodes in-order, starting from the given
         node.
         """
-        n: ON = start
-        while n:
-            if n >= start:
-                yield n
-                if n.right:
-                    try:
-                        yield from iter(n.right)
-                    except StopIteration:
-                        pass
-            n = n.parent
+        version = self._version
+        node: ON = start
+        while node:
+            yield node
+            if self._version != version:
+                raise RuntimeError(CHANGED_DURING_ITERATION)
+            # Step to the successor, inlined
+            if node.right:
+                node = node.right
+                while node.left:
+                    node = node.left
+            else:
+                parent = node.parent
+                while parent and parent.right is node:
+                    node = parent
+                    parent = node.parent
+                node = parent
 
     def reverse_from(self, start: Node) -> Iterator[Node]:
         """
         Iterate over the tree's nodes in reverse order, starting from
         the given node.
         """
-        n: ON = start
-        while n:
-            if n <= start:
+        version = self._version
+        node: ON = start
+        while node:
+            yield node
+            if self._version != version:
+                raise RuntimeError(CHANGED_DURING_ITERATION)
+            if node.left:
+                node = node.left
+                while node.right:
+                    node = node.right
+            else:
+                parent = node.parent
+                while parent and parent.left is node:
+                    node = parent
+                    parent = node.parent
+                node = parent
+
+    async def aiter(
+            self,
+            lo: Optional[K] = None,
+            hi: Optional[K] = None,
+            chunk: int = 1000,
+            ) -> AsyncIterator[Node]:
+        """
+        Asynchronously iterate over the tree's nodes with keys in
+        [lo, hi), handing control back to the event loop after every
+        'chunk' nodes. None stands for an open bound.
+        Raises RuntimeError if the tree is modified during iteration.
+        """
+        if chunk < 1:
+            raise ValueError("Chunk size must be positive")
+        version = self._version
+        it = self._iter_range(lo, hi)
+        while True:
+            nodes = list(islice(it, chunk))
+            for n in nodes:
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
                 yield n
-                if n.left:
-                    try:
-                        yield from reversed(n.left)
-                    except StopIteration:
-                        pass
-            n = n.parent
+            if len(nodes) < chunk:
+                return
+            await asyncio.sleep(0)
+            if self._version != version:
+                raise RuntimeError(CHANGED_DURING_ITERATION)
+
+    async def aupdate(self, keys: Iterable[K], chunk: int = 1000) -> None:
+        """
+        Insert all passed keys, handing control back to the event loop
+        after every 'chunk' insertions. The tree is consistent whenever
+        control is handed back.
+        """
+        if chunk < 1:
+            raise ValueError("Chunk size must be positive")
+        it = iter(keys)
+        while True:
+            count = 0
+            for k in islice(it, chunk):
+                self.insert(k)
+                count += 1
+            if count < chunk:
+                return
+            await asyncio.sleep(0)
+
+    async def aremove_range(
+            self,
+            lo: Optional[K] = None,
+            hi: Optional[K] = None,
+            chunk: int = 1000,
+            ) -> int:
+        """
+        Remove all nodes with keys in [lo, hi), handing control back to
+        the event loop after every 'chunk' removals. None stands for an
+        open bound. Keys inserted into the range by others in the
+        meantime are removed as well, if not yet passed.
+        :return: Number of removed nodes
+        """
+        if chunk < 1:
+            raise ValueError("Chunk size must be positive")
+        removed = 0
+        while True:
+            keys = [n.key for n in islice(self._iter_range(lo, hi), chunk)]
+            for k in keys:
+                self.remove(self[k])
+            removed += len(keys)
+            if len(keys) < chunk:
+                return removed
+            lo = keys[-1]
+            await asyncio.sleep(0)
 
     def insert(self, key: K) -> Tuple[Node, bool]:
         """
@@ -295,6 +963,7 @@ class Tree(Collection, Reversible):
         if not self.root:
             self.root = self.nodetype(key=key)
             self._len += 1
+            self._version += 1
             return self.root, True
 
         parent, side = self._find_parent(key)
@@ -315,6 +984,7 @@ class Tree(Collection, Reversible):
 
         self._try_rebalance(new_node)
         self._len += 1
+        self._version += 1
         return new_node, True
 
     def remove(self, node: Node) -> Node:
@@ -335,8 +1005,17 @@ class Tree(Collection, Reversible):
 
         self._remove(node)
         self._len -= 1
+        self._version += 1
         return node
 
+    def clear(self) -> None:
+        """
+        Remove all nodes from the tree.
+        """
+        self.root = None
+        self._len = 0
+        self._version += 1
+
     def _copy_node_attr(self, source: Node, target: Node) -> None:
         """
         Copy over all "cargo" attributes from source to target. Those
@@ -344,6 +1023,7 @@ class Tree(Collection, Reversible):
         for creating a tree structure.
         """
         target.key = source.key
+        self._version += 1
 
     def _remove(self, node: Node) -> None:
         """
@@ -435,6 +1115,131 @@ class Tree(Collection, Reversible):
                 break
         return prev, succ
 
+    def stats(self, memory: bool = True) -> Dict[str, Any]:
+        """
+        Describe the tree's shape in a single iterative pass:
+            size: number of nodes
+            height: number of nodes on the longest root-leaf path
+            black_height: number of black nodes on any root-leaf path
+            depth_histogram: number of nodes by depth, root at depth 0
+            avg_search_depth: average number of nodes visited when
+                searching a contained key
+            red, black: number of red and black nodes
+            red_ratio: fraction of red nodes
+            bytes: estimated memory use of nodes, keys and cargo
+            bytes_per_entry: bytes divided by size
+        Memory is estimated with sys.getsizeof(), counting objects
+        shared between entries once per entry. Pass memory=False to
+        skip the estimate, which is the costlier part.
+        """
+        histogram: List[int] = []
+        red = 0
+        black_height = 0
+        nbytes = sys.getsizeof(self)
+        stack: List[Tuple[Node, int, int]] = []
+        if self.root:
+            stack.append((self.root, 0, 0))
+        while stack:
+            node, depth, blacks = stack.pop()
+            if depth == len(histogram):
+                histogram.append(0)
+            histogram[depth] += 1
+            if node.red:
+                red += 1
+            else:
+                blacks += 1
+            if memory:
+                nbytes += self._node_size(node)
+            if node.left:
+                stack.append((node.left, depth + 1, blacks))
+            if node.right:
+                stack.append((node.right, depth + 1, blacks))
+            if not (node.left and node.right):
+                black_height = blacks
+        size = sum(histogram)
+        ret: Dict[str, Any] = {
+            'size': size,
+            'height': len(histogram),
+            'black_height': black_height,
+            'depth_histogram': histogram,
+            'avg_search_depth': sum(
+                (d + 1) * c for d, c in enumerate(histogram)) / (size or 1),
+            'red': red,
+            'black': size - red,
+            'red_ratio': red / (size or 1),
+            }
+        if memory:
+            ret['bytes'] = nbytes
+            ret['bytes_per_entry'] = nbytes / (size or 1)
+        return ret
+
+    def _node_size(self, node: Node) -> int:
+        """
+        Return the estimated number of bytes used by the node and the
+        information it stores. Overridden in child classes storing
+        more cargo.
+        """
+        return sys.getsizeof(node) + sys.getsizeof(node.key)
+
+    def validate(self) -> None:
+        """
+        Check all red-black tree invariants, parent links, key order and
+        the stored length in a single iterative pass. Raises
+        AssertionError describing the first violation found.
+        """
+        root = self.root
+        if root is None:
+            if self._len:
+                raise AssertionError(f"Empty tree has length {self._len}")
+            return
+        if root.parent is not None:
+            raise AssertionError("Root has a parent")
+        if root.red:
+            raise AssertionError("Root is red")
+        count = 0
+        black_height = None
+        # (node, black nodes above, exclusive lower and upper key bound)
+        stack: List[Tuple[Node, int, ON, ON]] = [(root, 0, None, None)]
+        while stack:
+            node, blacks, lo, hi = stack.pop()
+            count += 1
+            if (lo is not None and not lo.key < node.key) \
+                    or (hi is not None and not node.key < hi.key):
+                raise AssertionError(f"Node {node} violates key order")
+            if not node.red:
+                blacks += 1
+            for child in (node.left, node.right):
+                if child is None:
+                    if black_height is None:
+                        black_height = blacks
+                    elif blacks != black_height:
+                        raise AssertionError(
+                            f"Black height {blacks} below {node} differs "
+                            f"from {black_height}"
+                            )
+                    continue
+                if child.parent is not node:
+                    raise AssertionError(
+                        f"Parent link of {child} doesn't point to {node}")
+                if node.red and child.red:
+                    raise AssertionError(f"Red {node} has red child {child}")
+            if node.left:
+                stack.append((node.left, blacks, lo, node))
+            if node.right:
+                stack.append((node.right, blacks, node, hi))
+        if count != self._len:
+            raise AssertionError(
+                f"Tree has {count} nodes, but length {self._len}")
+
+    def dump(self, file: Union[str, BinaryIO], index_stride: int = 64) -> None:
+        """
+        Write the tree to a snapshot file, which can be opened without
+        loading it by redblack.mapped.MappedTreeView. Keys must all be
+        ints or all be floats. See redblack.mapped.dump().
+        """
+        from .mapped import dump
+        dump(self, file, index_stride)
+
     def _find_parent(self, key: K) -> Tuple[Node, Optional[Side]]:
         """
         Find the right parent for a given key as well as
@@ -615,6 +1420,7 @@ class Tree(Collection, Reversible):
             grampa.red = True
 
     def _rotate_right(self, a: Node, b: Node) -> None:
+        self._version += 1
         self._set_parent(child=a, parent=b.parent)
         tmp = a.right
         a.right = b
@@ -624,6 +1430,7 @@ class Tree(Collection, Reversible):
             tmp.parent = b
 
     def _rotate_left(self, a: Node, b: Node) -> None:
+        self._version += 1
         self._set_parent(child=a, parent=b.parent)
         tmp = a.left
         a.left = b
@@ -653,11 +1460,166 @@ class Tree(Collection, Reversible):
         return self._rotate_right if side == 'L' else self._rotate_left
 
 
+class RangeView:
+    """
+    Lazy view of the keys in [lo, hi) of a tree, with None standing for
+    an open bound. Reflects later changes of the tree.
+    """
+    def __init__(self, tree: Tree, lo: Optional[K], hi: Optional[K]):
+        self.tree = tree
+        self.lo = lo
+        self.hi = hi
+
+    def __repr__(self) -> str:
+        return f"RangeView({self.lo!r}, {self.hi!r})"
+
+    def __iter__(self) -> Iterator[Node]:
+        return self.tree._iter_range(self.lo, self.hi)
+
+    def __contains__(self, key: K) -> bool:
+        if self.lo is not None and key < self.lo:
+            return False
+        if self.hi is not None and not key < self.hi:
+            return False
+        return key in self.tree
+
+    def keys(self) -> Iterator[K]:
+        for node in self:
+            yield node.key
+
+    def to_arrays(self, *args, **kwargs) -> Any:
+        """
+        See Tree.to_arrays()
+        """
+        return self.tree.to_arrays(self.lo, self.hi, *args, **kwargs)
+
+
+def _estimate_size(node: ON, rnd: random.Random, probes: int = 4) -> float:
+    """
+    Estimate the number of nodes in the subtree rooted in the given node
+    with Knuth's estimator: descend along random paths and sum the
+    products of the numbers of children passed. Each path's sum is an
+    unbiased estimate of the size, their average is returned.
+    """
+    if node is None:
+        return 0.0
+    total = 0.0
+    for _ in range(probes):
+        n: ON = node
+        width = 1.0
+        while n:
+            total += width
+            if n.left and n.right:
+                width *= 2
+                n = n.left if rnd.random() < 0.5 else n.right
+            else:
+                n = n.left or n.right
+    return total / probes
+
+
+def _dedupe(keys: List[K]) -> List[K]:
+    """
+    Remove consecutive duplicates from a sorted list.
+    """
+    return [k for i, k in enumerate(keys) if not i or keys[i - 1] != k]
+
+
+def _to_array(items: List[Any], dtype: Any = None) -> Any:
+    """
+    Convert the list to an array.array of the given typecode, or a NumPy
+    array of the given dtype. See Tree.to_arrays().
+    """
+    if dtype is None:
+        types = set(map(type, items))
+        if types == {int}:
+            try:
+                return array('q', items)
+            except OverflowError:
+                return items
+        if types == {float}:
+            return array('d', items)
+        if not items:
+            return array('q')
+        return items
+    if isinstance(dtype, str) and len(dtype) == 1 and dtype in typecodes:
+        return array(dtype, items)
+    import numpy
+    return numpy.array(items, dtype=dtype)
+
+
 def _not_red(node: Optional[Node]) -> bool:
     """Returns True if node is None or black"""
     return not (node and node.red)
 
 
+def _link_chain(head: ON, count: int) -> ON:
+    """
+    Link 'count' nodes, sorted by key and chained through their right
+    child starting with 'head', into a valid red-black tree in O(n) and
+    return its root. Produces the same shape and colors as
+    _link_sorted(). Recursion depth is logarithmic in 'count'.
+    """
+    red_depth = count.bit_length() - 1
+
+    def link(size: int, depth: int) -> ON:
+        nonlocal head
+        if not size:
+            return None
+        left = link(size // 2, depth + 1)
+        node = head
+        assert node
+        head = node.right
+        node.left = left
+        if left:
+            left.parent = node
+        node.red = depth == red_depth and depth > 0
+        node.right = right = link(size - size // 2 - 1, depth + 1)
+        if right:
+            right.parent = node
+        return node
+
+    root = link(count, 0)
+    if root:
+        root.parent = None
+    return root
+
+
+def _link_sorted(nodes: Sequence[Node]) -> ON:
+    """
+    Link nodes sorted by key into a valid red-black tree in O(n) and
+    return its root. Every subtree is rooted at the median of its
+    nodes, so sibling subtrees differ in size by at most one and all
+    leaves end up on the two lowest levels. Coloring the lowest level
+    red and everything else black thus gives every path the same
+    number of black nodes.
+    """
+    n = len(nodes)
+    if not n:
+        return None
+    red_depth = n.bit_length() - 1
+    root = None
+    # (begin, end, parent, is right child, depth)
+    stack: List[Tuple[int, int, ON, bool, int]] = [(0, n, None, False, 0)]
+    while stack:
+        begin, end, parent, right, depth = stack.pop()
+        mid = (begin + end) // 2
+        node = nodes[mid]
+        node.parent = parent
+        node.left = node.right = None
+        node.red = depth == red_depth and depth > 0
+        if parent is None:
+            root = node
+        elif right:
+            parent.right = node
+        else:
+            parent.left = node
+        if begin < mid:
+            stack.append((begin, mid, node, False, depth + 1))
+        if mid + 1 < end:
+            stack.append((mid + 1, end, node, True, depth + 1))
+    return root
+
+
 r"""
 Case 1 applies when there's a double black node at the root.
 Because it's the root, we can simply remove it and reduce
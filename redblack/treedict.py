@@ -1,21 +1,37 @@
+import asyncio
+import sys
+from itertools import islice
 from typing import (
+    Any,
     Callable,
     ClassVar,
+    Dict,
     Generic,
+    Iterable,
     Iterator,
+    List,
     Mapping,
     MutableMapping,
     Optional,
     Tuple,
     Type,
     TypeVar,
+    Union,
     )
 
-from .tree import K, Node, Tree
+from .tree import CHANGED_DURING_ITERATION, K, Node, Tree, _to_array
 
 V = TypeVar('V')  # Value Type
 
 
+def overwrite(old: V, new: V) -> V:
+    """
+    Default accumulator of TreeDict, replacing the old value. Defined on
+    module level, unlike a lambda, so that it can be pickled.
+    """
+    return new
+
+
 class DictNode(Node, Generic[V]):
     """
     Node forming a dictionary based on a red-black tree. It stores a key
@@ -45,7 +61,7 @@ class TreeDict(Tree, MutableMapping[K, V]):
             self,
             root: Optional[DictNode] = None,
             items: Mapping[K, V] = {},
-            acc: Callable[[V, V], V] = lambda _, x: x,
+            acc: Callable[[V, V], V] = overwrite,
     ):
         """
         :param root: Initialize the tree from an already existing one.
@@ -74,6 +90,32 @@ class TreeDict(Tree, MutableMapping[K, V]):
             self.__setitem__(*i)
         self.acc = acc
 
+    @classmethod
+    def load_sorted_items(
+            cls,
+            items: Iterable[Tuple[K, V]],
+            acc: Callable[[V, V], V] = overwrite,
+            **kwargs,
+            ) -> 'TreeDict':
+        """
+        Construct a dictionary from key, value pairs in ascending key
+        order in O(n), consuming them lazily in a single pass. Values of
+        repeated keys are combined with 'acc'. Other keyword arguments
+        are passed on to the constructor.
+        Raises ValueError if a key is less than its predecessor.
+        """
+        make = cls.nodetype
+
+        def merge(old: DictNode, new: DictNode) -> None:
+            old.val = acc(old.val, new.val)
+
+        return cls._from_sorted_stream(
+            (make(key=k, val=v) for k, v in items),
+            merge,
+            acc=acc,
+            **kwargs,
+            )
+
     def __setitem__(self, key: K, val: V) -> Tuple[DictNode, bool]:
         node, success = super().insert(key)
         node.val = val if success else self.acc(node.val, val)
@@ -81,15 +123,94 @@ class TreeDict(Tree, MutableMapping[K, V]):
 
     insert = __setitem__
 
+    async def aupdate(  # type: ignore[override]
+            self,
+            items: Union[Mapping[K, V], Iterable[Tuple[K, V]]],
+            chunk: int = 1000,
+            ) -> None:
+        """
+        Insert all passed key, value pairs, handing control back to the
+        event loop after every 'chunk' insertions. The dictionary is
+        consistent whenever control is handed back.
+        """
+        if chunk < 1:
+            raise ValueError("Chunk size must be positive")
+        it = iter(items.items() if isinstance(items, Mapping) else items)
+        while True:
+            count = 0
+            for k, v in islice(it, chunk):
+                self.__setitem__(k, v)
+                count += 1
+            if count < chunk:
+                return
+            await asyncio.sleep(0)
+
     def values(self) -> Iterator[V]:
         if self.root:
+            version = self._version
             for node in self.root:
                 yield node.val
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
 
     def items(self) -> Iterator[Tuple[K, V]]:
         if self.root:
+            version = self._version
             for node in self.root:
                 yield (node.key, node.val)
+                if self._version != version:
+                    raise RuntimeError(CHANGED_DURING_ITERATION)
+
+    def items_chunks(
+            self,
+            size: int = 1024,
+            lo: Optional[K] = None,
+            hi: Optional[K] = None,
+            reverse: bool = False,
+            ) -> Iterator[Tuple[List[K], List[V]]]:
+        """
+        Yield the items with keys in [lo, hi) as pairs of a key list and
+        a value list of up to 'size' entries each, avoiding the
+        generator resume and tuple allocation per item of items(). See
+        Tree.iter_chunks().
+        """
+        return self._chunks(size, lo, hi, reverse, True)
+
+    def to_arrays(  # type: ignore[override]
+            self,
+            lo: Optional[K] = None,
+            hi: Optional[K] = None,
+            dtype: Any = None,
+            value_dtype: Any = None,
+            ) -> Tuple[Any, Any]:
+        """
+        Return the keys and values of all items with keys in [lo, hi)
+        as two arrays. See Tree.to_arrays().
+        :param value_dtype: Like dtype, but for the values
+        """
+        nodes = self._collect(lo, hi)
+        return (_to_array([n.key for n in nodes], dtype),
+                _to_array([n.val for n in nodes], value_dtype))
+
+    def _add_cargo_state(
+            self,
+            nodes: List[DictNode],
+            state: Dict[str, Any],
+            ) -> None:
+        state['values'] = [n.val for n in nodes]
+
+    def _nodes_from_state(self, state: Dict[str, Any]) -> List[DictNode]:
+        make = self.nodetype
+        return [make(key=k, val=v)
+                for k, v in zip(state.pop('keys'), state.pop('values'))]
+
+    def _clone_node(self, node: DictNode) -> DictNode:
+        clone = super()._clone_node(node)
+        clone.val = node.val
+        return clone
+
+    def _node_size(self, node: DictNode) -> int:
+        return super()._node_size(node) + sys.getsizeof(node.val)
 
     def _copy_node_attr(
             self,
@@ -0,0 +1,31 @@
+import unittest
+
+from redblack import TreeDict
+
+
+class ArrayExportTests(unittest.TestCase):
+
+    def test_dict_to_arrays(self):
+        d = TreeDict(items={k: k / 2 for k in range(10)})
+        ks, vs = d.to_arrays(hi=4)
+        self.assertEqual((ks.tolist(), vs.typecode), ([0, 1, 2, 3], 'd'))
+        self.assertEqual(vs.tolist(), [0, 0.5, 1, 1.5])
+        d[10] = 'x'
+        self.assertEqual(d.to_arrays(8)[0].tolist(), [8, 9, 10])
+        with self.assertRaises(TypeError):
+            d.to_arrays(value_dtype='d')
+        self.assertEqual(d.to_arrays(9)[1], [4.5, 'x'])
+
+    def test_items_chunks(self):
+        d = TreeDict(items={k: -k for k in range(100)})
+        chunks = list(d.items_chunks(30, lo=10))
+        self.assertEqual([len(ks) for ks, _ in chunks], [30, 30, 30])
+        self.assertEqual(chunks[0][0][:2], [10, 11])
+        self.assertEqual(chunks[0][1][:2], [-10, -11])
+        ks, vs = next(d.items_chunks(5, hi=50, reverse=True))
+        self.assertEqual(list(zip(ks, vs)), list(d.items())[49:44:-1])
+        with self.assertRaises(RuntimeError):
+            for _ in d.items_chunks(10):
+                del d[0]
+        self.assertEqual(list(d.items_chunks(4, lo=7, hi=3)), [])
+        self.assertEqual(list(d.items_chunks(4, 7, 3, reverse=True)), [])
@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+
+from redblack import Tree, TreeDict
+
+
+class AsyncTests(unittest.TestCase):
+
+    def test_aiter(self):
+        tree = Tree(keys=range(100))
+
+        async def collect(*args, **kwargs):
+            return [n.key async for n in tree.aiter(*args, **kwargs)]
+        self.assertEqual(asyncio.run(collect(chunk=7)), list(range(100)))
+        self.assertEqual(asyncio.run(collect(10, 20, chunk=3)),
+                         list(range(10, 20)))
+        self.assertEqual(asyncio.run(collect(200)), [])
+
+    def test_aiter_detects_modification(self):
+        tree = Tree(keys=range(100))
+
+        async def mutate():
+            await asyncio.sleep(0)
+            tree.insert(1000)
+
+        async def consume():
+            return [n async for n in tree.aiter(chunk=10)]
+
+        async def main():
+            await asyncio.gather(consume(), mutate())
+        with self.assertRaises(RuntimeError):
+            asyncio.run(main())
+
+    def test_aupdate_and_aremove_range(self):
+        d = TreeDict()
+
+        async def main():
+            await d.aupdate(((k, -k) for k in range(50)), chunk=8)
+            self.assertEqual(len(d), 50)
+            await d.aupdate({1: 1})
+            self.assertEqual(d[1].val, 1)
+            removed = await d.aremove_range(10, 40, chunk=4)
+            self.assertEqual(removed, 30)
+        asyncio.run(main())
+        self.assertEqual(list(d.keys()), list(range(10)) + list(range(40, 50)))
+
+    def test_bad_chunk(self):
+        tree = Tree(keys=range(10))
+        d = TreeDict(items={1: 1})
+
+        async def main(chunk):
+            with self.assertRaises(ValueError):
+                [n async for n in tree.aiter(chunk=chunk)]
+            with self.assertRaises(ValueError):
+                await tree.aupdate(range(5), chunk=chunk)
+            with self.assertRaises(ValueError):
+                await d.aupdate({2: 2}, chunk=chunk)
+            with self.assertRaises(ValueError):
+                await tree.aremove_range(chunk=chunk)
+        for chunk in (0, -1):
+            asyncio.run(main(chunk))
+        self.assertEqual(len(tree), 10)
+        self.assertEqual(len(d), 1)
+
+    def test_yields_to_loop(self):
+        tree = Tree()
+        ticks = []
+
+        async def ticker():
+            for i in range(5):
+                ticks.append(len(tree))
+                await asyncio.sleep(0)
+
+        async def main():
+            await asyncio.gather(tree.aupdate(range(100), chunk=20), ticker())
+        asyncio.run(main())
+        self.assertEqual(len(tree), 100)
+        self.assertLess(ticks[1], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import copy
+import operator
+import pickle
+import random
+import unittest
+
+from redblack.btree import BTree, BTreeDict
+
+
+class BTreeTests(unittest.TestCase):
+
+    def test_random_updates(self):
+        rnd = random.Random(2)
+        for fanout in (4, 5, 16):
+            tree = BTree(fanout=fanout)
+            ref = set()
+            for i in range(5000):
+                key = rnd.randrange(800)
+                if rnd.random() < 0.55:
+                    tree.insert(key)
+                    ref.add(key)
+                elif key in ref:
+                    tree.remove(tree[key])
+                    ref.discard(key)
+                if i % 250 == 0:
+                    tree.validate()
+            tree.validate()
+            self.assertEqual(list(tree.keys()), sorted(ref))
+            self.assertEqual([e.key for e in reversed(tree)],
+                             sorted(ref, reverse=True))
+            for key in list(ref):
+                del tree[key]
+            tree.validate()
+            self.assertEqual(len(tree), 0)
+            self.assertIsNone(tree.first)
+
+    def test_search(self):
+        tree = BTree(keys=range(0, 1000, 2), fanout=8)
+        self.assertIn(500, tree)
+        self.assertNotIn(501, tree)
+        self.assertEqual([e.key for e in tree.floor_and_ceil(501)],
+                         [500, 502])
+        self.assertEqual([e.key for e in tree.floor_and_ceil(500)],
+                         [500, 500])
+        self.assertEqual([e.key for e in tree.get_neighbors(500)],
+                         [498, 502])
+        self.assertEqual(tree.floor_and_ceil(-1), (None, tree.first))
+        self.assertEqual(tree.get_neighbors(998), (tree[996], None))
+        self.assertEqual([e.key for e in tree[95:111]], list(range(96, 111, 2)))
+        self.assertEqual(len(tree[:]), 500)
+        self.assertEqual(tree.last.key, 998)
+        with self.assertRaises(KeyError):
+            tree[1]
+        with self.assertRaises(NotImplementedError):
+            tree[::2]
+
+    def test_load_sorted(self):
+        for n in (0, 1, 7, 8, 9, 100, 1000):
+            tree = BTree.load_sorted(range(n), fanout=8)
+            tree.validate()
+            self.assertEqual(list(tree.keys()), list(range(n)))
+        with self.assertRaises(ValueError):
+            BTree.load_sorted([2, 1])
+        with self.assertRaises(ValueError):
+            BTree(fanout=3)
+
+    def test_dict(self):
+        d = BTreeDict(acc=operator.add, fanout=4)
+        for k in range(100):
+            d[k % 30] = 1
+        d.validate()
+        self.assertEqual(dict(d.items()),
+                         {k: 4 if k < 10 else 3 for k in range(30)})
+        d[3].val = 0
+        self.assertEqual(d[3].val, 0)
+        del d[3]
+        self.assertNotIn(3, d)
+        loaded = BTreeDict.load_sorted_items([(1, 1), (1, 2), (2, 3)],
+                                             acc=operator.add)
+        self.assertEqual(list(loaded.items()), [(1, 3), (2, 3)])
+        clone = pickle.loads(pickle.dumps(loaded))
+        self.assertEqual(list(clone.values()), [3, 3])
+        self.assertEqual(clone.acc, operator.add)
+
+    def test_pickle_large(self):
+        # Deep leaf chains must not be pickled recursively
+        tree = BTree.load_sorted(range(100000), fanout=4)
+        for clone in (pickle.loads(pickle.dumps(tree)), copy.deepcopy(tree)):
+            clone.validate()
+            self.assertEqual(clone.fanout, 4)
+            self.assertEqual(list(clone.keys()), list(range(100000)))
+            clone.insert(-1)
+            self.assertEqual(clone.first.key, -1)
+        d = BTreeDict.load_sorted_items(((k, -k) for k in range(100000)),
+                                        acc=operator.add)
+        clone = pickle.loads(pickle.dumps(d))
+        clone.validate()
+        self.assertEqual(list(clone.items()), list(d.items()))
+        self.assertEqual(clone.acc, operator.add)
+        empty = pickle.loads(pickle.dumps(BTreeDict()))
+        empty.validate()
+        empty[1] = 1
+        self.assertEqual(list(empty.items()), [(1, 1)])
+
+    def test_changed_during_iteration(self):
+        tree = BTree(keys=range(10))
+        with self.assertRaises(RuntimeError):
+            for e in tree:
+                tree.insert(e.key + 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
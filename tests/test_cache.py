@@ -0,0 +1,110 @@
+import copy
+import pickle
+import random
+import unittest
+
+from redblack import DefaultTreeDict, Tree, TreeDict
+from redblack.cache import LookupCache, LRUCache, disable_cache, enable_cache
+from redblack.engines import SplayTree
+
+
+class CacheTests(unittest.TestCase):
+
+    def test_toggle(self):
+        tree = Tree(keys=range(100))
+        cache = enable_cache(tree, maxsize=10)
+        self.assertIsInstance(tree, Tree)
+        self.assertIs(tree.lookup_cache, cache)
+        self.assertIs(tree[5], tree[5])
+        self.assertIn(5, tree)
+        self.assertNotIn(500, tree)
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        self.assertEqual(cache.hit_rate, 0.5)
+        disable_cache(tree)
+        self.assertIs(type(tree), Tree)
+        self.assertFalse(hasattr(tree, 'lookup_cache'))
+        disable_cache(tree)
+        with self.assertRaises(ValueError):
+            enable_cache(tree, policy='fifo')
+
+    def test_abstract(self):
+        class Incomplete(LookupCache):
+            def get(self, key):
+                return None
+
+        with self.assertRaises(TypeError):
+            LookupCache(1)
+        with self.assertRaises(TypeError):
+            Incomplete(1)
+        self.assertEqual(len(LRUCache(1)), 0)
+
+    def test_invalidation(self):
+        rnd = random.Random(8)
+        for policy in ('lru', 'lfu'):
+            d = TreeDict(items={k: k for k in range(300)})
+            cache = enable_cache(d, maxsize=32, policy=policy)
+            ref = dict.fromkeys(range(300))
+            for _ in range(5000):
+                key = rnd.randrange(400)
+                op = rnd.random()
+                if op < 0.6:
+                    self.assertEqual(key in d, key in ref)
+                    if key in ref:
+                        self.assertEqual(d[key].key, key)
+                        self.assertEqual(d[key].val, key)
+                elif op < 0.8:
+                    d[key] = key
+                    ref[key] = None
+                elif key in ref:
+                    del d[key]
+                    del ref[key]
+                self.assertLessEqual(len(cache), 32)
+            d.validate()
+            self.assertGreater(cache.hits, 0)
+            d.clear()
+            self.assertEqual(len(cache), 0)
+            self.assertEqual(len(d), 0)
+            self.assertNotIn(5, d)
+
+    def test_lfu(self):
+        tree = Tree(keys=range(10))
+        cache = enable_cache(tree, maxsize=2, policy='lfu')
+        for _ in range(3):
+            tree[1]
+        tree[2]
+        tree[3]
+        # 2 was evicted, 1 is frequent
+        self.assertEqual(cache.hits, 2)
+        tree[1]
+        tree[3]
+        self.assertEqual(cache.hits, 4)
+        tree[2]
+        self.assertEqual(cache.hits, 4)
+
+    def test_defaults_and_engines(self):
+        d = DefaultTreeDict(int)
+        enable_cache(d)
+        self.assertEqual(d[3], 0)
+        d[3] = 1
+        self.assertEqual(d[3].val, 1)
+        tree = SplayTree(keys=range(100))
+        enable_cache(tree)
+        self.assertEqual(tree[50].key, 50)
+        tree.remove(tree[50])
+        self.assertNotIn(50, tree)
+        tree.validate()
+
+    def test_copy_and_pickle(self):
+        tree = TreeDict(items={k: k for k in range(10)})
+        enable_cache(tree)
+        tree[3]
+        clone = copy.copy(tree)
+        self.assertEqual(len(clone.lookup_cache), 0)
+        self.assertIsNot(clone[3], tree[3])
+        loaded = pickle.loads(pickle.dumps(tree))
+        self.assertIs(type(loaded), TreeDict)
+        self.assertEqual(loaded[3].val, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
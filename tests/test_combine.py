@@ -0,0 +1,85 @@
+import operator
+import random
+import unittest
+
+from redblack import Tree, TreeDict, join, merge
+
+
+class MergeTests(unittest.TestCase):
+
+    def setUp(self):
+        rnd = random.Random(7)
+        self.dicts = [
+            TreeDict(items={k: i for k in rnd.sample(range(300), 60)})
+            for i in range(6)
+            ]
+
+    def test_merge(self):
+        all_keys = sorted(k for d in self.dicts for k in d.keys())
+        self.assertEqual(list(merge(*self.dicts, key_only=True,
+                                    dedupe=False)), all_keys)
+        expected = {}
+        for d in self.dicts:
+            expected.update(d.items())
+        self.assertEqual(list(merge(*self.dicts)), sorted(expected.items()))
+        self.assertEqual(list(merge(*self.dicts, reverse=True)),
+                         sorted(expected.items(), reverse=True))
+        self.assertEqual(
+            list(merge(*self.dicts, lo=100, hi=200, reverse=True)),
+            [i for i in sorted(expected.items(), reverse=True)
+             if 100 <= i[0] < 200])
+        summed = dict(merge(*self.dicts, acc=operator.add))
+        for k, v in summed.items():
+            self.assertEqual(v, sum(d[k].val for d in self.dicts if k in d))
+
+    def test_merge_trees(self):
+        a = Tree(keys=[1, 3, 5])
+        b = Tree(keys=[2, 3, 4])
+        self.assertEqual(list(merge(a, b)), [1, 2, 3, 4, 5])
+        self.assertEqual(list(merge(a, b, dedupe=False, lo=2, hi=5)),
+                         [2, 3, 3, 4])
+        self.assertEqual(list(merge()), [])
+        self.assertEqual(list(merge(a, Tree(), lo=10)), [])
+
+    def test_merge_modified(self):
+        for reverse in (False, True):
+            a = TreeDict(items={k: k for k in range(10)})
+            b = TreeDict(items={k: k for k in range(5, 20)})
+            with self.assertRaises(RuntimeError):
+                for k, _ in merge(a, b, reverse=reverse):
+                    if k == 7:
+                        del a[8]
+            # Also detected in trees whose cursor ran out
+            a = Tree(keys=range(7, 10) if reverse else range(3))
+            b = Tree(keys=range(10))
+            with self.assertRaises(RuntimeError):
+                for k in merge(a, b, reverse=reverse):
+                    if k == 5:
+                        a.insert(100)
+
+
+class JoinTests(unittest.TestCase):
+
+    def test_join(self):
+        rnd = random.Random(3)
+        for n, m in ((500, 500), (500, 5), (5, 500), (0, 10)):
+            a = TreeDict(items={k: -k for k in rnd.sample(range(1000), n)})
+            b = TreeDict(items={k: k for k in rnd.sample(range(1000), m)})
+            ka, kb = set(a.keys()), set(b.keys())
+            for how, keys in (('inner', ka & kb), ('left', ka),
+                              ('outer', ka | kb)):
+                self.assertEqual(
+                    list(join(a, b, how)),
+                    [(k, -k if k in ka else None, k if k in kb else None)
+                     for k in sorted(keys)])
+        with self.assertRaises(ValueError):
+            list(join(a, b, 'right'))
+
+    def test_join_modified(self):
+        a = TreeDict(items={k: k for k in range(10)})
+        b = TreeDict(items={k: k for k in range(10)})
+        for tree in (a, b):
+            with self.assertRaises(RuntimeError):
+                for k, _, _ in join(a, b):
+                    if k == 3:
+                        tree[20] = 20
@@ -0,0 +1,101 @@
+import operator
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from redblack import Tree, TreeDict
+from redblack import durable
+from redblack.durable import DurableTree, recover
+from redblack.treedict import overwrite
+
+
+def make_tree():
+    return TreeDict(acc=overwrite)
+
+
+def make_counter():
+    return TreeDict(acc=operator.add)
+
+
+class DurableTreeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dir = self.tmp.name
+
+    def test_recover_log(self):
+        rnd = random.Random(1)
+        ref = {}
+        with DurableTree(self.dir, sync_every=7) as d:
+            for _ in range(500):
+                k = rnd.randrange(100)
+                if k in ref and rnd.random() < 0.3:
+                    del ref[k]
+                    del d[k]
+                else:
+                    ref[k] = d[k] = rnd.random()
+        tree, _ = recover(self.dir)
+        self.assertEqual(list(tree.items()), sorted(ref.items()))
+
+    def test_checkpoints(self):
+        with DurableTree(self.dir, factory=Tree, checkpoint_every=100,
+                         sync_interval=None) as d:
+            for k in range(250):
+                d.insert(k)
+            d.remove(d[3])
+        names = sorted(os.listdir(self.dir))
+        self.assertEqual([n for n in names if n.startswith('checkpoint')],
+                         ['checkpoint.000000000003'])
+        with DurableTree(self.dir, factory=Tree) as d:
+            self.assertEqual(len(d), 249)
+            self.assertNotIn(3, d)
+            d.tree.validate()
+
+    def test_checkpoint_syncs_directory(self):
+        events = []
+        remove = os.remove
+        with mock.patch.object(durable, '_fsync_dir',
+                               lambda d: events.append('sync')), \
+                mock.patch('os.remove',
+                           lambda p: events.append('remove') or remove(p)):
+            with DurableTree(self.dir, sync_interval=None) as d:
+                d[1] = 1
+                d.checkpoint()
+                d.checkpoint()
+        # Opening the first segment, then per checkpoint before removing
+        # the superseded files
+        self.assertEqual(events, ['sync', 'sync', 'remove',
+                                  'sync', 'remove', 'remove'])
+        durable._fsync_dir(self.dir)
+
+    def test_mutation_during_checkpoint(self):
+        dump = durable.pickle.dump
+
+        def mutating_dump(obj, *args):
+            # Runs after the segment was rotated and the lock released
+            d[1] = 1
+            dump(obj, *args)
+
+        with DurableTree(self.dir, make_counter, sync_interval=None) as d:
+            d[1] = 1
+            with mock.patch.object(durable.pickle, 'dump', mutating_dump):
+                d.checkpoint()
+            self.assertEqual(d.tree[1].val, 2)
+        tree, _ = recover(self.dir)
+        self.assertEqual(tree[1].val, 2)
+
+    def test_torn_tail(self):
+        with DurableTree(self.dir, make_tree, sync_every=1) as d:
+            for k in range(10):
+                d[k] = k
+        path = os.path.join(self.dir, 'wal.000000000001')
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 3)
+        with DurableTree(self.dir, make_tree) as d:
+            self.assertEqual(list(d.tree.keys()), list(range(9)))
+            d[20] = 20
+        tree, _ = recover(self.dir)
+        self.assertEqual(list(tree.keys()), list(range(9)) + [20])
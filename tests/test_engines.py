@@ -0,0 +1,150 @@
+import operator
+import pickle
+import random
+import unittest
+
+from redblack.engines import (
+    AVLTree,
+    AVLTreeDict,
+    SplayTree,
+    SplayTreeDict,
+    TreapTree,
+    TreapTreeDict,
+    WAVLTree,
+    WAVLTreeDict,
+    )
+
+
+ENGINES = (AVLTree, WAVLTree, TreapTree, SplayTree)
+DICT_ENGINES = (AVLTreeDict, WAVLTreeDict, TreapTreeDict, SplayTreeDict)
+
+
+def height(tree):
+    top = 0
+    stack = [(tree.root, 1)] if tree.root else []
+    while stack:
+        node, depth = stack.pop()
+        top = max(top, depth)
+        for child in (node.left, node.right):
+            if child:
+                stack.append((child, depth + 1))
+    return top
+
+
+class EngineTests(unittest.TestCase):
+
+    def test_random_updates(self):
+        rnd = random.Random(5)
+        for engine in ENGINES:
+            tree = engine()
+            ref = set()
+            for i in range(3000):
+                key = rnd.randrange(500)
+                if rnd.random() < 0.55:
+                    tree.insert(key)
+                    ref.add(key)
+                elif key in ref:
+                    tree.remove(tree[key])
+                    ref.discard(key)
+                if i % 100 == 0:
+                    tree.validate()
+            tree.validate()
+            self.assertEqual(list(tree.keys()), sorted(ref))
+            for key in list(ref):
+                tree.remove(tree[key])
+            tree.validate()
+            self.assertEqual(len(tree), 0)
+
+    def test_balance(self):
+        for engine in (AVLTree, WAVLTree):
+            tree = engine(keys=range(1023))
+            self.assertLessEqual(height(tree), 14)
+            for k in range(0, 1023, 2):
+                tree.remove(tree[k])
+            tree.validate()
+            self.assertLessEqual(height(tree), 13)
+        self.assertLess(height(TreapTree(keys=range(1023))), 40)
+
+    def test_splay(self):
+        tree = SplayTree.load_sorted(range(1000))
+        tree.splay_depth = 0
+        tree.splay_probability = 1
+        self.assertIs(tree[3], tree.root)
+        self.assertIs(tree[700], tree.root)
+        with self.assertRaises(KeyError):
+            tree[2000]
+        self.assertEqual(tree.root.key, 999)
+        self.assertIn(500, tree)
+        self.assertEqual(tree.root.key, 500)
+        tree.validate()
+        self.assertEqual(list(tree.keys()), list(range(1000)))
+        # Lookups don't splay while iterating
+        root = tree.root
+        self.assertEqual([tree[n.key].key for n in tree], list(range(1000)))
+        for chunk in tree.iter_chunks(100):
+            self.assertIn(chunk[0], tree)
+        d = SplayTreeDict(items={k: k for k in range(1000)})
+        d.splay_depth = 0
+        d.splay_probability = 1
+        for k, v in d.items():
+            self.assertEqual(d[k].val, v)
+        for v in d.values():
+            clone = d.copy()
+            loaded = pickle.loads(pickle.dumps(d))
+            break
+        self.assertIs(tree.root, root)
+        self.assertEqual(
+            (d._iterating, clone._iterating, loaded._iterating), (0, 0, 0))
+        tree[0]
+        self.assertEqual(tree.root.key, 0)
+        tree = SplayTree.load_sorted(range(1000))
+        root = tree.root
+        tree[root.left.right.key]
+        self.assertIs(tree.root, root)
+
+    def test_linear_builds(self):
+        for engine in ENGINES:
+            tree = engine.load_sorted(range(100))
+            tree.validate()
+            tree.insert(100)
+            tree.remove(tree[0])
+            tree.validate()
+            for clone in (tree.copy(), pickle.loads(pickle.dumps(tree))):
+                self.assertIs(type(clone), engine)
+                clone.validate()
+                self.assertEqual(list(clone.keys()), list(range(1, 101)))
+
+    def test_tree_api(self):
+        for engine in ENGINES:
+            tree = engine(keys=range(0, 100, 2))
+            self.assertEqual(tree.floor_and_ceil(5)[0].key, 4)
+            self.assertEqual(tree.floor_and_ceil(5)[1].key, 6)
+            self.assertEqual([n.key for n in tree[10:16]], [10, 12, 14])
+            self.assertEqual(tree.first.key, 0)
+            self.assertEqual(tree.last.key, 98)
+            self.assertEqual(tree[50].successor.key, 52)
+            self.assertEqual(list(reversed(tree))[0].key, 98)
+
+    def test_star_import(self):
+        names = {}
+        exec('from redblack.engines import *', names)
+        self.assertIs(names.get('random', random), random)
+
+    def test_dicts(self):
+        for engine in DICT_ENGINES:
+            d = engine(acc=operator.add)
+            for k in range(200):
+                d[k % 50] = 1
+            d.validate()
+            self.assertEqual(list(d.items()), [(k, 4) for k in range(50)])
+            del d[10]
+            d.validate()
+            self.assertNotIn(10, d)
+            self.assertEqual(d[11].val, 4)
+            loaded = engine.load_sorted_items((k, k) for k in range(30))
+            loaded.validate()
+            self.assertEqual(pickle.loads(pickle.dumps(loaded))[7].val, 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import copy
+import pickle
+import unittest
+
+from redblack import DefaultTreeDict, Tree, TreeDict
+from redblack.instrument import instrumented
+
+
+class InstrumentationTests(unittest.TestCase):
+
+    def test_same_behavior(self):
+        tree = instrumented(Tree)(keys=range(100))
+        self.assertIsInstance(tree, Tree)
+        self.assertIs(instrumented(Tree), type(tree))
+        self.assertEqual(list(tree.keys()), list(range(100)))
+        for k in range(0, 100, 3):
+            del tree[k]
+        self.assertNotIn(3, tree)
+        self.assertIn(4, tree)
+        with self.assertRaises(KeyError) as ctx:
+            tree[3]
+        self.assertEqual(ctx.exception.args, (3,))
+        self.assertEqual(tree.floor_and_ceil(3)[0].key, 2)
+        self.assertEqual([n.key for n in tree[10:15]], [10, 11, 13, 14])
+
+    def test_counters(self):
+        tree = instrumented(Tree)(keys=range(1000))
+        stats = tree.instrumentation
+        self.assertEqual(stats['insert'].calls, 1000)
+        self.assertGreater(stats['insert'].rotations, 0)
+        self.assertGreater(stats['insert'].recolors, 0)
+        self.assertGreater(stats['insert'].fixups, 0)
+        tree.reset_instrumentation()
+        tree[500]
+        lookup = stats['lookup']
+        self.assertEqual(lookup.calls, 1)
+        self.assertLessEqual(lookup.visits, 20)
+        self.assertGreaterEqual(lookup.comparisons, lookup.visits)
+        self.assertGreater(lookup.percentile(50), 0)
+        del tree[500]
+        self.assertEqual(stats['remove'].calls, 1)
+        self.assertNotIn('lookup', {r for r in stats if stats[r].calls > 1})
+
+    def test_hooks_and_dicts(self):
+        records = []
+        d = instrumented(DefaultTreeDict)(int)
+        d.add_hook(records.append)
+        d[1] = 5
+        d.insert(2, 6)
+        self.assertEqual(d[3], 0)
+        d.get_neighbors(1)
+        self.assertEqual([r.op for r in records],
+                         ['insert', 'insert', 'lookup', 'get_neighbors'])
+        self.assertEqual(d[1].val, 5)
+        t = instrumented(TreeDict)(items={1: 2})
+        self.assertEqual(t.instrumentation['insert'].calls, 1)
+
+
+    def test_copy_and_pickle(self):
+        tree = instrumented(TreeDict)(items={k: k for k in range(10)})
+        tree.add_hook(lambda record: None)
+        for clone in (tree.copy(), copy.copy(tree)):
+            self.assertIs(type(clone), type(tree))
+            self.assertEqual(clone.instrumentation, {})
+            clone[3]
+            self.assertEqual(clone.instrumentation['lookup'].calls, 1)
+        self.assertNotIn('lookup', tree.instrumentation)
+        self.assertEqual(len(tree._hooks), 1)
+        loaded = pickle.loads(pickle.dumps(tree))
+        self.assertIs(type(loaded), TreeDict)
+        self.assertEqual(list(loaded.items()), list(tree.items()))
+        self.assertFalse(hasattr(loaded, 'instrumentation'))
+        loaded.validate()
+        self.assertIs(type(copy.deepcopy(tree)), TreeDict)
+
+
+if __name__ == '__main__':
+    unittest.main()
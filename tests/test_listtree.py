@@ -0,0 +1,114 @@
+import operator
+import pickle
+import random
+import unittest
+
+from redblack.listtree import ListTree, ListTreeDict
+
+
+class ListTreeTests(unittest.TestCase):
+
+    def test_random_updates(self):
+        rnd = random.Random(4)
+        for segment in (4, 5, 16):
+            tree = ListTree(segment=segment)
+            ref = set()
+            for i in range(5000):
+                key = rnd.randrange(800)
+                if rnd.random() < 0.55:
+                    tree.insert(key)
+                    ref.add(key)
+                elif key in ref:
+                    tree.remove(tree[key])
+                    ref.discard(key)
+                if i % 250 == 0:
+                    tree.validate()
+            tree.validate()
+            self.assertEqual(list(tree.keys()), sorted(ref))
+            self.assertEqual([e.key for e in reversed(tree)],
+                             sorted(ref, reverse=True))
+            for key in list(ref):
+                del tree[key]
+            tree.validate()
+            self.assertEqual(len(tree), 0)
+            self.assertIsNone(tree.last)
+
+    def test_search(self):
+        tree = ListTree(keys=range(0, 1000, 2), segment=8)
+        self.assertIn(500, tree)
+        self.assertNotIn(501, tree)
+        self.assertNotIn(1001, tree)
+        self.assertEqual([e.key for e in tree.floor_and_ceil(501)],
+                         [500, 502])
+        self.assertEqual([e.key for e in tree.get_neighbors(500)],
+                         [498, 502])
+        self.assertEqual(tree.floor_and_ceil(1001), (tree.last, None))
+        self.assertEqual(tree.get_neighbors(0), (None, tree[2]))
+        with self.assertRaises(KeyError):
+            tree[1]
+
+    def test_slices(self):
+        keys = list(range(0, 1000, 2))
+        tree = ListTree.load_sorted(keys, segment=8)
+        tree.validate()
+        self.assertEqual([e.key for e in tree[95:111]], keys[48:56])
+        self.assertEqual([e.key for e in tree[95:131:3]], keys[48:66:3])
+        self.assertEqual([e.key for e in tree[95:131:-4]], keys[48:66][::-4])
+        self.assertEqual(len(tree[:]), 500)
+        self.assertEqual(tree[20:10], [])
+
+    def test_positions(self):
+        keys = list(range(0, 1000, 2))
+        tree = ListTree(keys=keys, segment=8)
+        self.assertEqual(tree.at(0).key, 0)
+        self.assertEqual(tree.at(-1).key, 998)
+        self.assertEqual(tree.at(137).key, keys[137])
+        for s in (slice(None), slice(3, 90, 7), slice(-10, None),
+                  slice(None, None, -3), slice(100, 5, -2)):
+            self.assertEqual([e.key for e in tree.at(s)], keys[s])
+        self.assertEqual(tree.index(274), 137)
+        tree.remove(tree[0])
+        self.assertEqual(tree.index(274), 136)
+        with self.assertRaises(IndexError):
+            tree.at(499)
+        with self.assertRaises(KeyError):
+            tree.index(3)
+
+    def test_iteration(self):
+        tree = ListTree.load_sorted(range(100), segment=8)
+        self.assertEqual(list(tree.keys()), list(range(100)))
+        self.assertEqual([e.key for e in tree], list(range(100)))
+        self.assertEqual([e.key for e in reversed(tree)],
+                         list(range(99, -1, -1)))
+        for it in (tree.keys, tree.__iter__, tree.__reversed__):
+            with self.assertRaises(RuntimeError):
+                for _ in it():
+                    tree.insert(tree.last.key + 1)
+        # Also detected within the last segment
+        last = tree.last.key
+        with self.assertRaises(RuntimeError):
+            for k in tree.keys():
+                if k == last:
+                    tree.insert(last + 1)
+
+    def test_dict(self):
+        d = ListTreeDict(acc=operator.add, segment=4)
+        for k in range(100):
+            d[k % 30] = 1
+        d.validate()
+        self.assertEqual(dict(d.items()),
+                         {k: 4 if k < 10 else 3 for k in range(30)})
+        self.assertEqual(d.at(3).val, 4)
+        del d[3]
+        self.assertNotIn(3, d)
+        loaded = ListTreeDict.load_sorted_items([(1, 1), (1, 2), (2, 3)],
+                                                acc=operator.add)
+        self.assertEqual(list(loaded.items()), [(1, 3), (2, 3)])
+        clone = pickle.loads(pickle.dumps(loaded))
+        self.assertEqual(list(clone.values()), [3, 3])
+        with self.assertRaises(ValueError):
+            ListTree.load_sorted([2, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import io
+import struct
+import unittest
+
+from redblack import DefaultTreeDict, Tree, TreeDict
+from redblack.readers import read_csv, read_lines, read_ndjson, read_records
+
+
+class LoadSortedTests(unittest.TestCase):
+
+    def test_load_sorted(self):
+        for n in range(40):
+            tree = Tree.load_sorted(iter(range(n)))
+            tree.validate()
+            self.assertEqual(list(tree.keys()), list(range(n)))
+        tree = Tree.load_sorted([1, 1, 2, 2, 2, 3])
+        self.assertEqual(list(tree.keys()), [1, 2, 3])
+        tree.validate()
+        with self.assertRaises(ValueError):
+            Tree.load_sorted([1, 3, 2])
+
+    def test_load_sorted_items(self):
+        items = ((k // 2, 1) for k in range(100))
+        d = TreeDict.load_sorted_items(items, acc=lambda a, b: a + b)
+        d.validate()
+        self.assertEqual(list(d.items()), [(k, 2) for k in range(50)])
+        d[0] = 5
+        self.assertEqual(d[0].val, 7)
+        dd = DefaultTreeDict.load_sorted_items([(1, 1)], default_factory=int)
+        self.assertEqual(dd[5], 0)
+
+    def test_readers(self):
+        text = io.StringIO("1\n\n2\n3\n")
+        self.assertEqual(list(read_lines(text, int)), [1, 2, 3])
+        text = io.StringIO("k;v\n1;a\n2;b\n")
+        self.assertEqual(
+            list(read_csv(text, key_type=int, header=True, delimiter=';')),
+            [(1, 'a'), (2, 'b')])
+        text = io.StringIO('{"key": 1, "value": "a"}\n{"key": 2, "value": 3}\n')
+        self.assertEqual(list(read_ndjson(text)), [(1, 'a'), (2, 3)])
+        data = b''.join(struct.pack('<qd', k, k / 2) for k in range(10))
+        pairs = list(read_records(io.BytesIO(data), '<qd', chunk_records=3))
+        self.assertEqual(pairs, [(k, k / 2) for k in range(10)])
+        d = TreeDict.load_sorted_items(
+            read_records(io.BytesIO(data), '<qd'))
+        self.assertEqual(d[4].val, 2.0)
+        with self.assertRaises(ValueError):
+            list(read_records(io.BytesIO(data[:-1]), '<qd'))
+
+        class ShortReads(io.BytesIO):
+            # Returns at most 7 bytes per read, like a pipe might
+            def read(self, size=-1):
+                return super().read(min(size, 7))
+
+        pairs = list(read_records(ShortReads(data), '<qd', chunk_records=2))
+        self.assertEqual(pairs, [(k, k / 2) for k in range(10)])
+        with self.assertRaises(ValueError):
+            list(read_records(ShortReads(data[:-1]), '<qd'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import io
+import os
+import tempfile
+import unittest
+
+from redblack import MappedTreeView, Tree, TreeDict
+
+
+class MappedTreeViewTests(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_dict(self):
+        d = TreeDict(items={k: [k] * (k % 3) for k in range(0, 1000, 2)})
+        for stride in (0, 1, 7, 64, 5000):
+            d.dump(self.path, index_stride=stride)
+            with MappedTreeView(self.path) as view:
+                self.assertEqual(len(view), 500)
+                self.assertEqual(list(view.items()), list(d.items()))
+                self.assertEqual(view[10].val, [10])
+                self.assertIn(998, view)
+                for k in (-1, 0, 1, 2, 501, 998, 999):
+                    self.assertEqual(k in view, k in d)
+                    self.assertEqual(
+                        [n and n.key for n in view.floor_and_ceil(k)],
+                        [n and n.key for n in d.floor_and_ceil(k)],
+                        )
+                with self.assertRaises(KeyError):
+                    view[3]
+                self.assertEqual([n.key for n in view[10:17]],
+                                 [10, 12, 14, 16])
+                self.assertEqual([n.key for n in view[990:]],
+                                 [990, 992, 994, 996, 998])
+                prev, succ = view.get_neighbors(10)
+                self.assertEqual((prev.key, succ.key), (8, 12))
+                self.assertEqual(view.first.key, 0)
+                self.assertEqual(view.last.val, [998, 998])
+
+    def test_tree(self):
+        tree = Tree(keys=[0.5 * k for k in range(100)])
+        buf = io.BytesIO()
+        tree.dump(buf)
+        with open(self.path, 'wb') as f:
+            f.write(buf.getvalue())
+        with MappedTreeView(self.path) as view:
+            self.assertFalse(view.has_values)
+            self.assertEqual(list(view.keys()), list(tree.keys()))
+            self.assertEqual([n.key for n in reversed(view)][:2], [49.5, 49])
+            with view.keys_buffer(10, 12) as buf:
+                self.assertEqual(buf.format, 'd')
+                self.assertEqual(buf.tolist(), [10, 10.5, 11, 11.5])
+
+    def test_empty_and_errors(self):
+        Tree().dump(self.path)
+        with MappedTreeView(self.path) as view:
+            self.assertEqual(len(view), 0)
+            self.assertIsNone(view.first)
+            self.assertEqual(view.floor_and_ceil(1), (None, None))
+        with self.assertRaises(TypeError):
+            Tree(keys=['a']).dump(self.path)
+        with open(self.path, 'wb') as f:
+            f.write(b'x' * 100)
+        with self.assertRaises(ValueError):
+            MappedTreeView(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
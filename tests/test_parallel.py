@@ -0,0 +1,119 @@
+import random
+import unittest
+from operator import add
+
+from redblack import DefaultTreeDict, Node, Tree, TreeDict
+from redblack.parallel import build, map_partitions, pack, parallel_union
+
+
+def is_valid(tree):
+    """Return True if all red-black invariants hold"""
+    black_heights = set()
+    stack = [(tree.root, 0)]
+    while stack:
+        n, bh = stack.pop()
+        if n is None:
+            black_heights.add(bh)
+            continue
+        if n.red and n.parent and n.parent.red:
+            return False
+        for c in (n.left, n.right):
+            if c is not None and c.parent is not n:
+                return False
+            stack.append((c, bh + (not n.red)))
+    return len(black_heights) <= 1 and not (tree.root and tree.root.red)
+
+
+def summed(keys, vals=None):
+    return sum(keys), len(keys), vals is not None
+
+
+class ParallelTests(unittest.TestCase):
+
+    def test_link_sorted(self):
+        for n in range(70):
+            tree = Tree._from_sorted_nodes([Node(k) for k in range(n)])
+            self.assertTrue(is_valid(tree))
+            self.assertEqual(list(tree.keys()), list(range(n)))
+            self.assertEqual(len(tree), n)
+
+    def test_pack(self):
+        self.assertEqual(pack([1, 2]).typecode, 'q')
+        self.assertEqual(pack([1.0, 2.5]).typecode, 'd')
+        self.assertEqual(pack([1, 2.5]), [1, 2.5])
+        self.assertEqual(pack(['a']), ['a'])
+
+    def test_build(self):
+        rnd = random.Random(3)
+        items = [(rnd.randrange(1000), 1) for _ in range(5000)]
+        ref = TreeDict(acc=add)
+        for k, v in items:
+            ref[k] = v
+        for workers in (1, 2):
+            tree = build(items, workers=workers, acc=add, chunksize=700)
+            self.assertIsInstance(tree, TreeDict)
+            self.assertTrue(is_valid(tree))
+            self.assertEqual(list(tree.items()), list(ref.items()))
+        keys = build((k for k, _ in items), treetype=Tree, workers=1)
+        self.assertEqual(list(keys.keys()), list(ref.keys()))
+
+    def test_acc_order(self):
+        items = [('b', 1), ('a', 2), ('b', 3), ('a', 4)]
+        tree = build(items, workers=1, chunksize=3)
+        self.assertEqual(list(tree.items()), [('a', 4), ('b', 3)])
+
+    def test_union(self):
+        a = TreeDict(items={k: 1 for k in range(0, 300, 2)}, acc=add)
+        b = TreeDict(items={k: 10 for k in range(0, 300, 3)})
+        u = parallel_union(a, b, workers=2)
+        self.assertTrue(is_valid(u))
+        self.assertEqual(u.acc, add)
+        self.assertEqual(u[6].val, 11)
+        self.assertEqual(u[4].val, 1)
+        self.assertEqual(u[9].val, 10)
+        self.assertEqual(len(u), len(set(a.keys()) | set(b.keys())))
+        d = parallel_union(DefaultTreeDict(int), DefaultTreeDict(int),
+                           workers=1)
+        self.assertEqual(len(d), 0)
+
+    def test_map_partitions(self):
+        tree = Tree(keys=range(1000))
+        results = map_partitions(tree, summed, k=4, workers=2)
+        self.assertEqual(sum(r[0] for r in results), sum(range(1000)))
+        self.assertEqual(sum(r[1] for r in results), 1000)
+        d = TreeDict(items={k: k for k in range(100)})
+        results = map_partitions(d, summed, k=3, workers=1, exact=True)
+        self.assertEqual([r[1] for r in results], [33, 33, 34])
+        self.assertTrue(all(r[2] for r in results))
+
+    def test_partitions(self):
+        for tree in (Tree(keys=range(5000)),
+                     Tree(keys=random.sample(range(10 ** 6), 5000)),
+                     Tree(keys=range(3))):
+            for k in (1, 2, 7, 40):
+                parts = tree.partitions(k)
+                self.assertLessEqual(len(parts), k)
+                sizes = [len(list(p.keys())) for p in parts]
+                self.assertEqual(sum(sizes), len(tree))
+                if len(tree) > 40 * 8:
+                    self.assertEqual(len(parts), k)
+                    self.assertLess(max(sizes), 2 * len(tree) / k)
+                points = tree.partition_points(k)
+                self.assertEqual(points, sorted(set(points)))
+        tree = Tree(keys=range(100))
+        self.assertEqual(tree.partition_points(4, exact=True), [25, 50, 75])
+        self.assertIn(30, tree.partitions(4)[1])
+        self.assertNotIn(60, tree.partitions(4)[1])
+        self.assertEqual(Tree().partitions(3)[0].to_arrays().tolist(), [])
+        for keys, points in (([], []), ([1], []), ([1, 2], [2])):
+            tree = Tree(keys=keys)
+            for exact in (False, True):
+                self.assertEqual(tree.partition_points(4, exact), points)
+            self.assertEqual([list(p.keys()) for p in tree.partitions(4)],
+                             [[k] for k in keys] or [[]])
+        with self.assertRaises(ValueError):
+            tree.partition_points(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import copy
+import pickle
+import unittest
+from operator import add
+
+from redblack import DefaultTreeDict, Tree, TreeDict
+
+
+def shape(tree):
+    return [(n.key, n.red, n.parent and n.parent.key) for n in tree]
+
+
+class PickleTests(unittest.TestCase):
+
+    def test_tree(self):
+        tree = Tree(keys=range(1000))
+        clone = pickle.loads(pickle.dumps(tree))
+        self.assertIsInstance(clone, Tree)
+        clone.validate()
+        self.assertEqual(list(clone.keys()), list(range(1000)))
+        clone.insert(1000)
+        self.assertEqual(len(clone), 1001)
+        self.assertEqual(len(tree), 1000)
+        empty = pickle.loads(pickle.dumps(Tree()))
+        self.assertEqual(len(empty), 0)
+        self.assertIsNone(empty.root)
+
+    def test_dicts(self):
+        d = TreeDict(items={k: str(k) for k in range(100)}, acc=add)
+        clone = pickle.loads(pickle.dumps(d))
+        clone.validate()
+        self.assertEqual(list(clone.items()), list(d.items()))
+        clone[5] = 'x'
+        self.assertEqual(clone[5].val, '5x')
+        dd = DefaultTreeDict(list)
+        dd[1] = [1]
+        clone = pickle.loads(pickle.dumps(dd))
+        self.assertEqual(clone[2], [])
+        self.assertEqual(clone[1].val, [1])
+
+    def test_copy(self):
+        d = TreeDict(items={k: [k] for k in range(300)})
+        for k in range(0, 300, 3):
+            del d[k]
+        for c in (d.copy(), copy.copy(d)):
+            c.validate()
+            self.assertEqual(shape(c), shape(d))
+            self.assertIs(c[1].val, d[1].val)
+            self.assertIsNot(c[1], d[1])
+            del c[1]
+            self.assertIn(1, d)
+        deep = copy.deepcopy(d)
+        deep.validate()
+        self.assertEqual(list(deep.items()), list(d.items()))
+        self.assertIsNot(deep[1].val, d[1].val)
+        self.assertEqual(len(Tree().copy()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
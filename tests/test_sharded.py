@@ -0,0 +1,108 @@
+import random
+import threading
+import unittest
+
+from redblack import ShardedTreeDict, TreeDict
+
+
+class ShardedTreeDictTests(unittest.TestCase):
+
+    def test_split_and_merge(self):
+        d = ShardedTreeDict(max_shard_size=16)
+        keys = list(range(200))
+        random.Random(1).shuffle(keys)
+        for k in keys:
+            d[k] = -k
+        self.assertGreater(d.shard_count, 8)
+        self.assertEqual(len(d), 200)
+        self.assertEqual(list(d.keys()), list(range(200)))
+        self.assertEqual([n.key for n in reversed(d)], list(range(199, -1, -1)))
+        self.assertEqual(d[150].val, -150)
+        for k in keys[:190]:
+            del d[k]
+        self.assertLess(d.shard_count, 4)
+        self.assertEqual(list(d.keys()), sorted(keys[190:]))
+
+    def test_iteration_copies(self):
+        d = ShardedTreeDict(items={k: str(k) for k in range(10)},
+                            bounds=[100])
+        it = iter(d)
+        self.assertEqual(next(it).key, 0)
+        # Removing the root of the shard moves its successor into it
+        del d[3]
+        self.assertEqual([(n.key, n.val) for n in it],
+                         [(k, str(k)) for k in range(1, 10)])
+        items = d.items()
+        self.assertEqual(next(items), (0, '0'))
+        del d[5]
+        self.assertEqual(list(items),
+                         [(k, str(k)) for k in (1, 2, 4, 5, 6, 7, 8, 9)])
+
+    def test_lookups_copy(self):
+        d = ShardedTreeDict(items={k: str(k) for k in range(10)},
+                            bounds=[5])
+        nodes = [d[3], d.first, d.last, d[2:4][0],
+                 *d.floor_and_ceil(3), *d.get_neighbors(3.5)]
+        self.assertEqual([n.key for n in nodes], [3, 0, 9, 2, 3, 3, 3, 4])
+        # Removing 3 moves another key into its node in the shard
+        removed = d.remove(d[3])
+        self.assertEqual((removed.key, removed.val), (3, '3'))
+        self.assertEqual([(n.key, n.val) for n in nodes],
+                         [(k, str(k)) for k in (3, 0, 9, 2, 3, 3, 3, 4)])
+        self.assertTrue(all(n.parent is None and n.left is None
+                            and n.right is None for n in nodes))
+        node = d[4]
+        node.val = 'changed'
+        self.assertEqual(d[4].val, '4')
+        self.assertEqual(d.floor_and_ceil(3)[1].key, 4)
+
+    def test_matches_treedict(self):
+        rnd = random.Random(7)
+        d = ShardedTreeDict(max_shard_size=8, bounds=[100, 200])
+        ref = TreeDict()
+        for _ in range(500):
+            k = rnd.randrange(300)
+            if k in ref and rnd.random() < 0.4:
+                del d[k]
+                del ref[k]
+            else:
+                d[k] = k
+                ref[k] = k
+        self.assertEqual(list(d.items()), list(ref.items()))
+        self.assertEqual(d.first.key, ref.first.key)
+        self.assertEqual(d.last.key, ref.last.key)
+        for k in range(-5, 310, 7):
+            self.assertEqual(
+                [n and n.key for n in d.floor_and_ceil(k)],
+                [n and n.key for n in ref.floor_and_ceil(k)],
+                )
+        for a, b in ((None, None), (10, 250), (None, 120), (150, None)):
+            self.assertEqual(
+                [n.key for n in d[a:b]],
+                [n.key for n in ref[a:b]],
+                )
+
+    def test_neighbors_across_shards(self):
+        d = ShardedTreeDict(bounds=[10, 20, 30])
+        d[5] = d[35] = None
+        prev, succ = d.get_neighbors(25)
+        self.assertEqual((prev.key, succ.key), (5, 35))
+        self.assertEqual(d.floor_and_ceil(40), (d[35], None))
+
+    def test_parallel_writers(self):
+        d = ShardedTreeDict(max_shard_size=64)
+
+        def writer(offset):
+            for k in range(offset, 4000, 4):
+                d[k] = k
+        threads = [threading.Thread(target=writer, args=(i,))
+                   for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(list(d.keys()), list(range(4000)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from redblack.spill import BloomFilter, Run, SpillingTreeDict
+
+
+class SpillingTreeDictTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def make(self, **kwargs):
+        kwargs.setdefault('memtable_size', 50)
+        kwargs.setdefault('block_size', 8)
+        return SpillingTreeDict(self.tmp.name, **kwargs)
+
+    def test_matches_dict(self):
+        rnd = random.Random(0)
+        d = self.make(background=False)
+        ref = {}
+        for _ in range(3000):
+            k = rnd.randrange(500)
+            if rnd.random() < 0.3:
+                if k in ref:
+                    del ref[k]
+                    del d[k]
+                else:
+                    with self.assertRaises(KeyError):
+                        del d[k]
+            else:
+                ref[k] = d[k] = rnd.random()
+        self.assertGreater(d.run_count, 0)
+        self.assertEqual(list(d.items()), sorted(ref.items()))
+        self.assertEqual(len(d), len(ref))
+        for k in range(-1, 501):
+            self.assertEqual(k in d, k in ref)
+            if k in ref:
+                self.assertEqual(d[k].val, ref[k])
+        keys = sorted(ref)
+        self.assertEqual([n.key for n in d[100:200]],
+                         [k for k in keys if 100 <= k < 200])
+        self.assertEqual([n.key for n in reversed(d)], keys[::-1])
+        self.assertEqual(d.first.key, keys[0])
+        self.assertEqual(d.last.key, keys[-1])
+        self.assertTrue(d)
+        for k in keys:
+            del d[k]
+        self.assertFalse(d)
+
+    def test_floor_and_ceil(self):
+        d = self.make()
+        for k in range(0, 400, 4):
+            d[k] = k
+        del d[200]
+        floor, ceil = d.floor_and_ceil(200)
+        self.assertEqual((floor.key, ceil.key), (196, 204))
+        floor, ceil = d.floor_and_ceil(8)
+        self.assertEqual((floor.key, ceil.key), (8, 8))
+        prev, succ = d.get_neighbors(8)
+        self.assertEqual((prev.key, succ.key), (4, 12))
+        self.assertEqual(d.floor_and_ceil(-1), (None, d.first))
+        self.assertIsNone(d.floor_and_ceil(1000)[1])
+        d.close()
+
+    def test_compaction(self):
+        d = self.make(compact_runs=3)
+        for k in range(1000):
+            d[k] = k
+        for k in range(0, 1000, 2):
+            del d[k]
+        d.flush()
+        d.compact()
+        d.wait()
+        self.assertEqual(d.run_count, 1)
+        self.assertEqual(list(d.keys()), list(range(1, 1000, 2)))
+
+    def test_crash_during_compaction(self):
+        d = self.make(background=False, compact_runs=100)
+        for k in range(200):
+            d[k] = k
+        for k in range(0, 200, 2):
+            del d[k]
+        d.flush()
+        # Crash after writing the merged run, before removing the inputs
+        with mock.patch('os.remove', side_effect=OSError):
+            with self.assertRaises(OSError):
+                d.compact()
+        self.assertGreater(len(os.listdir(self.tmp.name)), 1)
+        d = self.make()
+        self.assertEqual(d.run_count, 1)
+        self.assertEqual(os.listdir(self.tmp.name), [
+            os.path.basename(d._runs[0].path)])
+        self.assertEqual(list(d.keys()), list(range(1, 200, 2)))
+
+    def test_block_cache(self):
+        d = self.make(memtable_size=100)
+        for k in range(100):
+            d[k] = k
+        d.flush()
+        run = Run(d._runs[0].path, cache_blocks=2)
+        run.get(0)
+        run.get(40)
+        run.get(0)
+        run.get(80)
+        # The block of 0 was used more recently than the one of 40
+        self.assertEqual(list(run._cache), [0, 10])
+        run.close()
+
+    def test_reopen(self):
+        with self.make(acc=lambda a, b: a + b) as d:
+            for k in range(200):
+                d[k % 100] = 1
+        d = self.make()
+        self.assertEqual(list(d.values()), [2] * 100)
+
+    def test_close(self):
+        d = self.make()
+        for k in range(200):
+            d[k] = k
+        runs = d._runs
+        d.close()
+        self.assertTrue(all(r._file.closed for r in runs))
+        with self.assertRaises(FileNotFoundError):
+            Run(self.tmp.name + '/missing.run')
+
+    def test_bloom_sequential_ints(self):
+        bloom = BloomFilter(50001)
+        for k in range(0, 100001, 2):
+            bloom.add(k)
+        self.assertTrue(all(k in bloom for k in range(0, 100001, 2)))
+        false = sum(k in bloom for k in range(1, 100001, 2))
+        self.assertLess(false / 50000, 0.02)
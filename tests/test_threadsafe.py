@@ -0,0 +1,148 @@
+import threading
+import unittest
+
+from redblack import ConcurrentTree, ConcurrentTreeDict, RWLock
+
+
+class RWLockTests(unittest.TestCase):
+
+    def test_readers_share(self):
+        lock = RWLock()
+        lock.acquire_read()
+        acquired = threading.Event()
+
+        def other():
+            with lock.read():
+                acquired.set()
+        t = threading.Thread(target=other)
+        t.start()
+        self.assertTrue(acquired.wait(1))
+        t.join()
+        lock.release_read()
+
+    def test_writer_excludes_readers(self):
+        lock = RWLock()
+        lock.acquire_write()
+        acquired = threading.Event()
+
+        def other():
+            with lock.read():
+                acquired.set()
+        t = threading.Thread(target=other)
+        t.start()
+        self.assertFalse(acquired.wait(0.1))
+        lock.release_write()
+        self.assertTrue(acquired.wait(1))
+        t.join()
+
+    def test_write_reentrant(self):
+        lock = RWLock()
+        with lock.write():
+            with lock.write():
+                with lock.read():
+                    pass
+        with lock.write():
+            pass
+
+    def test_nested_read_with_waiting_writer(self):
+        lock = RWLock()
+        lock.acquire_read()
+        written = threading.Event()
+
+        def writer():
+            with lock.write():
+                written.set()
+        t = threading.Thread(target=writer)
+        t.start()
+        while not lock._writers_waiting:
+            pass
+        # Would deadlock if nested reads queued behind the writer
+        with lock.read():
+            self.assertFalse(written.is_set())
+        self.assertFalse(written.wait(0.1))
+        lock.release_read()
+        self.assertTrue(written.wait(1))
+        t.join()
+
+
+class ConcurrentTreeTests(unittest.TestCase):
+
+    def test_basic(self):
+        tree = ConcurrentTree()
+        for k in (5, 1, 3):
+            tree.insert(k)
+        self.assertEqual(len(tree), 3)
+        self.assertEqual(list(tree), [1, 3, 5])
+        self.assertEqual(list(reversed(tree)), [5, 3, 1])
+        self.assertIn(3, tree)
+        del tree[3]
+        self.assertNotIn(3, tree)
+        self.assertEqual(tree.floor_and_ceil(2), (1, 5))
+        self.assertEqual(tree.get_neighbors(6), (5, None))
+        self.assertEqual((tree.first, tree.last), (1, 5))
+        self.assertEqual(tree[1:6], [1, 5])
+        self.assertEqual(tree.insert(5), (5, False))
+        with self.assertRaises(KeyError):
+            tree.remove(3)
+        keys = []
+        for node in tree.iter_locked():
+            keys.append(tree[node.key])
+        self.assertEqual(keys, [1, 5])
+
+    def test_batch(self):
+        tree = ConcurrentTreeDict()
+        with tree.batch() as t:
+            for k in range(10):
+                t[k] = k * k
+        self.assertEqual(tree.get(3), 9)
+        self.assertIsNone(tree.get(30))
+        self.assertEqual(tree.setdefault(30, 1), 1)
+        self.assertEqual(tree.setdefault(30, 2), 1)
+        self.assertEqual(tree.pop(30), 1)
+        self.assertEqual(tree.pop(30, None), None)
+        self.assertEqual(tree.items()[:2], [(0, 0), (1, 1)])
+        self.assertEqual(tree[3], (3, 9))
+        self.assertEqual(tree.insert(3, 4), ((3, 4), False))
+
+    def test_lookups_copy(self):
+        tree = ConcurrentTreeDict()
+        for k in range(3):
+            tree[k] = str(k)
+        # Removing 0 from the root moves key 1 into the root node
+        first = tree.first
+        root = tree[0]
+        self.assertEqual(tree.remove(0), (0, '0'))
+        self.assertEqual((first, root), ((0, '0'), (0, '0')))
+        self.assertEqual(tree.items(), [(1, '1'), (2, '2')])
+
+    def test_threads(self):
+        tree = ConcurrentTreeDict()
+        errors = []
+
+        def writer(offset):
+            for k in range(offset, 2000, 4):
+                tree[k] = k
+
+        def reader():
+            try:
+                for _ in range(50):
+                    keys = tree.keys()
+                    self.assertEqual(keys, sorted(keys))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(i,))
+                   for i in range(4)]
+        threads += [threading.Thread(target=reader) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertFalse(errors)
+        self.assertEqual(tree.keys(), list(range(2000)))
+        with tree.reading() as t:
+            self.assertEqual(len(t), 2000)
+
+
+if __name__ == '__main__':
+    unittest.main()
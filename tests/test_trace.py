@@ -0,0 +1,84 @@
+import io
+import unittest
+
+from redblack import Tree, TreeDict
+from redblack.trace import (
+    FLOOR_AND_CEIL,
+    GET,
+    INSERT,
+    REMOVE,
+    SLICE,
+    TraceRecorder,
+    read_trace,
+    replay,
+    )
+
+
+class TraceTests(unittest.TestCase):
+
+    def record(self, **kwargs):
+        buf = io.BytesIO()
+        rec = TraceRecorder(TreeDict(), buf, **kwargs)
+        for k in range(100):
+            rec[k] = k
+        rec[2.5] = 0
+        rec[1 << 70] = 0
+        rec[10]
+        rec.floor_and_ceil(3.5)
+        rec[5:None]
+        del rec[7]
+        rec.remove(rec.tree[8])
+        rec.flush()
+        self.assertEqual(len(rec), 100)
+        # Forwarded unrecorded
+        self.assertEqual(rec.first.key, 0)
+        self.assertEqual(rec.last.key, 1 << 70)
+        self.assertEqual(list(rec.keys())[:2], [0, 1])
+        self.assertEqual(next(reversed(rec)).key, 1 << 70)
+        self.assertEqual(rec.get(10), 10)
+        with self.assertRaises(AttributeError):
+            rec.nonexistent
+        buf.seek(0)
+        return buf
+
+    def test_roundtrip(self):
+        records = list(read_trace(self.record()))
+        self.assertEqual(len(records), 107)
+        self.assertEqual(records[0], (INSERT, (0,)))
+        self.assertEqual(records[100:], [
+            (INSERT, (2.5,)),
+            (INSERT, (1 << 70,)),
+            (GET, (10,)),
+            (FLOOR_AND_CEIL, (3.5,)),
+            (SLICE, (5, None)),
+            (REMOVE, (7,)),
+            (REMOVE, (8,)),
+            ])
+
+    def test_sampling(self):
+        records = list(read_trace(self.record(sample=0.5, seed=1)))
+        self.assertLess(len(records), 90)
+        self.assertGreater(len(records), 10)
+
+    def test_replay(self):
+        buf = io.BytesIO()
+        rec = TraceRecorder(Tree(), buf)
+        for k in range(50):
+            rec.insert(k)
+        for k in range(60):
+            k in rec
+            rec.get_neighbors(k)
+        rec.flush()
+        buf.seek(0)
+        report = replay(buf, Tree)
+        self.assertEqual(report['ops'], 170)
+        self.assertEqual(report['latency_ns']['contains']['count'], 60)
+        self.assertIn('p99', report['latency_ns']['insert'])
+
+    def test_bad_file(self):
+        with self.assertRaises(ValueError):
+            list(read_trace(io.BytesIO(b'nope')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,6 @@
 import importlib
 import unittest
 import random
-from datetime import datetime
 
 import tree
 importlib.reload(tree)
@@ -2159,59 +2158,142 @@ class RbTreeTests(unittest.TestCase):
         for i in range(20, 50):
             self.assertEqual(rb_tree.floor_and_ceil(i)[0].key, 20)
 
-
-# These tests take the bulk of the time for testing.
-class RbTreePerformanceTests(unittest.TestCase):
-    def test_addition_performance(self):
-        """
-        Add 25,000 elements to the tree
-        """
-        possible_keys = list(range(-100000, 100000))
-        elements = [random.choice(possible_keys) for _ in range(25000)]
-        start_time = datetime.now()
-        tree = Tree()
-        for el in elements:
-            tree.insert(el)
-        time_taken = datetime.now()-start_time
-        self.assertTrue(time_taken.seconds < 1)
-
-    def test_deletion_performance(self):
-        """
-        Delete 25,000 elements from the tree
-        """
-        possible_keys = list(range(-100000, 100000))
-        elements = set([random.choice(possible_keys) for _ in range(25000)])
-        # fill up the tree
-        tree = Tree()
-        for el in elements:
-            _, success = tree.insert(el)
-            self.assertTrue(success)
-        start_time = datetime.now()
-        for el in elements:
-            del tree[el]
-        time_taken = datetime.now()-start_time
-        self.assertTrue(time_taken.seconds < 1)
-
-    def test_deletion_and_addition_performance(self):
-        possible_keys = list(range(-500000, 500000))
-        elements = list(set([random.choice(possible_keys) for _ in range(25000)]))
-        first_part = elements[:len(elements)//2]
-        second_part = elements[len(elements)//2:]
-        deletion_part = first_part[len(first_part)//3:(len(first_part)//3)*2]
-        tree = Tree()
-        start_time = datetime.now()
-
-        # fill up the tree 1/2
-        for el in first_part:
-            tree.insert(el)
-        # delete 1/2 of the tree
-        for del_el in deletion_part:
-            del tree[del_el]
-        for el in second_part:
-            tree.insert(el)
-
-        time_taken = datetime.now()-start_time
-        self.assertTrue(time_taken.seconds < 1)
+    def test_modification_during_iteration(self):
+        rb_tree = Tree(keys=range(20))
+        for it in (iter(rb_tree), reversed(rb_tree), rb_tree.keys(),
+                   rb_tree.iter_from(rb_tree[5]),
+                   rb_tree.reverse_from(rb_tree[5])):
+            next(it)
+            rb_tree.insert(100)
+            with self.assertRaises(RuntimeError):
+                next(it)
+            del rb_tree[100]
+
+    def test_removal_during_iteration(self):
+        rb_tree = Tree(keys=range(20))
+        it = iter(rb_tree)
+        next(it)
+        del rb_tree[10]
+        with self.assertRaises(RuntimeError):
+            list(it)
+
+    def test_iter_unchecked(self):
+        rb_tree = Tree(keys=range(20))
+        self.assertEqual(
+            [n.key for n in rb_tree.iter_unchecked()], list(range(20)))
+        self.assertEqual(
+            [n.key for n in rb_tree.iter_unchecked(reverse=True)],
+            list(range(19, -1, -1)))
+        self.assertEqual(list(Tree().iter_unchecked()), [])
+
+    def test_stats(self):
+        rb_tree = Tree(keys=range(100))
+        stats = rb_tree.stats()
+        self.assertEqual(stats['size'], 100)
+        self.assertEqual(sum(stats['depth_histogram']), 100)
+        self.assertEqual(stats['depth_histogram'][0], 1)
+        self.assertEqual(stats['red'] + stats['black'], 100)
+        self.assertLessEqual(stats['height'], 2 * stats['black_height'])
+        self.assertGreater(stats['bytes_per_entry'], 0)
+        self.assertNotIn('bytes', rb_tree.stats(memory=False))
+        self.assertEqual(Tree().stats()['height'], 0)
+
+    def test_validate(self):
+        rb_tree = Tree(keys=random.sample(range(1000), 300))
+        rb_tree.validate()
+        for k in list(rb_tree.keys())[::2]:
+            del rb_tree[k]
+            rb_tree.validate()
+        rb_tree.root.left.red = not rb_tree.root.left.red
+        with self.assertRaises(AssertionError):
+            rb_tree.validate()
+        rb_tree = Tree(keys=range(10))
+        rb_tree._len += 1
+        with self.assertRaises(AssertionError):
+            rb_tree.validate()
+        rb_tree = Tree(keys=range(10))
+        rb_tree.first.key = 100
+        with self.assertRaises(AssertionError):
+            rb_tree.validate()
+
+    def test_to_arrays(self):
+        keys = random.sample(range(1000), 300)
+        rb_tree = Tree(keys=keys)
+        arr = rb_tree.to_arrays()
+        self.assertEqual(arr.typecode, 'q')
+        self.assertEqual(arr.tolist(), sorted(keys))
+        self.assertEqual(rb_tree.to_arrays(100, 200).tolist(),
+                         sorted(k for k in keys if 100 <= k < 200))
+        self.assertEqual(rb_tree.to_arrays(2000).tolist(), [])
+        self.assertEqual(rb_tree.to_arrays(dtype='d')[0], float(min(keys)))
+        self.assertEqual(Tree(keys='bca').to_arrays(), ['a', 'b', 'c'])
+
+    def test_iter_chunks(self):
+        keys = random.sample(range(1000), 300)
+        rb_tree = Tree(keys=keys)
+        for size in (1, 7, 300, 1000):
+            chunks = list(rb_tree.iter_chunks(size))
+            self.assertTrue(all(len(c) == size for c in chunks[:-1]))
+            self.assertEqual(sum(chunks, []), sorted(keys))
+            chunks = list(rb_tree.iter_chunks(size, 100, 500, reverse=True))
+            self.assertEqual(
+                sum(chunks, []),
+                sorted((k for k in keys if 100 <= k < 500), reverse=True))
+        self.assertEqual(list(Tree().iter_chunks(10)), [])
+        small = Tree(keys=range(10))
+        for reverse in (False, True):
+            self.assertEqual(list(small.iter_chunks(4, 7, 3, reverse)), [])
+            self.assertEqual(list(small.iter_chunks(4, 3, 3, reverse)), [])
+        with self.assertRaises(ValueError):
+            next(rb_tree.iter_chunks(0))
+        with self.assertRaises(RuntimeError):
+            for _ in rb_tree.iter_chunks(10):
+                rb_tree.insert(-1)
+
+    def test_iter_hand_linked(self):
+        rb_tree = Tree(root=Node(2, left=Node(1), right=Node(3)))
+        self.assertEqual(list(rb_tree.keys()), [1, 2, 3])
+        self.assertEqual(len(rb_tree), 3)
+        # Children without parent pointers
+        root = Node(key=4)
+        root.left = Node(key=2, left=Node(key=1))
+        root.left.right = Node(key=3)
+        root.right = Node(key=5)
+        rb_tree = Tree()
+        rb_tree.root = root
+        self.assertEqual(list(rb_tree.keys()), [1, 2, 3, 4, 5])
+        self.assertEqual([n.key for n in reversed(rb_tree)], [5, 4, 3, 2, 1])
+        self.assertEqual([n.key for n in root.left], [1, 2, 3])
+
+    def test_successor_predecessor(self):
+        keys = random.sample(range(1000), 300)
+        rb_tree = Tree(keys=keys)
+        keys.sort()
+        node = rb_tree.first
+        for k in keys:
+            self.assertEqual(node.key, k)
+            node = node.successor
+        self.assertIsNone(node)
+        node = rb_tree.last
+        for k in reversed(keys):
+            self.assertEqual(node.key, k)
+            node = node.predecessor
+        self.assertIsNone(node)
+        # Iterating a subtree stops at its boundary
+        root = rb_tree.root.key
+        below = [k for k in keys if k < root]
+        above = [k for k in keys if k > root]
+        self.assertEqual([n.key for n in rb_tree.root.left], below)
+        self.assertEqual([n.key for n in reversed(rb_tree.root.left)],
+                         below[::-1])
+        self.assertEqual([n.key for n in rb_tree.root.right], above)
+        self.assertEqual([n.key for n in reversed(rb_tree.root.right)],
+                         above[::-1])
+        self.assertEqual([n.key for n in rb_tree.iter_from(rb_tree[keys[5]])],
+                         keys[5:])
+        self.assertEqual(
+            [n.key for n in rb_tree.reverse_from(rb_tree[keys[5]])],
+            keys[5::-1])
 
 
 if __name__ == '__main__':